@@ -1,2 +1,12 @@
 """台羅（Tâi-lô）轉換工具。"""
 
+__all__ = ["Converter"]
+
+
+def __getattr__(name: str):
+    # Imported on first use, so `python -m tailo_cli` only pays for what it runs.
+    if name == "Converter":
+        from .api import Converter
+
+        return Converter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
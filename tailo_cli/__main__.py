@@ -1,14 +1,14 @@
 from __future__ import annotations
 
 import argparse
+import io
+import os
 import sys
 from pathlib import Path
 
-from .converter import contains_hanzi, hanzi_to_tailo, hanzi_to_tailo_with_stats
-from .dict_loader import load_dict_csv
-from .ipa import tailo_to_ipa
-from .opencc_util import to_traditional
-from .romanize import convert_numeric_poj_in_text, convert_poj_word_to_tailo
+from .api import Converter, default_dict_path, iter_chunks
+from .cache import default_cache_dir, default_socket_path, file_stamp
+from .stats import Stats
 
 
 def _read_input_text(args: argparse.Namespace) -> str:
@@ -17,175 +17,243 @@ def _read_input_text(args: argparse.Namespace) -> str:
     return sys.stdin.read()
 
 
-def _default_dict_path() -> Path:
-    cwd_dict = Path.cwd() / "dict.csv"
-    if cwd_dict.exists():
-        return cwd_dict
-    return Path(__file__).resolve().parent.parent / "dict.csv"
+def _warn(message: str) -> None:
+    print(message, file=sys.stderr)
 
 
-def _unique(items: list[str]) -> list[str]:
-    out: list[str] = []
-    seen: set[str] = set()
-    for item in items:
-        if item in seen:
-            continue
-        seen.add(item)
-        out.append(item)
-    return out
+# Converters (with their loaded dictionaries), reused across requests by a
+# long-lived process (`tailo daemon`).
+_CONVERTERS: dict[tuple, Converter] = {}
 
 
-def _normalize_for_dict(text: str) -> str:
-    # `dict.csv` uses "台" in headwords like "台灣", but OpenCC may normalize it to "臺".
-    return text.replace("臺", "台")
+class _DictLayerAction(argparse.Action):
+    """`--dict` / `--dict-extend`: dictionary layers as `(path, mode)`, in command-line order."""
+
+    def __call__(self, parser, namespace, values, option_string=None) -> None:
+        layers = list(getattr(namespace, self.dest) or [])
+        layers.append((values, self.const))
+        setattr(namespace, self.dest, layers)
+
+
+def _dict_layers(args: argparse.Namespace) -> tuple[Path, tuple[tuple[Path, str], ...]]:
+    """The base dictionary (the first `--dict`, else the default) and the overlays on it."""
+    layers = [(Path(path), mode) for path, mode in args.dict or ()]
+    if layers and layers[0][1] == "override":
+        base = layers.pop(0)[0]
+    else:
+        base = default_dict_path()
+    return base, tuple(layers)
+
+
+def _converter_kwargs(args: argparse.Namespace) -> dict:
+    dict_path, overlays = _dict_layers(args)
+    return {
+        "dict_path": dict_path,
+        "overlays": overlays,
+        "orthography": not args.no_orthography,
+        "opencc": None if args.no_opencc else args.opencc,
+        "opencc_fallback": args.opencc_full,
+        "use_cache": not args.no_cache,
+        "result_cache": getattr(args, "result_cache", None),
+        "result_cache_bytes": getattr(args, "result_cache_size", None),
+    }
+
+
+def _converter_for(args: argparse.Namespace) -> Converter:
+    kwargs = _converter_kwargs(args)
+    dict_path = kwargs["dict_path"]
+    # Cached converters outlive the command: (re)attach this run's stats, or detach.
+    stats = getattr(args, "stats_sink", None)
+    try:
+        stamp = file_stamp(dict_path)
+    except OSError:
+        # Reported by `_dict_error` once the dictionary is actually needed.
+        return Converter(**kwargs, on_opencc_error=_warn, stats=stats)
+    try:
+        layer_stamps = [tuple(file_stamp(path).values()) for path, _mode in kwargs["overlays"]]
+    except OSError:
+        return Converter(**kwargs, on_opencc_error=_warn, stats=stats)
+    key = (
+        str(dict_path.resolve()),
+        stamp["size"],
+        stamp["mtime_ns"],
+        *layer_stamps,
+        *sorted(kwargs.items())[1:],
+    )
+    conv = _CONVERTERS.get(key)
+    if conv is None:
+        conv = Converter(**kwargs, on_opencc_error=_warn)
+        if len(_CONVERTERS) >= 4:
+            _CONVERTERS.pop(next(iter(_CONVERTERS)))
+        _CONVERTERS[key] = conv
+    conv.stats = stats
+    return conv
+
+
+def _dict_error(conv: Converter, error: Exception) -> int:
+    if isinstance(error, FileNotFoundError):
+        path = error.filename or conv.dict_path
+        print(f"dict.csv not found: {path} (use --dict PATH)", file=sys.stderr)
+    else:
+        print(str(error), file=sys.stderr)
+    return 2
 
 
 def cmd_lookup(args: argparse.Namespace) -> int:
-    dict_path = Path(args.dict or _default_dict_path())
+    conv = _converter_for(args)
     raw_word = args.word
-    candidates = [raw_word, _normalize_for_dict(raw_word)]
-    if not args.no_opencc:
-        try:
-            converted = to_traditional(raw_word, config=args.opencc)
-            candidates.extend([converted, _normalize_for_dict(converted)])
-        except RuntimeError as e:
-            print(str(e), file=sys.stderr)
-    candidates = _unique(candidates)
     try:
-        mapping, max_len = load_dict_csv(dict_path, orthography=not args.no_orthography)
-    except FileNotFoundError:
-        print(f"dict.csv not found: {dict_path} (use --dict PATH)", file=sys.stderr)
-        return 2
-    except ValueError as e:
-        print(str(e), file=sys.stderr)
-        return 2
+        vals = conv.lookup(raw_word, output=args.output)
+        if vals:
+            for v in vals:
+                print(v)
+            return 0
+
+        print(f"(not found) {raw_word}", file=sys.stderr)
+        # Best-effort: still convert the parts we can, e.g. `台灣嘛` -> `tâi-uân嘛`.
+        out = conv.lookup_best_effort(raw_word, output=args.output)
+    except (FileNotFoundError, ValueError) as e:
+        return _dict_error(conv, e)
+    if out is not None:
+        print(out)
+    return 0
 
-    for cand in candidates:
-        vals = mapping.get(cand)
-        if not vals:
-            continue
-        for v in vals:
-            print(tailo_to_ipa(v) if args.output == "ipa" else v)
-        return 0
 
-    print(f"(not found) {raw_word}", file=sys.stderr)
+def cmd_rlookup(args: argparse.Namespace) -> int:
+    conv = _converter_for(args)
+    try:
+        hits = conv.rlookup(
+            args.romanization,
+            tones=not args.toneless,
+            hyphens=not args.ignore_hyphens,
+            output=args.output,
+        )
+    except (FileNotFoundError, ValueError) as e:
+        return _dict_error(conv, e)
+    if not hits:
+        print(f"(not found) {args.romanization}", file=sys.stderr)
+    for headword, reading in hits:
+        print(f"{headword}\t{reading}")
+    return 0
 
-    # Best-effort: still convert the parts we can, e.g. `台灣嘛` -> `tâi-uân嘛`.
-    if not any(contains_hanzi(c) for c in candidates):
-        return 0
 
-    best: tuple[tuple[int, int, int], str] | None = None
-    for cand in candidates:
-        if not contains_hanzi(cand):
-            continue
-        out, matched_chars, matched_segments, unknown_chars = hanzi_to_tailo_with_stats(
-            cand,
-            mapping,
-            max_key_len=max_len,
-            ambiguous="first",
-            unknown="keep",
+def cmd_match(args: argparse.Namespace) -> int:
+    conv = _converter_for(args)
+    offset = max(0, args.offset)
+    try:
+        # One extra result tells whether there is a next page.
+        hits = conv.match_headwords(
+            args.pattern, limit=args.limit + 1, offset=offset, output=args.output
         )
-        key = (matched_chars, -unknown_chars, -matched_segments)
-        if best is None or key > best[0]:
-            best = (key, out)
+    except (FileNotFoundError, ValueError) as e:
+        return _dict_error(conv, e)
+    if not hits:
+        print(f"(not found) {args.pattern}", file=sys.stderr)
+    for headword, readings in hits[: args.limit]:
+        print(f"{headword}\t{'/'.join(readings)}")
+    if len(hits) > args.limit:
+        print(f"(more: --offset {offset + args.limit})", file=sys.stderr)
+    return 0
+
 
-    if best and best[0][0] > 0:
-        out = best[1]
-        print(tailo_to_ipa(out) if args.output == "ipa" else out)
+def cmd_search(args: argparse.Namespace) -> int:
+    conv = _converter_for(args)
+    query = " ".join(args.query)
+    offset = max(0, args.offset)
+    try:
+        hits = conv.search(query, limit=args.limit + 1, offset=offset, output=args.output)
+    except FileNotFoundError as e:
+        return _dict_error(conv, e)
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    if not hits:
+        print(f"(not found) {query}", file=sys.stderr)
+    for hit in hits[: args.limit]:
+        print(f"{hit.headword}\t{hit.reading}\t{hit.page}\t{hit.snippet}")
+    if len(hits) > args.limit:
+        print(f"(more: --offset {offset + args.limit})", file=sys.stderr)
     return 0
 
 
-def cmd_convert(args: argparse.Namespace) -> int:
-    text = _read_input_text(args)
+def cmd_page(args: argparse.Namespace) -> int:
+    conv = _converter_for(args)
+    try:
+        hits = conv.pages(args.word, scale=args.scale, scan_dir=args.scans)
+    except FileNotFoundError as e:
+        return _dict_error(conv, e)
+    except (RuntimeError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    if not hits:
+        print(f"(not found) {args.word}", file=sys.stderr)
+    for hit in hits:
+        if hit.image is None:
+            print(f"(no scan) {hit.page}", file=sys.stderr)
+        print(f"{hit.headword}\t{hit.page}\t{hit.image or '-'}")
+    return 0
 
-    if args.mode == "poj":
-        out = convert_poj_word_to_tailo(text, orthography=not args.no_orthography)
-        if args.output == "ipa":
-            out = tailo_to_ipa(out)
-        print(out)
-        return 0
 
-    if args.mode == "hanzi":
-        dict_path = Path(args.dict or _default_dict_path())
-        candidates = [text, _normalize_for_dict(text)]
-        if not args.no_opencc:
-            try:
-                converted = to_traditional(text, config=args.opencc)
-                candidates.extend([converted, _normalize_for_dict(converted)])
-            except RuntimeError as e:
-                print(str(e), file=sys.stderr)
-        candidates = _unique(candidates)
-        try:
-            mapping, max_len = load_dict_csv(dict_path, orthography=not args.no_orthography)
-        except FileNotFoundError:
-            print(f"dict.csv not found: {dict_path} (use --dict PATH)", file=sys.stderr)
-            return 2
-        except ValueError as e:
-            print(str(e), file=sys.stderr)
-            return 2
+def _convert_options(args: argparse.Namespace) -> dict[str, str]:
+    return {
+        "mode": args.mode,
+        "ambiguous": args.ambiguous,
+        "unknown": args.unknown,
+        "output": args.output,
+    }
 
-        best: tuple[tuple[int, int, int], str] | None = None
-        for cand in candidates:
-            out, matched_chars, matched_segments, unknown_chars = hanzi_to_tailo_with_stats(
-                cand,
-                mapping,
-                max_key_len=max_len,
-                ambiguous=args.ambiguous,
-                unknown=args.unknown,
-            )
-            key = (matched_chars, -unknown_chars, -matched_segments)
-            if best is None or key > best[0]:
-                best = (key, out)
-        out = best[1] if best else ""
-        if args.output == "ipa":
-            out = tailo_to_ipa(out)
-        print(out)
+
+def cmd_convert(args: argparse.Namespace) -> int:
+    conv = _converter_for(args)
+    options = _convert_options(args)
+    try:
+        if args.format == "jsonl":
+            return _write_tokens(conv, args)
+        if args.stream and not args.text:
+            out = sys.stdout
+            for chunk in conv.convert_stream(iter_chunks(sys.stdin), **options):
+                out.write(chunk)
+                # Blocking writes + per-line flush: output appears immediately and a slow
+                # reader applies backpressure instead of letting output pile up in memory.
+                out.flush()
+            return 0
+        print(conv.convert(_read_input_text(args), **options))
         return 0
+    except (FileNotFoundError, ValueError) as e:
+        return _dict_error(conv, e)
 
-    # auto
-    if contains_hanzi(text):
-        dict_path = Path(args.dict or _default_dict_path())
-        candidates = [text, _normalize_for_dict(text)]
-        if not args.no_opencc:
-            try:
-                converted = to_traditional(text, config=args.opencc)
-                candidates.extend([converted, _normalize_for_dict(converted)])
-            except RuntimeError as e:
-                print(str(e), file=sys.stderr)
-        candidates = _unique(candidates)
-        try:
-            mapping, max_len = load_dict_csv(dict_path, orthography=not args.no_orthography)
-        except FileNotFoundError:
-            print(f"dict.csv not found: {dict_path} (use --dict PATH)", file=sys.stderr)
-            return 2
-        except ValueError as e:
-            print(str(e), file=sys.stderr)
-            return 2
 
-        best: tuple[tuple[int, int, int], str] | None = None
-        for cand in candidates:
-            out, matched_chars, matched_segments, unknown_chars = hanzi_to_tailo_with_stats(
-                cand,
-                mapping,
-                max_key_len=max_len,
-                ambiguous=args.ambiguous,
-                unknown=args.unknown,
-            )
-            key = (matched_chars, -unknown_chars, -matched_segments)
-            if best is None or key > best[0]:
-                best = (key, out)
-        text = best[1] if best else text
-    text = convert_numeric_poj_in_text(text, orthography=not args.no_orthography)
-    if args.output == "ipa":
-        text = tailo_to_ipa(text)
-    print(text)
+def _write_tokens(conv: Converter, args: argparse.Namespace) -> int:
+    """`--format jsonl`: one JSON object per token, written as segmentation produces them."""
+    import json
+
+    chunks = [" ".join(args.text)] if args.text else iter_chunks(sys.stdin)
+    out = sys.stdout
+    for token in conv.tokens(chunks, mode=args.mode, output=args.output):
+        out.write(json.dumps(token._asdict(), ensure_ascii=False) + "\n")
+        if args.stream:
+            out.flush()
     return 0
 
 
 def _add_common_args(p: argparse.ArgumentParser) -> None:
     p.add_argument(
         "--dict",
-        help="Path to dict.csv (default: ./dict.csv if exists).",
+        action=_DictLayerAction,
+        const="override",
+        metavar="PATH",
+        help=(
+            "Path to dict.csv (default: ./dict.csv if exists). Repeat to layer overlay "
+            "dictionaries on top, in priority order; their readings replace the base's."
+        ),
+    )
+    p.add_argument(
+        "--dict-extend",
+        action=_DictLayerAction,
+        const="extend",
+        dest="dict",
+        metavar="PATH",
+        help="Overlay dictionary whose readings are added to those of the layers below.",
     )
     p.add_argument(
         "--opencc",
@@ -197,26 +265,35 @@ def _add_common_args(p: argparse.ArgumentParser) -> None:
         action="store_true",
         help="Disable Simplified→Traditional conversion.",
     )
+    p.add_argument(
+        "--opencc-full",
+        action="store_true",
+        help="Also run full OpenCC on Hanzi runs the dictionary's own s2t table leaves unmatched.",
+    )
     p.add_argument(
         "--no-orthography",
         action="store_true",
         help="Skip POJ→台羅 orthography (still converts tone numbers).",
     )
+    p.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the compiled dictionary cache.",
+    )
     p.add_argument(
         "--output",
         choices=("tailo", "ipa"),
         default="tailo",
         help="Output format (default: tailo).",
     )
+    p.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print per-stage timings and counters as JSON on stderr.",
+    )
 
 
-def build_convert_parser() -> argparse.ArgumentParser:
-    p = argparse.ArgumentParser(
-        prog="tailo",
-        description="Convert text into Tâi-lô (台羅).",
-        epilog="Subcommands: `tailo lookup <漢字>`",
-    )
-    _add_common_args(p)
+def _add_convert_args(p: argparse.ArgumentParser) -> None:
     p.add_argument(
         "--mode",
         choices=("auto", "hanzi", "poj"),
@@ -235,6 +312,71 @@ def build_convert_parser() -> argparse.ArgumentParser:
         default="keep",
         help="How to handle unknown Hanzi.",
     )
+
+
+def _result_cache_path(value: str) -> Path:
+    return Path(value) if value else default_cache_dir() / "results.sqlite"
+
+
+def _positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+    return n
+
+
+def _megabytes(value: str) -> int:
+    return int(float(value) * (1 << 20))
+
+
+def _add_result_cache_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument(
+        "--result-cache",
+        nargs="?",
+        const="",
+        type=_result_cache_path,
+        metavar="PATH",
+        help=(
+            "Reuse converted results across runs from a SQLite cache "
+            "(default path: results.sqlite in the cache dir)."
+        ),
+    )
+    p.add_argument(
+        "--result-cache-size",
+        type=_megabytes,
+        metavar="MB",
+        help="Size limit of the result cache; least recently used results are evicted (default: 64).",
+    )
+
+
+def build_convert_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="tailo",
+        description="Convert text into Tâi-lô (台羅).",
+        epilog=(
+            "Subcommands: `tailo lookup <漢字>`, `tailo rlookup <台羅>`, `tailo match <一*>`, "
+            "`tailo search <text>`, `tailo page <漢字>`, `tailo batch IN_DIR OUT_DIR`, "
+            "`tailo update DELTA.csv`, `tailo ingest DUMP [-o OUT]`, `tailo serve`, "
+            "`tailo daemon start|stop|status|run`, `tailo bench`, `tailo result-cache stats|clear`"
+        ),
+    )
+    _add_common_args(p)
+    _add_convert_args(p)
+    _add_result_cache_args(p)
+    p.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read stdin line by line and write each converted line immediately.",
+    )
+    p.add_argument(
+        "--format",
+        choices=("text", "jsonl"),
+        default="text",
+        help=(
+            "Output converted text (default) or one JSON token per line with source "
+            "offsets, headword, readings and unknown flag."
+        ),
+    )
     p.add_argument("text", nargs="*", help="Text to convert (or use stdin).")
     return p
 
@@ -249,21 +391,538 @@ def build_lookup_parser() -> argparse.ArgumentParser:
     return p
 
 
-def main(argv: list[str] | None = None) -> int:
+def build_rlookup_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="tailo rlookup",
+        description="Find headwords by 台羅/POJ romanization (tone marks or tone numbers).",
+    )
+    _add_common_args(p)
+    p.add_argument(
+        "--toneless",
+        action="store_true",
+        help="Ignore tones: `tsit` also finds tsi̍t, tsít, ...",
+    )
+    p.add_argument(
+        "--ignore-hyphens",
+        action="store_true",
+        help="Ignore syllable hyphens/spaces: `tsi̍ttuā` finds tsi̍t-tuā.",
+    )
+    p.add_argument("romanization", help="Romanization to look up, e.g. tsit8 or tsi̍t")
+    return p
+
+
+def build_match_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="tailo match",
+        description="List headwords by prefix or wildcard pattern, in dictionary order.",
+    )
+    _add_common_args(p)
+    p.add_argument("--limit", type=int, default=50, help="Results per page (default: 50).")
+    p.add_argument("--offset", type=int, default=0, help="Skip this many matches (default: 0).")
+    p.add_argument("pattern", help="`一*` (prefix), `一?仔` (`?` = one char, `*` = any run).")
+    return p
+
+
+def build_search_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="tailo search",
+        description="Full-text search over definitions, examples, English glosses and pages.",
+    )
+    _add_common_args(p)
+    p.add_argument("--limit", type=int, default=20, help="Results per page (default: 20).")
+    p.add_argument("--offset", type=int, default=0, help="Skip this many results (default: 0).")
+    p.add_argument("query", nargs="+", help="Terms; every term must occur (substring match).")
+    return p
+
+
+def build_page_parser() -> argparse.ArgumentParser:
+    from .pages import SCALES
+
+    p = argparse.ArgumentParser(
+        prog="tailo page",
+        description="Print the dictionary page(s) of a headword and the path of each scan.",
+    )
+    _add_common_args(p)
+    p.add_argument("--scans", help="Scan directory (default: ./scan or repo scan/).")
+    p.add_argument(
+        "--scale",
+        type=int,
+        choices=SCALES,
+        default=1,
+        help="Downsample the scans by this factor, through the image cache (default: 1).",
+    )
+    p.add_argument("word", help="Headword (Hanzi).")
+    return p
+
+
+def build_batch_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="tailo batch",
+        description="Convert every matching file under a directory, in parallel and resumably.",
+    )
+    _add_common_args(p)
+    _add_convert_args(p)
+    _add_result_cache_args(p)
+    p.add_argument("in_dir", help="Input directory (searched recursively).")
+    p.add_argument("out_dir", help="Output directory (same relative paths; holds the manifest).")
+    p.add_argument("--glob", default="*.txt", help="File name pattern (default: *.txt).")
+    p.add_argument(
+        "-j",
+        "--jobs",
+        type=_positive_int,
+        default=None,
+        help="Worker processes (default: number of CPUs).",
+    )
+    p.add_argument("-q", "--quiet", action="store_true", help="Only print the final summary.")
+    return p
+
+
+def cmd_batch(args: argparse.Namespace) -> int:
+    from .batch import run_batch
+
+    in_dir = Path(args.in_dir)
+    if not in_dir.is_dir():
+        print(f"not a directory: {in_dir}", file=sys.stderr)
+        return 2
+    version = None
+    if args.mode != "poj":
+        # Build the compiled cache once here; workers then just mmap it.
+        conv = _converter_for(args)
+        try:
+            version = conv.load().dict_version
+        except (FileNotFoundError, ValueError) as e:
+            return _dict_error(conv, e)
+    return run_batch(
+        _converter_kwargs(args),
+        _convert_options(args),
+        in_dir,
+        Path(args.out_dir),
+        pattern=args.glob,
+        jobs=args.jobs,
+        quiet=args.quiet,
+        stats=getattr(args, "stats_sink", None),
+        dict_version=version,
+    )
+
+
+def build_update_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="tailo update",
+        description=(
+            "Apply a delta CSV (added / changed / deleted ids) to dict.csv and patch its "
+            "caches in place."
+        ),
+    )
+    p.add_argument("--dict", help="Path to dict.csv (default: ./dict.csv or repo dict.csv).")
+    p.add_argument(
+        "delta",
+        help="Delta CSV with dict.csv columns; an `op` column of `delete` removes that id.",
+    )
+    p.add_argument("-q", "--quiet", action="store_true", help="Only print the final summary.")
+    return p
+
+
+def cmd_update(args: argparse.Namespace) -> int:
+    from .delta import apply_delta
+
+    dict_path = Path(args.dict or default_dict_path())
     try:
-        argv = list(sys.argv[1:] if argv is None else argv)
+        result = apply_delta(
+            dict_path, Path(args.delta), progress=None if args.quiet else _warn
+        )
+    except FileNotFoundError as e:
+        print(f"not found: {e.filename}", file=sys.stderr)
+        return 2
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    print(
+        f"added {result.added}, changed {result.changed}, deleted {result.deleted}; "
+        f"version {result.version}"
+    )
+    return 0
+
+
+def build_ingest_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="tailo ingest",
+        description=(
+            "Build a compiled dictionary (usable as --dict) and its full-text index "
+            "straight from the upstream SQL dump, without dict.csv."
+        ),
+    )
+    p.add_argument("dump", help="SQL dump (dic_can.txt), or a SQLite database with the dic table.")
+    p.add_argument(
+        "-o",
+        "--output",
+        default="dict.tldc",
+        help="Compiled dictionary to write (default: %(default)s).",
+    )
+    p.add_argument(
+        "--no-orthography",
+        action="store_true",
+        help="Compile without the POJ→台羅 spelling conversion (see tailo --no-orthography).",
+    )
+    p.add_argument(
+        "--no-fulltext", action="store_true", help="Do not build the `tailo search` index."
+    )
+    p.add_argument("-q", "--quiet", action="store_true", help="Only print the final summary.")
+    return p
+
+
+def cmd_ingest(args: argparse.Namespace) -> int:
+    import sqlite3
+
+    from .ingest import ingest
+
+    try:
+        result = ingest(
+            Path(args.dump),
+            Path(args.output),
+            orthography=not args.no_orthography,
+            fulltext=not args.no_fulltext,
+            progress=None if args.quiet else _warn,
+        )
+    except FileNotFoundError as e:
+        print(f"not found: {e.filename}", file=sys.stderr)
+        return 2
+    except OSError as e:  # A directory, no permission, disk full, …
+        print(f"{e.strerror}: {e.filename}" if e.filename else str(e), file=sys.stderr)
+        return 2
+    except (ValueError, RuntimeError, sqlite3.Error) as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    print(
+        f"{result.rows} rows, {result.entries} headwords → {result.output}; "
+        f"version {result.version} ({result.seconds:.1f}s)"
+    )
+    return 0
+
+
+def build_serve_parser() -> argparse.ArgumentParser:
+    from .server import DEFAULT_HOST, DEFAULT_PORT, MAX_BATCH
+
+    p = argparse.ArgumentParser(
+        prog="tailo serve",
+        description=(
+            "Serve convert / lookup as a local HTTP JSON API, batching concurrent requests "
+            "onto a pool of worker processes."
+        ),
+    )
+    _add_common_args(p)
+    _add_result_cache_args(p)
+    p.add_argument("--host", default=DEFAULT_HOST, help="Address to bind (default: %(default)s).")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port (default: %(default)s; 0 = any).")
+    p.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes (default: CPU count; 0 = one thread in the server process).",
+    )
+    p.add_argument(
+        "--max-batch",
+        type=int,
+        default=MAX_BATCH,
+        help="Most requests sent to a worker at once (default: %(default)s).",
+    )
+    p.add_argument(
+        "--batch-wait",
+        type=float,
+        default=0.0,
+        help="Milliseconds a batch waits for more requests before dispatch (default: 0).",
+    )
+    return p
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    from .server import serve
+
+    def ready(host: str, port: int) -> None:
+        print(f"listening on http://{host}:{port}", file=sys.stderr, flush=True)
+
+    try:
+        serve(
+            _converter_kwargs(args),
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            max_batch=max(1, args.max_batch),
+            max_wait=max(0.0, args.batch_wait) / 1000,
+            on_ready=ready,
+        )
+    except FileNotFoundError as e:
+        print(f"dict.csv not found: {e.filename} (use --dict PATH)", file=sys.stderr)
+        return 2
+    except (OSError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    return 0
+
+
+def build_bench_parser() -> argparse.ArgumentParser:
+    from .bench import DEFAULT_SIZES, STAGES
+
+    p = argparse.ArgumentParser(
+        prog="tailo bench",
+        description="Benchmark each pipeline stage on synthetic, reproducible inputs.",
+    )
+    p.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="Comma-separated synthetic dict.csv sizes in entries (default: %(default)s).",
+    )
+    p.add_argument(
+        "--stages",
+        default=",".join(STAGES),
+        help="Comma-separated stages to run (default: all).",
+    )
+    p.add_argument("--lines", type=int, default=2000, help="Corpus lines (default: 2000).")
+    p.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; fastest counts.")
+    p.add_argument("--seed", type=int, default=0, help="Generator seed (default: 0).")
+    p.add_argument(
+        "--work-dir",
+        help="Where generated dictionaries and caches live (default: <cache dir>/bench).",
+    )
+    p.add_argument("--json", help="Write results as JSON to this file.")
+    p.add_argument("--baseline", help="Compare against results from a previous `--json` run.")
+    p.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Flag stages more than this fraction slower than the baseline (default: 0.25).",
+    )
+    return p
+
+
+def cmd_bench(args: argparse.Namespace) -> int:
+    from .bench import STAGES, compare, read_results, run_benchmarks, write_results
+
+    try:
+        sizes = tuple(int(s) for s in args.sizes.split(",") if s.strip())
+    except ValueError:
+        print(f"invalid --sizes: {args.sizes}", file=sys.stderr)
+        return 2
+    stages = tuple(s.strip() for s in args.stages.split(",") if s.strip())
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print(
+            f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})",
+            file=sys.stderr,
+        )
+        return 2
+    baseline = None
+    if args.baseline:
+        try:
+            baseline = read_results(Path(args.baseline))
+        except (OSError, ValueError) as e:
+            print(f"cannot read baseline: {e}", file=sys.stderr)
+            return 2
+
+    work_dir = Path(args.work_dir) if args.work_dir else default_cache_dir() / "bench"
+    results = run_benchmarks(
+        work_dir,
+        sizes=sizes,
+        stages=stages,
+        lines=args.lines,
+        repeat=max(1, args.repeat),
+        seed=args.seed,
+        progress=print,
+    )
+    if args.json:
+        write_results(Path(args.json), results)
+
+    if baseline is None:
+        return 0
+    rows = compare(results, baseline, threshold=args.threshold)
+    regressions = 0
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        regressions += bool(row["regression"])
+        print(
+            f"{row['stage']:12} {row['size']:>8}  {row['baseline_chars_per_s']:>12,.0f} -> "
+            f"{row['current_chars_per_s']:>12,.0f} chars/s  x{row['ratio']:.2f}  {flag}".rstrip()
+        )
+    if regressions:
+        print(
+            f"{regressions} stage(s) slower than baseline by more than {args.threshold:.0%}",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+def build_result_cache_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="tailo result-cache",
+        description="Inspect or empty the persistent result cache (see `--result-cache`).",
+    )
+    p.add_argument(
+        "action",
+        choices=("stats", "clear"),
+        help="`stats` prints entries, size, hit rate and evictions as JSON.",
+    )
+    p.add_argument(
+        "--path",
+        type=_result_cache_path,
+        default="",
+        help="Cache file (default: results.sqlite in the cache dir).",
+    )
+    return p
 
-        if argv and argv[0] == "lookup":
-            parser = build_lookup_parser()
-            args = parser.parse_args(argv[1:])
-            return cmd_lookup(args)
 
-        if argv and argv[0] == "convert":
-            argv = argv[1:]
+def cmd_result_cache(args: argparse.Namespace) -> int:
+    import json
+
+    from .result_cache import ResultCache
+
+    if args.action == "stats" and not args.path.exists():
+        print(f"no result cache at {args.path}", file=sys.stderr)
+        return 1
+    cache = ResultCache(args.path)
+    try:
+        if args.action == "clear":
+            cache.clear()
+        else:
+            print(json.dumps(cache.info(), indent=2))
+    finally:
+        cache.close()
+    return 0
+
+
+def build_daemon_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="tailo daemon",
+        description="Keep dictionaries and converters loaded in a background process.",
+    )
+    p.add_argument(
+        "action",
+        choices=("start", "stop", "status", "run"),
+        help="`start` spawns a detached daemon, `run` serves in the foreground.",
+    )
+    p.add_argument(
+        "--socket",
+        help="Unix socket path (default: $TAILO_DAEMON_SOCKET or $XDG_RUNTIME_DIR/tailo-cli.sock).",
+    )
+    return p
+
+
+def cmd_daemon(args: argparse.Namespace) -> int:
+    from . import daemon
+
+    socket_path = Path(args.socket) if args.socket else default_socket_path()
+    if args.action == "run":
+        try:
+            daemon.serve(socket_path, _run)
+        except RuntimeError as e:
+            print(str(e), file=sys.stderr)
+            return 1
+        return 0
+    if args.action == "start":
+        pid = daemon.start(socket_path)
+        if pid is None:
+            print(f"tailo daemon failed to start on {socket_path}", file=sys.stderr)
+            return 1
+        print(f"running (pid {pid}) on {socket_path}")
+        return 0
+    if args.action == "stop":
+        if not daemon.stop(socket_path):
+            print("not running", file=sys.stderr)
+            return 1
+        return 0
+    pid = daemon.ping(socket_path)
+    if pid is None:
+        print("not running")
+        return 1
+    print(f"running (pid {pid}) on {socket_path}")
+    return 0
+
+
+def _run_via_daemon(argv: list[str]) -> int | None:
+    """Forward the command to a running daemon; None means "do it in-process"."""
+    if os.environ.get("TAILO_NO_DAEMON") or not default_socket_path().exists():
+        return None
+    from . import daemon
+
+    stdin_text = None
+    if not argv or argv[0] not in ("lookup", "rlookup", "match", "search", "page"):
+        args = build_convert_parser().parse_args(argv[1:] if argv and argv[0] == "convert" else argv)
+        if args.stream or (args.format == "jsonl" and not args.text):
+            return None  # Streaming must not buffer the whole input in a request.
+        if not args.text:
+            stdin_text = sys.stdin.read()
+
+    result = daemon.request(argv, stdin=stdin_text)
+    if result is None:
+        if stdin_text is not None:
+            sys.stdin = io.StringIO(stdin_text)  # Already consumed: replay it in-process.
+        return None
+    rc, out, err = result
+    sys.stdout.write(out)
+    sys.stdout.flush()
+    sys.stderr.write(err)
+    return rc
+
+
+def _with_stats(cmd, args: argparse.Namespace) -> int:
+    """Run `cmd(args)`; with `--stats`, collect and report timings/counters on stderr."""
+    if not args.stats:
+        return cmd(args)
+    args.stats_sink = stats = Stats()
+    try:
+        with stats.stage("total"):
+            return cmd(args)
+    finally:
+        stats.report(sys.stderr)
+
+
+def _run(argv: list[str]) -> int:
+    if argv and argv[0] == "lookup":
+        parser = build_lookup_parser()
+        args = parser.parse_args(argv[1:])
+        return _with_stats(cmd_lookup, args)
+
+    if argv and argv[0] == "rlookup":
+        return _with_stats(cmd_rlookup, build_rlookup_parser().parse_args(argv[1:]))
+
+    if argv and argv[0] == "match":
+        return _with_stats(cmd_match, build_match_parser().parse_args(argv[1:]))
+
+    if argv and argv[0] == "search":
+        return _with_stats(cmd_search, build_search_parser().parse_args(argv[1:]))
+
+    if argv and argv[0] == "page":
+        return _with_stats(cmd_page, build_page_parser().parse_args(argv[1:]))
+
+    if argv and argv[0] == "convert":
+        argv = argv[1:]
+
+    parser = build_convert_parser()
+    args = parser.parse_args(argv)
+    return _with_stats(cmd_convert, args)
+
+
+def main(argv: list[str] | None = None) -> int:
+    try:
+        argv = list(sys.argv[1:] if argv is None else argv)
 
-        parser = build_convert_parser()
-        args = parser.parse_args(argv)
-        return cmd_convert(args)
+        if argv and argv[0] == "daemon":
+            return cmd_daemon(build_daemon_parser().parse_args(argv[1:]))
+        if argv and argv[0] == "batch":
+            return _with_stats(cmd_batch, build_batch_parser().parse_args(argv[1:]))
+        if argv and argv[0] == "update":
+            return cmd_update(build_update_parser().parse_args(argv[1:]))
+        if argv and argv[0] == "ingest":
+            return cmd_ingest(build_ingest_parser().parse_args(argv[1:]))
+        if argv and argv[0] == "serve":
+            return cmd_serve(build_serve_parser().parse_args(argv[1:]))
+        if argv and argv[0] == "bench":
+            return cmd_bench(build_bench_parser().parse_args(argv[1:]))
+        if argv and argv[0] == "result-cache":
+            return cmd_result_cache(build_result_cache_parser().parse_args(argv[1:]))
+
+        rc = _run_via_daemon(argv)
+        if rc is not None:
+            return rc
+        return _run(argv)
     except BrokenPipeError:
         return 0
 
@@ -0,0 +1,842 @@
+from __future__ import annotations
+
+import io
+import os
+import re
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from itertools import groupby
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, TextIO
+
+from .converter import Segment, _is_wordish, contains_hanzi, iter_segments, render_segments
+from .romanize import (
+    convert_numeric_poj_in_text,
+    convert_poj_word_to_tailo,
+    numeric_poj_token_to_tailo,
+    poj_token_to_tailo,
+)
+from .stats import Stats, timed
+from .variants import fold_mapping, fold_variants
+
+# The dictionary cache, indexes, IPA and OpenCC are imported where first used, so
+# e.g. `tailo --mode poj` never loads them (see `test_startup_import_budget`).
+if TYPE_CHECKING:
+    from .fulltext import FulltextIndex, SearchResult
+    from .headword_index import HeadwordIndex
+    from .layers import Layer
+    from .pages import PageHit, PageIndex, ScanDir
+    from .result_cache import ResultCache
+    from .reverse_index import ReverseIndex
+    from .s2t import S2TTable
+    from .search import SortedHeadwords
+    from .trie import HeadwordTrie
+
+MODES = ("auto", "hanzi", "poj")
+OUTPUTS = ("tailo", "ipa")
+
+# Longer texts are converted but not stored in the result cache: they rarely repeat
+# and would crowd out the short strings (UI text, subtitles, templates) it is for.
+_MAX_CACHED_CHARS = 4096
+
+_NON_SPACE_RE = re.compile(r"\S+")
+
+
+class Token(NamedTuple):
+    """
+    One token of `Converter.tokens`. `start` / `end` are offsets into the whole input
+    and `text` is `input[start:end]`; whitespace between tokens is not emitted.
+    """
+
+    start: int
+    end: int
+    text: str
+    headword: str | None  # The dictionary headword matched (folded / 繁 spelling), else None.
+    reading: str | None  # Chosen reading; romanized text for non-Hanzi; None when unknown.
+    alternatives: list[str]  # The headword's other readings.
+    unknown: bool  # A Hanzi character with no dictionary match.
+
+
+def default_dict_path() -> Path:
+    """`./dict.csv` if it exists, else the one at the repository root."""
+    cwd_dict = Path.cwd() / "dict.csv"
+    if cwd_dict.exists():
+        return cwd_dict
+    return Path(__file__).resolve().parent.parent / "dict.csv"
+
+
+def _unique(items: list[str]) -> list[str]:
+    out: list[str] = []
+    seen: set[str] = set()
+    for item in items:
+        if item in seen:
+            continue
+        seen.add(item)
+        out.append(item)
+    return out
+
+
+def _score(segments: list[Segment]) -> tuple[int, int, int]:
+    """Rank segmentations: most matched characters, then fewest unknowns, then fewest segments."""
+    matched_chars = sum(len(s.piece) for s in segments if s.readings)
+    unknown_chars = sum(1 for s in segments if s.unknown)
+    matched_segments = sum(1 for s in segments if s.readings)
+    return matched_chars, -unknown_chars, -matched_segments
+
+
+class _CountingMapping:
+    """`mapping.get` that counts probes (only used while stats are collected)."""
+
+    def __init__(self, mapping: Mapping[str, list[str]], stats: Stats) -> None:
+        self._mapping = mapping
+        self._stats = stats
+
+    def get(self, key: str, default=None):
+        self._stats.add("segment.probes")
+        return self._mapping.get(key, default)
+
+
+class _CountingTrie:
+    """`HeadwordTrie.longest_match` that counts probes (only used while stats are collected)."""
+
+    def __init__(self, trie: HeadwordTrie, stats: Stats) -> None:
+        self._trie = trie
+        self._stats = stats
+
+    def longest_match(self, text: str, start: int) -> tuple[int, list[str]] | None:
+        self._stats.add("segment.probes")
+        return self._trie.longest_match(text, start)
+
+
+def _hanzi_runs(segments: list[Segment]) -> Iterator[tuple[int, int, bool]]:
+    """Maximal runs of Hanzi segments: `(first, stop, has_unknown)` as indexes into `segments`."""
+    i = 0
+    n = len(segments)
+    while i < n:
+        if not (segments[i].readings or segments[i].unknown):
+            i += 1
+            continue
+        j = i
+        has_unknown = False
+        while j < n and (segments[j].readings or segments[j].unknown):
+            has_unknown = has_unknown or segments[j].unknown
+            j += 1
+        yield i, j, has_unknown
+        i = j
+
+
+class Converter:
+    """
+    Long-lived Hanzi/POJ → 台羅 converter.
+
+    Holds the dictionary mapping, the longest-match trie and the OpenCC handle, so
+    services can load once and then call `convert()` / `convert_many()` / `lookup()`
+    many times. The dictionary is loaded on first use (or explicitly via `load()`).
+
+    Segmentation is a single longest-match pass over variant-folded text (臺/台,
+    裏/裡, … see `variants.py`); the dictionary is folded the same way when it is
+    built. Hanzi runs that still contain unmatched characters are converted
+    Simplified→Traditional (`opencc`, default s2tw) and the result is kept only if
+    it matches more. That conversion uses the dictionary's own table (`s2t.py`,
+    built once with OpenCC and cached); `opencc_fallback=True` also tries full
+    OpenCC on runs the table leaves unmatched. `opencc=None` disables both. If
+    OpenCC is missing, `on_opencc_error(message)` is called once and conversion
+    continues without it; without that callback the RuntimeError propagates.
+
+    `overlays` are dictionaries layered on top of `dict_path`, lowest priority first:
+    paths, `(path, "override" | "extend")` pairs or `layers.Layer`s. Each is cached on
+    its own and merged into the one mapping segmentation sees (see `layers.py`).
+    Headword search and page lookups still use `dict_path` alone.
+
+    `result_cache` (a SQLite file path, opt-in) persists `convert()` results keyed by
+    the dictionary version and every option that changes the output, shared by all
+    processes using the file and bounded to `result_cache_bytes` (least recently used
+    results are evicted; see `result_cache.py`).
+
+    `stats` (a `Stats`, also settable as an attribute) collects per-stage timings and
+    counters; with None (the default) nothing is measured.
+    """
+
+    def __init__(
+        self,
+        dict_path: str | Path | None = None,
+        *,
+        overlays: Sequence[Layer | tuple[str | Path, str] | str | Path] = (),
+        mapping: Mapping[str, list[str]] | None = None,
+        max_key_len: int | None = None,
+        orthography: bool = True,
+        opencc: str | None = "s2tw",
+        opencc_fallback: bool = False,
+        use_cache: bool = True,
+        mode: str = "auto",
+        ambiguous: str = "first",
+        unknown: str = "keep",
+        output: str = "tailo",
+        trie: bool | None = None,
+        on_opencc_error: Callable[[str], None] | None = None,
+        stats: Stats | None = None,
+        result_cache: str | Path | None = None,
+        result_cache_bytes: int | None = None,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        if output not in OUTPUTS:
+            raise ValueError(f"output must be one of {OUTPUTS}")
+        self.dict_path = Path(dict_path) if dict_path is not None else None
+        self.overlays: tuple[Layer, ...] = ()
+        if overlays:
+            from .layers import as_layers
+
+            if mapping is not None:
+                raise ValueError("overlays apply to dict_path, not to an in-memory mapping")
+            self.overlays = as_layers(overlays)
+        self.orthography = orthography
+        self.opencc = opencc
+        self.opencc_fallback = opencc_fallback
+        self.use_cache = use_cache
+        self.mode = mode
+        self.ambiguous = ambiguous
+        self.unknown = unknown
+        self.output = output
+        self._trie_policy = trie
+        self._on_opencc_error = on_opencc_error
+        self.stats = stats
+        self._max_key_len = max_key_len
+        if mapping is not None:
+            from .dict_cache import CompiledDict
+
+            if isinstance(mapping, CompiledDict):
+                # Folded at build time.
+                if max_key_len is None:
+                    self._max_key_len = mapping.max_key_len
+            else:
+                mapping = fold_mapping(mapping)
+                if max_key_len is None:
+                    self._max_key_len = max((len(k) for k in mapping), default=0)
+        self._mapping = mapping
+        self._matcher: HeadwordTrie | None = None
+        self._headwords: HeadwordIndex | None = None
+        self._reverse: ReverseIndex | None = None
+        self._sorted: SortedHeadwords | None = None
+        self._fulltext: FulltextIndex | None = None
+        self._pages: PageIndex | None = None
+        self._scans: ScanDir | None = None
+        self._s2t: S2TTable | bool | None = None  # False: no table for this config.
+        self.result_cache = Path(result_cache) if result_cache is not None else None
+        self.result_cache_bytes = result_cache_bytes
+        self._results: ResultCache | None = None
+        self._results_pid = 0
+
+    # -- dictionary -------------------------------------------------------------------
+
+    def load(self) -> Converter:
+        """Load the dictionary now (raises FileNotFoundError / ValueError)."""
+        if self._mapping is None:
+            from .layers import load_layered
+
+            path = self.dict_path or default_dict_path()
+            with timed(self.stats, "dict_load"):
+                self._mapping, self._max_key_len = load_layered(
+                    path,
+                    self.overlays,
+                    orthography=self.orthography,
+                    use_cache=self.use_cache,
+                    stats=self.stats,
+                )
+        if self._trie_policy and self._matcher is None:
+            from .trie import HeadwordTrie
+
+            with timed(self.stats, "trie_build"):
+                self._matcher = HeadwordTrie.from_mapping(self._mapping)
+        return self
+
+    @property
+    def mapping(self) -> Mapping[str, list[str]]:
+        self.load()
+        assert self._mapping is not None
+        return self._mapping
+
+    @property
+    def dict_version(self) -> str | None:
+        """Content version of the loaded dict.csv (None for an in-memory `mapping`)."""
+        return getattr(self.mapping, "version", None)
+
+    @property
+    def max_key_len(self) -> int:
+        self.load()
+        return self._max_key_len or 0
+
+    def _matcher_for(self, text_len: int) -> HeadwordTrie | None:
+        if self._matcher is None and self._trie_policy is not False:
+            # Building the trie costs roughly one pass over the dictionary; it only pays off
+            # once probing `max_key_len` substrings per character would touch more entries.
+            if self._trie_policy or text_len * self.max_key_len >= len(self.mapping):
+                from .trie import HeadwordTrie
+
+                mapping = self.mapping
+                with timed(self.stats, "trie_build"):
+                    self._matcher = HeadwordTrie.from_mapping(mapping)
+        return self._matcher
+
+    # -- conversion -------------------------------------------------------------------
+
+    def _s2t_table(self) -> S2TTable | None:
+        """
+        The dictionary's Simplified→Traditional table for `opencc`, or None when the
+        config has no inverse to build it with or OpenCC is not installed.
+        """
+        if self._s2t is None:
+            from .opencc_util import to_simplified
+            from .s2t import INVERSE_CONFIGS, open_s2t_table
+
+            self._s2t = False
+            inverse = INVERSE_CONFIGS.get(self.opencc or "")
+            if inverse is None:
+                return None
+            path = self.dict_path
+            if path is None and self._mapping is None:
+                path = default_dict_path()
+            try:
+                with timed(self.stats, "s2t_table"):
+                    self._s2t = open_s2t_table(
+                        path,
+                        lambda: self.mapping,
+                        lambda text: to_simplified(text, config=inverse),
+                        config=self.opencc,
+                        layers=[layer.path for layer in self.overlays],
+                        use_cache=self.use_cache,
+                        stats=self.stats,
+                    )
+            except RuntimeError:
+                pass  # OpenCC missing: reported by `_opencc` on the first conversion.
+        return self._s2t or None
+
+    def _to_traditional(self, text: str) -> str | None:
+        if self.opencc is None:
+            return None
+        table = self._s2t_table()
+        if table is None:
+            return self._opencc(text)
+        with timed(self.stats, "s2t"):
+            return table.convert(text)
+
+    def _opencc(self, text: str) -> str | None:
+        """Full OpenCC conversion of `text` (None once OpenCC turned out to be missing)."""
+        if self.opencc is None:
+            return None
+        from .opencc_util import to_traditional
+
+        try:
+            with timed(self.stats, "opencc"):
+                return to_traditional(text, config=self.opencc)
+        except RuntimeError as e:
+            if self._on_opencc_error is None:
+                raise
+            self._on_opencc_error(str(e))
+            # Report once, not once per call.
+            if self._s2t:
+                self.opencc_fallback = False
+            else:
+                self.opencc = None
+            return None
+
+    def _segment_pass(self, text: str, matcher: HeadwordTrie | None) -> list[Segment]:
+        mapping = self.mapping
+        max_len = self.max_key_len
+        stats = self.stats
+        if stats is None:
+            return list(
+                iter_segments(
+                    text, mapping, max_key_len=max_len, matcher=matcher, folded=fold_variants(text)
+                )
+            )
+        with stats.stage("segment"):
+            stats.add("segment.candidates")
+            stats.add("segment.chars", len(text))
+            return list(
+                iter_segments(
+                    text,
+                    _CountingMapping(mapping, stats),  # type: ignore[arg-type]
+                    max_key_len=max_len,
+                    matcher=_CountingTrie(matcher, stats) if matcher else None,  # type: ignore
+                    folded=fold_variants(text),
+                )
+            )
+
+    def _segment(self, text: str) -> list[Segment]:
+        """
+        One longest-match pass over `text`, then an OpenCC retry for just the Hanzi
+        runs that still have unknown characters. Unknown characters keep their
+        original spelling.
+        """
+        segments = self._segment_pass(text, self._matcher_for(len(text)))
+        if self.opencc is None or not any(s.unknown for s in segments):
+            return segments
+
+        out: list[Segment] = []
+        done = 0
+        for first, stop, has_unknown in list(_hanzi_runs(segments)):
+            if not has_unknown:
+                continue
+            start, end = segments[first].start, segments[stop - 1].end
+            run = text[start:end]
+            converted = self._to_traditional(run)
+            if converted is None:
+                break
+            best = _score(segments[first:stop])
+            retry = None
+            if converted != run:
+                retry = self._segment_pass(converted, self._matcher)
+                if _score(retry) <= best:
+                    retry = None
+            if self.opencc_fallback and self._s2t and (
+                retry is None or any(s.unknown for s in retry)
+            ):
+                full = self._opencc(run)
+                if full is not None and full not in (run, converted):
+                    other = self._segment_pass(full, self._matcher)
+                    if _score(other) > (best if retry is None else _score(retry)):
+                        converted, retry = full, other
+            if retry is None:
+                continue
+            same_len = len(converted) == len(run)
+            out.extend(segments[done:first])
+            for seg in retry:
+                if same_len:
+                    piece = seg.piece if seg.readings else run[seg.start : seg.end]
+                    out.append(Segment(start + seg.start, start + seg.end, piece, seg.readings))
+                else:
+                    # Phrase-level configs (s2twp) may change the length; offsets then
+                    # only locate the run, not each segment.
+                    out.append(Segment(start, end, seg.piece, seg.readings))
+            done = stop
+        out.extend(segments[done:])
+        return out
+
+    def _convert_hanzi(self, text: str, *, ambiguous: str, unknown: str) -> tuple[str, int]:
+        """Returns `(out, matched_chars)`."""
+        out, matched_chars, matched_segments, unknown_chars = render_segments(
+            self._segment(text), ambiguous=ambiguous, unknown=unknown
+        )
+        if self.stats is not None:
+            self.stats.add("segment.matched_chars", matched_chars)
+            self.stats.add("segment.matched_segments", matched_segments)
+            self.stats.add("segment.unknown_chars", unknown_chars)
+        return out, matched_chars
+
+    def _romanize(self, text: str, *, word: bool) -> str:
+        fn = convert_poj_word_to_tailo if word else convert_numeric_poj_in_text
+        if self.stats is None:
+            return fn(text, orthography=self.orthography)
+        with self.stats.stage("romanize", memo=(poj_token_to_tailo, numeric_poj_token_to_tailo)):
+            return fn(text, orthography=self.orthography)
+
+    def _finish(self, text: str, output: str | None) -> str:
+        if (output or self.output) != "ipa":
+            return text
+        from .ipa import tailo_syllable_to_ipa, tailo_to_ipa
+
+        with timed(self.stats, "ipa", memo=(tailo_syllable_to_ipa,)):
+            return tailo_to_ipa(text)
+
+    def convert(
+        self,
+        text: str,
+        *,
+        mode: str | None = None,
+        ambiguous: str | None = None,
+        unknown: str | None = None,
+        output: str | None = None,
+    ) -> str:
+        """Convert `text` like `tailo --mode MODE`; keyword options override the defaults."""
+        mode = mode or self.mode
+        ambiguous = ambiguous or self.ambiguous
+        unknown = unknown or self.unknown
+        if self.result_cache is None or len(text) > _MAX_CACHED_CHARS:
+            return self._convert(text, mode, ambiguous, unknown, output)
+
+        scope: tuple[tuple[str, object], ...] = (
+            ("mode", mode),
+            ("ambiguous", ambiguous),
+            ("unknown", unknown),
+            ("output", output or self.output),
+            ("orthography", self.orthography),
+        )
+        if mode == "hanzi" or (mode == "auto" and contains_hanzi(text)):
+            version = self.dict_version
+            if version is None:
+                # An in-memory mapping has no version to key results by.
+                return self._convert(text, mode, ambiguous, unknown, output)
+            scope += (
+                ("dict", version),
+                ("opencc", self.opencc),
+                ("opencc_fallback", self.opencc_fallback),
+            )
+        from .result_cache import result_key
+
+        cache = self._result_cache()
+        key = result_key(scope, text)
+        out = cache.get(key)
+        if self.stats is not None:
+            self.stats.add("result_cache.hits" if out is not None else "result_cache.misses")
+        if out is None:
+            opencc = (self.opencc, self.opencc_fallback)
+            out = self._convert(text, mode, ambiguous, unknown, output)
+            # OpenCC turned out to be missing during this call: `key` names a
+            # conversion that did not happen.
+            if (self.opencc, self.opencc_fallback) == opencc:
+                cache.put(key, out)
+        return out
+
+    def _result_cache(self) -> ResultCache:
+        # A SQLite connection must not cross a fork: a worker process opens its own.
+        if self._results is None or self._results_pid != os.getpid():
+            from .result_cache import ResultCache
+
+            assert self.result_cache is not None
+            kwargs = {} if self.result_cache_bytes is None else {"max_bytes": self.result_cache_bytes}
+            self._results = ResultCache(self.result_cache, **kwargs)
+            self._results_pid = os.getpid()
+        return self._results
+
+    def result_cache_info(self) -> dict | None:
+        """Entries, size and hit rate of the result cache (totals across processes), or None."""
+        if self.result_cache is None:
+            return None
+        return self._result_cache().info()
+
+    def _convert(
+        self, text: str, mode: str, ambiguous: str, unknown: str, output: str | None
+    ) -> str:
+        if mode == "poj":
+            out = self._romanize(text, word=True)
+        elif mode == "hanzi":
+            out, _matched = self._convert_hanzi(text, ambiguous=ambiguous, unknown=unknown)
+        elif mode == "auto":
+            out = text
+            if contains_hanzi(text):
+                out, _matched = self._convert_hanzi(text, ambiguous=ambiguous, unknown=unknown)
+            out = self._romanize(out, word=False)
+        else:
+            raise ValueError(f"mode must be one of {MODES}")
+        return self._finish(out, output)
+
+    def convert_many(self, texts: Iterable[str], **options) -> list[str]:
+        """Convert several texts with the same options (the trie is shared across them)."""
+        texts = list(texts)
+        if texts and (options.get("mode") or self.mode) != "poj" and any(map(contains_hanzi, texts)):
+            self._matcher_for(sum(len(t) for t in texts))
+        return [self.convert(text, **options) for text in texts]
+
+    def convert_stream(self, chunks: Iterable[str], **options) -> Iterator[str]:
+        """Convert an iterable of lines/chunks (see `iter_chunks`), yielding output per chunk."""
+        if self._trie_policy is None:
+            # A stream is long by definition, so the trie always pays off there; it is
+            # still built lazily, on the first chunk that actually needs the dictionary.
+            self._trie_policy = True
+        poj = (options.get("mode") or self.mode) == "poj"
+        for chunk in chunks:
+            if not poj:
+                yield self.convert(chunk, **options)
+                continue
+            # `convert_poj_word_to_tailo` strips: convert the core and keep the whitespace
+            # around it, so words on both sides of a split stay apart and indentation stays.
+            core = chunk.strip()
+            if not core:
+                yield chunk
+                continue
+            start = chunk.index(core[0])
+            yield chunk[:start] + self.convert(core, **options) + chunk[start + len(core) :]
+
+    def tokens(
+        self,
+        text: str | Iterable[str],
+        *,
+        mode: str | None = None,
+        output: str | None = None,
+    ) -> Iterator[Token]:
+        """
+        The conversion as a lazy stream of `Token`s with source offsets, straight from
+        segmentation (nothing is joined or re-split). `text` may be a string or an
+        iterable of chunks (see `iter_chunks`); a string is also segmented a line at a
+        time, so memory stays bounded by the longest chunk.
+        """
+        mode = mode or self.mode
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        if isinstance(text, str):
+            chunks: Iterable[str] = iter_chunks(io.StringIO(text))
+        else:
+            chunks = text
+            if self._trie_policy is None:
+                self._trie_policy = True  # See `convert_stream`.
+        offset = 0
+        for chunk in chunks:
+            yield from self._chunk_tokens(chunk, offset, mode, output)
+            offset += len(chunk)
+
+    def _chunk_tokens(
+        self, chunk: str, offset: int, mode: str, output: str | None
+    ) -> Iterator[Token]:
+        if mode == "poj" or not contains_hanzi(chunk):
+            segments = [Segment(0, len(chunk), chunk, None)]
+        else:
+            segments = self._segment(chunk)
+        for (seg_start, seg_end), group in groupby(segments, key=lambda seg: seg[:2]):
+            seg, *rest = group
+            start, end = offset + seg_start, offset + seg_end
+            if rest:
+                # A length-changing OpenCC run (s2twp) only has run-level offsets (see
+                # `_segment`): one token for the whole run rather than several tokens
+                # claiming the same span.
+                out = self._finish(render_segments([seg, *rest])[0], output)
+                yield Token(start, end, chunk[seg_start:seg_end], None, out, [], False)
+            elif seg.readings:
+                vals = [self._finish(v, output) for v in seg.readings]
+                yield Token(start, end, chunk[seg.start : seg.end], seg.piece, vals[0], vals[1:], False)
+            elif seg.unknown:
+                yield Token(start, end, chunk[seg.start : seg.end], None, None, [], True)
+            else:
+                for m in _NON_SPACE_RE.finditer(seg.piece):
+                    word = m.group()
+                    if mode != "hanzi":
+                        word = self._romanize(word, word=mode == "poj")
+                    yield Token(
+                        start + m.start(), start + m.end(), m.group(), None,
+                        self._finish(word, output), [], False,
+                    )
+
+    # -- lookup -----------------------------------------------------------------------
+
+    def _index_lookup(self, cand: str) -> list[str] | None:
+        """
+        Answer from the on-disk headword index without loading the dictionary.
+        Returns None when the index does not apply (mapping already loaded, cache off).
+        """
+        if self._mapping is not None or not self.use_cache or self.overlays:
+            return None
+        if self._headwords is None:
+            from .dict_cache import is_compiled
+            from .headword_index import open_headword_index
+
+            path = self.dict_path or default_dict_path()
+            if is_compiled(path):
+                return None  # Opening it is as cheap as the index.
+            with timed(self.stats, "index_open"):
+                self._headwords = open_headword_index(path, stats=self.stats)
+        if self.stats is not None:
+            self.stats.add("lookup.index_probes")
+        vals: list[str] = []
+        for word in self._headwords.words(cand):
+            tailo = self._romanize(word, word=True)
+            if tailo and tailo not in vals:
+                vals.append(tailo)
+        return vals
+
+    def _lookup_candidates(self, word: str) -> Iterator[str]:
+        """
+        Spellings to try for `word`, lazily: its variant-folded form, then its
+        Simplified→Traditional spellings. Callers stop at the first hit, so the s2t
+        table (built from the whole dictionary) is only needed after a miss.
+        """
+        folded = fold_variants(word)
+        yield folded
+        converted = self._to_traditional(word)
+        if converted is None:
+            return
+        candidates = [folded, fold_variants(converted)]
+        if self.opencc_fallback and self._s2t:
+            full = self._opencc(word)
+            if full is not None:
+                candidates.append(fold_variants(full))
+        yield from _unique(candidates)[1:]
+
+    def lookup(self, word: str, *, output: str | None = None) -> list[str]:
+        """All readings of the headword `word` (or a variant / OpenCC spelling of it), or []."""
+        vals: list[str] = []
+        for cand in self._lookup_candidates(word):
+            found = self._index_lookup(cand)
+            if found is None:
+                if self.stats is not None:
+                    self.stats.add("lookup.dict_probes")
+                found = self.mapping.get(cand)
+            if found:
+                vals = found
+                break
+        return [self._finish(v, output) for v in vals]
+
+    def lookup_best_effort(self, word: str, *, output: str | None = None) -> str | None:
+        """Partial conversion for a word that is not a headword, e.g. `台灣嘛` → `tâi-uân嘛`."""
+        if not contains_hanzi(word):
+            return None
+        out, matched_chars = self._convert_hanzi(word, ambiguous="first", unknown="keep")
+        if matched_chars <= 0:
+            return None
+        return self._finish(out, output)
+
+    # -- reverse lookup ---------------------------------------------------------------
+
+    def reverse_index(self) -> ReverseIndex:
+        """The romanization → headword index (its own cache file, built on first use)."""
+        if self._reverse is None:
+            from .reverse_index import open_reverse_index
+
+            path = self.dict_path
+            if path is None and self._mapping is None:
+                path = default_dict_path()
+            mapping = self.mapping
+            with timed(self.stats, "reverse_build"):
+                self._reverse = open_reverse_index(
+                    mapping,
+                    path,
+                    orthography=self.orthography,
+                    layers=[layer.path for layer in self.overlays],
+                    use_cache=self.use_cache,
+                    stats=self.stats,
+                )
+        return self._reverse
+
+    def rlookup(
+        self,
+        romanization: str,
+        *,
+        tones: bool = True,
+        hyphens: bool = True,
+        output: str | None = None,
+    ) -> list[tuple[str, str]]:
+        """
+        Headwords read as `romanization` (台羅 or POJ; tone marks or numbers), as
+        `(headword, reading)` pairs. See `ReverseIndex.search` for `tones` / `hyphens`.
+        """
+        index = self.reverse_index()
+        with timed(self.stats, "rlookup"):
+            hits = index.search(
+                romanization, tones=tones, hyphens=hyphens, orthography=self.orthography
+            )
+        return [(headword, self._finish(reading, output)) for headword, reading in hits]
+
+    # -- headword search --------------------------------------------------------------
+
+    def sorted_headwords(self) -> SortedHeadwords:
+        """Headwords in codepoint order (the compiled table itself, else sorted once here)."""
+        if self._sorted is None:
+            from .dict_cache import CompiledDict
+            from .search import SortedKeyList
+
+            mapping = self.mapping
+            if isinstance(mapping, CompiledDict):
+                self._sorted = mapping
+            else:
+                self._sorted = SortedKeyList(mapping)
+        return self._sorted
+
+    def match_headwords(
+        self,
+        pattern: str,
+        *,
+        limit: int = 50,
+        offset: int = 0,
+        output: str | None = None,
+    ) -> list[tuple[str, list[str]]]:
+        """
+        `(headword, readings)` for headwords matching `pattern` (`一*` prefix, `一?仔`
+        wildcards; see `search.match_headwords`), in codepoint order, paginated by
+        `offset` / `limit`.
+        """
+        from .search import match_headwords
+
+        keys = self.sorted_headwords()
+        mapping = self.mapping
+        with timed(self.stats, "match"):
+            words = match_headwords(keys, pattern, limit=limit, offset=offset)
+        return [(w, [self._finish(v, output) for v in mapping[w]]) for w in words]
+
+    # -- full-text search -------------------------------------------------------------
+
+    def search(
+        self,
+        query: str,
+        *,
+        limit: int = 20,
+        offset: int = 0,
+        output: str | None = None,
+    ) -> list[SearchResult]:
+        """
+        Ranked full-text search over dict.csv's exp/example/english/han/page columns
+        (see `fulltext.FulltextIndex.search`), with `reading` converted to 台羅 / IPA.
+        The index is built next to the compiled cache on first use.
+        """
+        if self._fulltext is None:
+            from .fulltext import open_fulltext_index
+
+            with timed(self.stats, "index_open"):
+                self._fulltext = open_fulltext_index(
+                    self.dict_path or default_dict_path(), stats=self.stats
+                )
+        with timed(self.stats, "search"):
+            hits = self._fulltext.search(query, limit=limit, offset=offset)
+        return [
+            hit._replace(reading=self._finish(self._romanize(hit.reading, word=True), output))
+            for hit in hits
+        ]
+
+    # -- page scans -------------------------------------------------------------------
+
+    def pages(
+        self, word: str, *, scale: int = 1, scan_dir: str | Path | None = None
+    ) -> list[PageHit]:
+        """
+        Scanned pages of the headword `word` (or a variant / OpenCC spelling of it):
+        one `PageHit` per distinct dict.csv `page`, with its image under `scan_dir`
+        (default `pages.default_scan_dir()`), downsampled by `scale` through the
+        image cache (see `pages.page_image`). Uses the page index, not the dictionary.
+        """
+        from .pages import PageHit, ScanDir, default_scan_dir, open_page_index, page_image
+
+        if self._pages is None:
+            with timed(self.stats, "index_open"):
+                self._pages = open_page_index(
+                    self.dict_path or default_dict_path(), stats=self.stats
+                )
+        root = Path(scan_dir) if scan_dir is not None else default_scan_dir()
+        if self._scans is None or self._scans.root != root:
+            self._scans = ScanDir(root)
+        for cand in self._lookup_candidates(word):
+            codes = self._pages.pages(cand)
+            if codes:
+                break
+        else:
+            return []
+        hits: list[PageHit] = []
+        for code in codes:
+            image = self._scans.path(code)
+            if image is not None and scale != 1:
+                with timed(self.stats, "page_image"):
+                    image = page_image(image, scale, stats=self.stats)
+            hits.append(PageHit(cand, code, image))
+        return hits
+
+
+_CHUNK_LIMIT = 1 << 16
+
+
+def iter_chunks(stream: TextIO, limit: int = _CHUNK_LIMIT) -> Iterator[str]:
+    """
+    Yield input line by line. Lines longer than `limit` are split at the last
+    non-word character, so memory stays bounded without cutting words in half.
+    """
+    pending = ""
+    while True:
+        chunk = stream.readline(limit)
+        if not chunk:
+            break
+        chunk = pending + chunk
+        pending = ""
+        if not chunk.endswith("\n") and len(chunk) >= limit:
+            cut = len(chunk)
+            while cut > 0 and _is_wordish(chunk[cut - 1]):
+                cut -= 1
+            if cut > 0:
+                chunk, pending = chunk[:cut], chunk[cut:]
+        yield chunk
+    if pending:
+        yield pending
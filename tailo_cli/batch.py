@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from .api import Converter, iter_chunks
+from .cache import file_stamp
+from .stats import Stats
+
+MANIFEST_NAME = ".tailo-batch.jsonl"
+
+_worker: Converter | None = None
+_worker_options: dict = {}
+
+
+def _warn(message: str) -> None:
+    print(message, file=sys.stderr)
+
+
+def _init_worker(converter_kwargs: dict, options: dict, collect_stats: bool = False) -> None:
+    global _worker, _worker_options
+    _worker = Converter(**converter_kwargs, trie=True, on_opencc_error=_warn)
+    _worker.stats = Stats() if collect_stats else None
+    _worker_options = options
+
+
+def _convert_file(src: str, dst: str) -> dict | None:
+    """
+    Convert one file (worker side). Returns the worker's stats report since the
+    previous file when stats are collected, else None.
+    """
+    assert _worker is not None
+    dst_path = Path(dst)
+    dst_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst_path.with_name(dst_path.name + ".part")
+    with open(src, "r", encoding="utf-8") as fin, open(tmp, "w", encoding="utf-8") as fout:
+        for chunk in _worker.convert_stream(iter_chunks(fin), **_worker_options):
+            fout.write(chunk)
+    os.replace(tmp, dst_path)
+    if _worker.stats is None:
+        return None
+    report = _worker.stats.to_dict()
+    _worker.stats = Stats()
+    return report
+
+
+def _manifest_options(converter_kwargs: dict, options: dict, dict_version: str | None) -> dict:
+    """Everything that changes the output; a manifest written with other values is not resumable."""
+    opts = dict(converter_kwargs, **options, dict_version=dict_version)
+    opts["dict_path"] = str(Path(opts["dict_path"]).resolve())
+    opts["overlays"] = [[str(Path(path).resolve()), mode] for path, mode in opts.get("overlays", ())]
+    # Results come out the same with or without the result cache.
+    opts.pop("result_cache", None)
+    opts.pop("result_cache_bytes", None)
+    return opts
+
+
+def _read_manifest(path: Path, options: dict) -> dict[str, dict]:
+    """Completed files from a previous run with the same options: relpath -> source stamp."""
+    done: dict[str, dict] = {}
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("options") != options:
+                return {}
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # Torn last line from an interrupted run.
+                done[rec["path"]] = rec["stamp"]
+    except (OSError, ValueError):
+        return {}
+    return done
+
+
+def run_batch(
+    converter_kwargs: dict,
+    options: dict,
+    in_dir: Path,
+    out_dir: Path,
+    *,
+    pattern: str = "*.txt",
+    jobs: int | None = None,
+    quiet: bool = False,
+    stats: Stats | None = None,
+    dict_version: str | None = None,
+) -> int:
+    """
+    Convert every `pattern` file under `in_dir` into the same relative path under
+    `out_dir`, sharded across `jobs` worker processes. Completed files are appended
+    to a manifest in `out_dir`, so an interrupted run resumes where it stopped; a
+    run with other options or another dictionary version starts over.
+    With `stats`, the workers' timings and counters are merged into it.
+
+    `dict_version` is the `Converter.dict_version` of `converter_kwargs` when the
+    caller has already loaded it; otherwise it is loaded here (not in `poj` mode,
+    which does not use the dictionary).
+    """
+    in_dir = in_dir.resolve()
+    out_dir = out_dir.resolve()
+    sources = sorted(
+        p for p in in_dir.rglob(pattern) if p.is_file() and out_dir not in p.parents
+    )
+
+    if dict_version is None and options.get("mode") != "poj":
+        dict_version = Converter(**converter_kwargs).dict_version
+    manifest_options = _manifest_options(converter_kwargs, options, dict_version)
+    manifest = out_dir / MANIFEST_NAME
+    done = _read_manifest(manifest, manifest_options)
+
+    todo: list[tuple[Path, str, dict]] = []
+    for src in sources:
+        rel = src.relative_to(in_dir).as_posix()
+        stamp = file_stamp(src)
+        if done.get(rel) == stamp and (out_dir / rel).exists():
+            continue
+        todo.append((src, rel, stamp))
+    skipped = len(sources) - len(todo)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with manifest.open("w" if not done else "a", encoding="utf-8") as log:
+        if not done:
+            log.write(json.dumps({"options": manifest_options}, ensure_ascii=False) + "\n")
+
+        def record(rel: str, stamp: dict) -> None:
+            log.write(json.dumps({"path": rel, "stamp": stamp}, ensure_ascii=False) + "\n")
+            log.flush()
+
+        converted = 0
+        failed: list[str] = []
+
+        def report(rel: str, error: BaseException | None) -> None:
+            nonlocal converted
+            if error is None:
+                converted += 1
+                if not quiet:
+                    print(f"[{converted + len(failed)}/{len(todo)}] {rel}", file=sys.stderr)
+            else:
+                failed.append(rel)
+                print(f"failed: {rel}: {error}", file=sys.stderr)
+
+        jobs = jobs or os.cpu_count() or 1
+        if jobs == 1 or len(todo) <= 1:
+            _init_worker(converter_kwargs, options, stats is not None)
+            for src, rel, stamp in todo:
+                try:
+                    worker_stats = _convert_file(str(src), str(out_dir / rel))
+                except Exception as e:  # As a worker's error in the pool: this file only.
+                    report(rel, e)
+                    continue
+                if stats is not None and worker_stats:
+                    stats.merge(worker_stats)
+                record(rel, stamp)
+                report(rel, None)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=(converter_kwargs, options, stats is not None),
+            ) as pool:
+                pending: dict[Future, tuple[str, dict]] = {}
+                queue = iter(todo)
+                broken: BrokenProcessPool | None = None
+
+                def submit(src: Path, rel: str, stamp: dict) -> None:
+                    # A worker that died (e.g. killed for memory) breaks the whole pool:
+                    # every file not yet converted is reported as failed, for a rerun.
+                    nonlocal broken
+                    if broken is None:
+                        try:
+                            pending[pool.submit(_convert_file, str(src), str(out_dir / rel))] = (
+                                rel,
+                                stamp,
+                            )
+                            return
+                        except BrokenProcessPool as e:
+                            broken = e
+                    report(rel, broken)
+
+                # Keep a bounded number of tasks in flight so huge corpora don't
+                # materialize one future per file up front.
+                for item in queue:
+                    submit(*item)
+                    if len(pending) >= jobs * 4:
+                        break
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        rel, stamp = pending.pop(fut)
+                        error = fut.exception()
+                        if error is None:
+                            if stats is not None and fut.result():
+                                stats.merge(fut.result())
+                            record(rel, stamp)
+                        report(rel, error)
+                        nxt = next(queue, None)
+                        if nxt is not None:
+                            submit(*nxt)
+                for item in queue:
+                    submit(*item)
+
+    # Workers are done (or were killed with a broken pool): drop partial outputs.
+    for rel in failed:
+        dst = out_dir / rel
+        dst.with_name(dst.name + ".part").unlink(missing_ok=True)
+    print(
+        f"converted {converted}, skipped {skipped} (already done), failed {len(failed)}",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
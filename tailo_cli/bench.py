@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import csv
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from .api import Converter
+from .dict_cache import load_dict
+from .dict_loader import load_dict_csv
+from .ipa import tailo_syllable_to_ipa, tailo_to_ipa
+from .opencc_util import OpenCC, to_simplified, to_traditional
+from .s2t import open_s2t_table
+from .romanize import (
+    convert_numeric_poj_in_text,
+    convert_poj_word_to_tailo,
+    numeric_poj_token_to_tailo,
+    poj_token_to_tailo,
+)
+
+RESULTS_VERSION = 1
+STAGES = ("load_csv", "load_cached", "segment", "romanize", "ipa", "opencc", "s2t")
+DEFAULT_SIZES = (1_000, 10_000, 50_000)
+
+_DICT_HEADER = [
+    "id", "word", "other", "chinese", "exp", "example",
+    "username", "modtime", "han", "english", "page",
+]
+# POJ-ish syllables as written in dict.csv (including `ch`/`chh`, `oa`/`oe` and `N`).
+_ONSETS = [
+    "", "p", "ph", "b", "m", "t", "th", "n", "l", "k", "kh", "g", "ng", "h", "ch", "chh", "j", "s",
+]
+_RIMES = [
+    "a", "e", "i", "o", "u", "oa", "oe", "ai", "au", "iu", "ui", "ia", "io", "iau",
+    "an", "in", "un", "ian", "oan", "ang", "eng", "ong", "iong", "iang",
+    "am", "im", "iam", "aN", "iN", "oaN", "ng", "m",
+]
+_CHECKED = {"n": "t", "m": "p", "ng": "k"}
+# Simplified characters with distinct traditional forms, for the OpenCC corpus.
+_SIMPLIFIED = "台湾语话说这个们来时会对后发电门见长车东乐书学从"
+
+
+def _syllable(rng: random.Random) -> str:
+    onset = rng.choice(_ONSETS)
+    rime = rng.choice(_RIMES)
+    tone = rng.randint(1, 8)
+    if tone in (4, 8):
+        for nasal, stop in _CHECKED.items():
+            if rime.endswith(nasal) and not rime.endswith("N"):
+                rime = rime[: -len(nasal)] + stop
+                break
+        else:
+            rime += "h"
+    return f"{onset}{rime}{tone}"
+
+
+def _hanzi(rng: random.Random) -> str:
+    # The busiest part of the CJK block; keeps headwords dense enough to collide.
+    return chr(rng.randint(0x4E00, 0x4E00 + 3500))
+
+
+def iter_synthetic_entries(count: int, *, seed: int = 0) -> Iterator[tuple[str, str]]:
+    """Deterministic `(headword, poj_word)` pairs shaped like dict.csv (mostly 1–4 chars)."""
+    rng = random.Random(f"dict-{seed}")
+    for _ in range(count):
+        n = rng.choices((1, 2, 3, 4, 5), weights=(20, 50, 15, 12, 3))[0]
+        yield (
+            "".join(_hanzi(rng) for _ in range(n)),
+            "-".join(_syllable(rng) for _ in range(n)),
+        )
+
+
+def generate_dict(path: Path, entries: int, *, seed: int = 0) -> Path:
+    """Write a synthetic dict.csv with the real column layout."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(_DICT_HEADER)
+        for i, (head, word) in enumerate(iter_synthetic_entries(entries, seed=seed)):
+            page = f"A{i % 939:04d}"
+            w.writerow([i, word, "", f"[ {head} ]", f"exp {i}", "", "u", "2008", "", "eng", page])
+    return path
+
+
+def generate_corpus(entries: int, lines: int, *, seed: int = 0) -> dict[str, list[str]]:
+    """
+    Deterministic per-stage inputs for a dictionary of `entries` rows:
+    `hanzi` (dictionary words plus ~10% unknown characters and punctuation),
+    `poj` (tone-number text), `tailo` (its 台羅 form) and `simplified`.
+    """
+    heads = [h for h, _ in iter_synthetic_entries(entries, seed=seed)]
+    rng = random.Random(f"corpus-{seed}")
+    hanzi: list[str] = []
+    poj: list[str] = []
+    simplified: list[str] = []
+    for _ in range(lines):
+        parts: list[str] = []
+        while sum(map(len, parts)) < 40:
+            r = rng.random()
+            if r < 0.1:
+                parts.append(chr(rng.randint(0x6000, 0x7000)))
+            elif r < 0.15:
+                parts.append(rng.choice("，。、！？ "))
+            else:
+                parts.append(rng.choice(heads))
+        hanzi.append("".join(parts))
+        words = ("-".join(_syllable(rng) for _ in range(rng.randint(1, 3))) for _ in range(8))
+        poj.append(" ".join(words))
+        simplified.append("".join(rng.choice(_SIMPLIFIED) for _ in range(40)))
+    tailo = [convert_numeric_poj_in_text(line) for line in poj]
+    return {"hanzi": hanzi, "poj": poj, "tailo": tailo, "simplified": simplified}
+
+
+def _clear_memo_caches() -> None:
+    # Each run starts cold, so results do not depend on what ran before.
+    poj_token_to_tailo.cache_clear()
+    numeric_poj_token_to_tailo.cache_clear()
+    tailo_syllable_to_ipa.cache_clear()
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _measure(
+    calls: list[Callable[[], object]],
+    *,
+    chars: int,
+    repeat: int,
+) -> dict[str, float]:
+    """Time each call `repeat` times (fastest total wins), then one traced run for peak memory."""
+    best_total: float | None = None
+    latencies: list[float] = []
+    for _ in range(repeat):
+        _clear_memo_caches()
+        run: list[float] = []
+        for call in calls:
+            t0 = time.perf_counter()
+            call()
+            run.append(time.perf_counter() - t0)
+        total = sum(run)
+        if best_total is None or total < best_total:
+            best_total = total
+            latencies = run
+    assert best_total is not None
+
+    _clear_memo_caches()
+    tracemalloc.start()
+    try:
+        for call in calls:
+            call()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "calls": len(calls),
+        "chars": chars,
+        "seconds": round(best_total, 6),
+        "chars_per_s": round(chars / best_total, 1) if best_total > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def _stage_calls(
+    stage: str,
+    dict_path: Path,
+    corpus: dict[str, list[str]],
+    cache_dir: Path,
+) -> tuple[list[Callable[[], object]], int] | None:
+    """
+    The calls making up one stage and its input size (characters; bytes of dict.csv
+    for the load stages), or None if the stage is unavailable here.
+    """
+    if stage == "load_csv":
+        return [lambda: load_dict_csv(dict_path)], dict_path.stat().st_size
+    if stage == "load_cached":
+        load_dict(dict_path, cache_dir=cache_dir)  # Build the cache outside the timing.
+        return [lambda: load_dict(dict_path, cache_dir=cache_dir)], dict_path.stat().st_size
+    calls: list[Callable[[], object]]
+    if stage == "segment":
+        mapping, max_len = load_dict(dict_path, cache_dir=cache_dir)
+        conv = Converter(mapping=mapping, max_key_len=max_len, opencc=None, trie=True).load()
+        lines = corpus["hanzi"]
+        calls = [lambda line=line: conv.convert(line, mode="hanzi") for line in lines]
+        return calls, sum(map(len, lines))
+    if stage == "romanize":
+        lines = corpus["poj"]
+        calls = [lambda line=line: convert_numeric_poj_in_text(line) for line in lines]
+        calls += [lambda line=line: convert_poj_word_to_tailo(line) for line in lines]
+        return calls, 2 * sum(map(len, lines))
+    if stage == "ipa":
+        lines = corpus["tailo"]
+        return [lambda line=line: tailo_to_ipa(line) for line in lines], sum(map(len, lines))
+    if stage == "opencc":
+        if OpenCC is None:
+            return None
+        lines = corpus["simplified"]
+        to_traditional("簡", config="s2tw")  # Load the converter outside the timing.
+        calls = [lambda line=line: to_traditional(line, config="s2tw") for line in lines]
+        return calls, sum(map(len, lines))
+    if stage == "s2t":
+        if OpenCC is None:
+            return None
+        mapping, _max_len = load_dict(dict_path, cache_dir=cache_dir)
+        table = open_s2t_table(
+            None, lambda: mapping, lambda text: to_simplified(text, config="tw2s"), config="s2tw"
+        )
+        lines = corpus["simplified"]
+        return [lambda line=line: table.convert(line) for line in lines], sum(map(len, lines))
+    raise ValueError(f"unknown stage: {stage}")
+
+
+def run_benchmarks(
+    work_dir: Path,
+    *,
+    sizes: tuple[int, ...] = DEFAULT_SIZES,
+    stages: tuple[str, ...] = STAGES,
+    lines: int = 2_000,
+    repeat: int = 3,
+    seed: int = 0,
+    progress: Callable[[str], None] | None = None,
+) -> dict:
+    """Generate inputs under `work_dir` (reused when already present) and benchmark each stage."""
+    results: list[dict] = []
+    for size in sizes:
+        dict_path = work_dir / f"dict-{size}-s{seed}.csv"
+        if not dict_path.exists():
+            generate_dict(dict_path, size, seed=seed)
+        corpus = generate_corpus(size, lines, seed=seed)
+        for stage in stages:
+            prepared = _stage_calls(stage, dict_path, corpus, work_dir / "cache")
+            if prepared is None:
+                if progress:
+                    progress(f"{stage:12} {size:>8}  skipped (not available)")
+                continue
+            calls, chars = prepared
+            row = {"stage": stage, "size": size, **_measure(calls, chars=chars, repeat=repeat)}
+            results.append(row)
+            if progress:
+                progress(
+                    f"{stage:12} {size:>8}  {row['seconds']:9.4f}s  p50 {row['p50_ms']:.3f}ms  "
+                    f"p99 {row['p99_ms']:.3f}ms  peak {row['peak_kib']:.0f}KiB"
+                )
+    return {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "platform": sys.platform,
+            "seed": seed,
+            "lines": lines,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, *, threshold: float = 0.25) -> list[dict]:
+    """
+    Rows present in both runs, with `ratio` = baseline / current throughput (time per
+    input character, so runs with different `--lines` compare fairly). `regression` is
+    set when a stage got slower by more than `threshold` (0.25 = 25%).
+    """
+    base = {(r["stage"], r["size"]): r for r in baseline.get("results", [])}
+    rows: list[dict] = []
+    for r in current.get("results", []):
+        b = base.get((r["stage"], r["size"]))
+        if b is None or not b.get("chars_per_s") or not r.get("chars_per_s"):
+            continue
+        ratio = b["chars_per_s"] / r["chars_per_s"]
+        rows.append(
+            {
+                "stage": r["stage"],
+                "size": r["size"],
+                "baseline_chars_per_s": b["chars_per_s"],
+                "current_chars_per_s": r["chars_per_s"],
+                "ratio": round(ratio, 3),
+                "regression": ratio > 1 + threshold,
+            }
+        )
+    return rows
+
+
+def write_results(path: Path, results: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def read_results(path: Path) -> dict:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path}: unsupported benchmark results version {data.get('version')!r}")
+    return data
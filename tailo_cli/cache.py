@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import mmap
+import os
+from pathlib import Path
+
+# `hashlib` and `tempfile` are imported where used: the CLI imports this module for
+# `file_stamp` / `default_socket_path` even when no cache is read or written.
+
+
+def default_cache_dir() -> Path:
+    """`$TAILO_CACHE_DIR`, else `$XDG_CACHE_HOME/tailo-cli`, else `~/.cache/tailo-cli`."""
+    env = os.environ.get("TAILO_CACHE_DIR")
+    if env:
+        return Path(env)
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg) if xdg else Path.home() / ".cache"
+    return base / "tailo-cli"
+
+
+def default_socket_path() -> Path:
+    """`$TAILO_DAEMON_SOCKET`, else `$XDG_RUNTIME_DIR/tailo-cli.sock`, else in the cache dir."""
+    env = os.environ.get("TAILO_DAEMON_SOCKET")
+    if env:
+        return Path(env)
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return Path(runtime) / "tailo-cli.sock"
+    return default_cache_dir() / "daemon.sock"
+
+
+def source_key(path: Path) -> str:
+    """Stable per-file cache key derived from the resolved path."""
+    import hashlib
+
+    return hashlib.sha1(str(path.resolve()).encode("utf-8")).hexdigest()[:16]
+
+
+def file_stamp(path: Path) -> dict[str, int]:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def sha1_file(path: Path) -> str:
+    import hashlib
+
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def check_source(path: Path, recorded: dict | None) -> tuple[str, dict]:
+    """
+    Compare `path` with the source stamp recorded in a cache file.
+    Returns `(state, current)`, where state is "fresh" (size/mtime match),
+    "touched" (same SHA-1, new stamp) or "stale"; `current` is the stamp to record.
+    """
+    stamp = file_stamp(path)
+    recorded = recorded or {}
+    if recorded.get("size") == stamp["size"] and recorded.get("mtime_ns") == stamp["mtime_ns"]:
+        return "fresh", dict(recorded)
+    current = dict(stamp, sha1=sha1_file(path))
+    if recorded.get("sha1") == current["sha1"]:
+        return "touched", current
+    return "stale", current
+
+
+def dict_version(source: dict) -> str:
+    """
+    Version stamp of a dict.csv, recorded by every cache built from it: derived from
+    the content SHA-1 of a `check_source` stamp, so touching or copying the file keeps
+    it and any content change (including an applied delta) moves it.
+    """
+    return source["sha1"][:16]
+
+
+def open_mmap(path: Path) -> mmap.mmap:
+    with path.open("rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write via a temp file + rename so concurrent readers never see a partial file."""
+    import tempfile
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
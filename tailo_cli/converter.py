@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import re
 import unicodedata
+from collections.abc import Iterable, Iterator, Mapping
+from typing import NamedTuple
+
+from .trie import HeadwordTrie
 
 
 def is_hanzi(ch: str) -> bool:
@@ -13,8 +18,21 @@ def is_hanzi(ch: str) -> bool:
     )
 
 
+# The `is_hanzi` ranges as one character class: the regex engine classifies a whole
+# text in C, so runs are found without a Python-level `ord()` per character.
+_HANZI_CLASS = "\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff\U00020000-\U0002a6df"
+_HANZI_RE = re.compile(f"[{_HANZI_CLASS}]")
+_HANZI_RUN_RE = re.compile(f"[{_HANZI_CLASS}]+")
+
+
 def contains_hanzi(text: str) -> bool:
-    return any(is_hanzi(ch) for ch in text)
+    return _HANZI_RE.search(text) is not None
+
+
+def iter_hanzi_runs(text: str) -> Iterator[tuple[int, int]]:
+    """`(start, end)` of each maximal run of Hanzi in `text`."""
+    for m in _HANZI_RUN_RE.finditer(text):
+        yield m.span()
 
 
 def _is_wordish(ch: str) -> bool:
@@ -24,13 +42,134 @@ def _is_wordish(ch: str) -> bool:
     return cat[0] in ("L", "M", "N")
 
 
+class Segment(NamedTuple):
+    """
+    One unit of longest-match segmentation over `text[start:end]`:
+    - dictionary match: `readings` is the entry's list; `piece` the matched headword;
+    - unknown Hanzi: `readings` is None, `piece` the (single) source character;
+    - other text: `readings` is None, `piece` the run of non-Hanzi source text.
+    """
+
+    start: int
+    end: int
+    piece: str
+    readings: list[str] | None
+
+    @property
+    def unknown(self) -> bool:
+        return self.readings is None and len(self.piece) == 1 and is_hanzi(self.piece)
+
+
+def iter_segments(
+    text: str,
+    mapping: Mapping[str, list[str]],
+    *,
+    max_key_len: int,
+    matcher: HeadwordTrie | None = None,
+    folded: str | None = None,
+) -> Iterator[Segment]:
+    """
+    Longest-match segmentation. With `matcher` (a trie built from `mapping`), each
+    position is resolved in one forward walk instead of probing `max_key_len`
+    substrings. Matching runs over `folded` when given (a same-length variant-folded
+    copy of `text`, see `variants.fold_variants`); passthrough pieces come from `text`.
+    """
+    keys = text if folded is None else folded
+    if len(keys) != len(text):
+        raise ValueError("folded text must have the same length as text")
+
+    n = len(text)
+    i = 0
+    find_run = _HANZI_RUN_RE.search
+    while i < n:
+        run = find_run(keys, i)
+        if run is None:
+            # Non-hanzi: pass through as-is, one piece per run.
+            yield Segment(i, n, text[i:], None)
+            break
+        start, end = run.span()
+        if start > i:
+            yield Segment(i, start, text[i:start], None)
+        i = start
+        # Only Hanzi runs reach the matcher. A headword may extend past the run
+        # (e.g. one containing Latin letters); the next search resumes after it.
+        while i < end:
+            match_len = 0
+            match_vals: list[str] | None = None
+            if matcher is not None:
+                found = matcher.longest_match(keys, i)
+                if found is not None:
+                    match_len, match_vals = found
+            else:
+                max_len = min(max_key_len, n - i)
+                for length in range(max_len, 0, -1):
+                    vals = mapping.get(keys[i : i + length])
+                    if vals:
+                        match_len = length
+                        match_vals = vals
+                        break
+
+            if match_len and match_vals:
+                yield Segment(i, i + match_len, keys[i : i + match_len], match_vals)
+                i += match_len
+            else:
+                yield Segment(i, i + 1, text[i], None)
+                i += 1
+
+
+def render_segments(
+    segments: Iterable[Segment],
+    *,
+    ambiguous: str = "first",
+    unknown: str = "keep",
+) -> tuple[str, int, int, int]:
+    """Join segments into output text. Returns (out, matched_chars, matched_segments, unknown_chars)."""
+    if ambiguous not in ("first", "all"):
+        raise ValueError("ambiguous must be 'first' or 'all'")
+    if unknown not in ("keep", "mark"):
+        raise ValueError("unknown must be 'keep' or 'mark'")
+
+    matched_chars = 0
+    matched_segments = 0
+    unknown_chars = 0
+
+    parts: list[str] = []
+    last = ""  # Last emitted character, for the spacing rule.
+    for seg in segments:
+        if seg.readings:
+            matched_chars += len(seg.piece)
+            matched_segments += 1
+            if ambiguous == "first":
+                out = seg.readings[0]
+            else:
+                out = "{" + "/".join(seg.readings) + "}"
+            if last and out and _is_wordish(last) and _is_wordish(out[0]):
+                parts.append(" ")
+        elif seg.unknown:
+            unknown_chars += 1
+            if unknown == "mark":
+                if last and _is_wordish(last):
+                    parts.append(" ")
+                out = "<?>"
+            else:
+                out = seg.piece
+        else:
+            out = seg.piece
+        if out:
+            parts.append(out)
+            last = out[-1]
+
+    return "".join(parts), matched_chars, matched_segments, unknown_chars
+
+
 def hanzi_to_tailo(
     text: str,
-    mapping: dict[str, list[str]],
+    mapping: Mapping[str, list[str]],
     *,
     max_key_len: int,
     ambiguous: str = "first",
     unknown: str = "keep",
+    matcher: HeadwordTrie | None = None,
 ) -> str:
     out, _matched_chars, _matched_segments, _unknown_chars = hanzi_to_tailo_with_stats(
         text,
@@ -38,69 +177,24 @@ def hanzi_to_tailo(
         max_key_len=max_key_len,
         ambiguous=ambiguous,
         unknown=unknown,
+        matcher=matcher,
     )
     return out
 
 
 def hanzi_to_tailo_with_stats(
     text: str,
-    mapping: dict[str, list[str]],
+    mapping: Mapping[str, list[str]],
     *,
     max_key_len: int,
     ambiguous: str = "first",
     unknown: str = "keep",
+    matcher: HeadwordTrie | None = None,
+    folded: str | None = None,
 ) -> tuple[str, int, int, int]:
-    if ambiguous not in ("first", "all"):
-        raise ValueError("ambiguous must be 'first' or 'all'")
-    if unknown not in ("keep", "mark"):
-        raise ValueError("unknown must be 'keep' or 'mark'")
-
-    matched_chars = 0
-    matched_segments = 0
-    unknown_chars = 0
-
-    out = ""
-    i = 0
-    while i < len(text):
-        ch = text[i]
-        if is_hanzi(ch):
-            match = None
-            match_vals: list[str] | None = None
-            max_len = min(max_key_len, len(text) - i)
-            for length in range(max_len, 0, -1):
-                cand = text[i : i + length]
-                vals = mapping.get(cand)
-                if vals:
-                    match = cand
-                    match_vals = vals
-                    break
-
-            if match and match_vals:
-                matched_chars += len(match)
-                matched_segments += 1
-                if ambiguous == "first":
-                    seg = match_vals[0]
-                else:
-                    seg = "{" + "/".join(match_vals) + "}"
-
-                if out and seg and _is_wordish(out[-1]) and _is_wordish(seg[0]):
-                    out += " "
-                out += seg
-                i += len(match)
-                continue
-
-            unknown_chars += 1
-            if unknown == "mark":
-                if out and _is_wordish(out[-1]):
-                    out += " "
-                out += "<?>"
-            else:
-                out += ch
-            i += 1
-            continue
-
-        # Non-hanzi: pass through as-is.
-        out += ch
-        i += 1
-
-    return out, matched_chars, matched_segments, unknown_chars
+    """Longest-match conversion; see `iter_segments` for `matcher` and `folded`."""
+    return render_segments(
+        iter_segments(text, mapping, max_key_len=max_key_len, matcher=matcher, folded=folded),
+        ambiguous=ambiguous,
+        unknown=unknown,
+    )
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+from .cache import default_socket_path
+
+_CONNECT_TIMEOUT = 0.5
+# Requests are served one at a time, so a client that connects and never sends its
+# request line would block every later one.
+_READ_TIMEOUT = 5.0
+# Client side: a daemon stuck on an earlier request falls back to in-process work
+# rather than hanging every `tailo` call.
+_REPLY_TIMEOUT = 30.0
+
+
+def _call(socket_path: Path, payload: dict) -> dict | None:
+    """Send one request; return the decoded reply, or None if no daemon is listening."""
+    if not hasattr(socket, "AF_UNIX") or not socket_path.exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(_CONNECT_TIMEOUT)
+            sock.connect(str(socket_path))
+            sock.settimeout(_REPLY_TIMEOUT)
+            sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile("rb") as f:
+                data = f.read()
+    except OSError:
+        return None
+    if not data:
+        return None
+    try:
+        return json.loads(data.decode("utf-8"))
+    except ValueError:
+        return None
+
+
+def request(
+    argv: list[str],
+    *,
+    stdin: str | None = None,
+    socket_path: Path | None = None,
+) -> tuple[int, str, str] | None:
+    """
+    Run a `tailo` command line in the daemon.
+    Returns `(rc, stdout, stderr)`, or None so the caller can fall back to in-process work.
+    """
+    reply = _call(
+        socket_path or default_socket_path(),
+        {"op": "run", "argv": argv, "stdin": stdin, "cwd": os.getcwd()},
+    )
+    if reply is None or "rc" not in reply:
+        return None
+    return int(reply["rc"]), reply.get("stdout", ""), reply.get("stderr", "")
+
+
+class _Server(socketserver.UnixStreamServer):
+    # Requests are served one at a time: handlers redirect the process-wide
+    # stdout/stderr and chdir to the client's cwd, which is not thread-safe.
+    def __init__(self, path: str, run: Callable[[list[str]], int]) -> None:
+        self.run = run
+        self.stopping = False
+        super().__init__(path, _Handler)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: _Server
+
+    def handle(self) -> None:
+        self.request.settimeout(_READ_TIMEOUT)
+        try:
+            req = json.loads(self.rfile.readline().decode("utf-8"))
+        except (socket.timeout, ValueError):
+            return
+        op = req.get("op")
+        if op == "ping":
+            reply = {"pid": os.getpid()}
+        elif op == "shutdown":
+            self.server.stopping = True
+            reply = {"pid": os.getpid()}
+        elif op == "run":
+            reply = self._run(req)
+        else:
+            reply = {"error": f"unknown op: {op!r}"}
+        self.wfile.write(json.dumps(reply, ensure_ascii=False).encode("utf-8"))
+
+    def _run(self, req: dict) -> dict:
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        stdin = io.StringIO(req.get("stdin") or "")
+        prev_cwd = os.getcwd()
+        try:
+            os.chdir(req.get("cwd") or prev_cwd)
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                saved_stdin, sys.stdin = sys.stdin, stdin
+                try:
+                    rc = self.server.run(list(req.get("argv") or []))
+                except SystemExit as e:  # argparse errors
+                    rc = e.code if isinstance(e.code, int) else 2
+                finally:
+                    sys.stdin = saved_stdin
+        except Exception as e:  # Keep serving; report like an in-process crash would.
+            stderr.write(f"tailo daemon: {type(e).__name__}: {e}\n")
+            rc = 1
+        finally:
+            os.chdir(prev_cwd)
+        return {"rc": rc, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def serve(socket_path: Path, run: Callable[[list[str]], int]) -> None:
+    """Serve requests on `socket_path` until a `shutdown` request arrives."""
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    if socket_path.exists():
+        if _call(socket_path, {"op": "ping"}) is not None:
+            raise RuntimeError(f"tailo daemon already running on {socket_path}")
+        socket_path.unlink()  # Stale socket from a daemon that died.
+
+    old_umask = os.umask(0o077)
+    try:
+        server = _Server(str(socket_path), run)
+    finally:
+        os.umask(old_umask)
+    try:
+        while not server.stopping:
+            server.handle_request()
+    finally:
+        server.server_close()
+        with contextlib.suppress(OSError):
+            socket_path.unlink()
+
+
+def ping(socket_path: Path) -> int | None:
+    """Return the daemon's pid, or None if it is not running."""
+    reply = _call(socket_path, {"op": "ping"})
+    return None if reply is None else reply.get("pid")
+
+
+def stop(socket_path: Path) -> bool:
+    return _call(socket_path, {"op": "shutdown"}) is not None
+
+
+def start(socket_path: Path, *, wait: float = 5.0) -> int | None:
+    """Spawn a detached `tailo daemon run` and wait until it answers pings."""
+    pid = ping(socket_path)
+    if pid is not None:
+        return pid
+    subprocess.Popen(
+        [sys.executable, "-m", "tailo_cli", "daemon", "run", "--socket", str(socket_path)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        pid = ping(socket_path)
+        if pid is not None:
+            return pid
+        time.sleep(0.05)
+    return None
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import contextlib
+import csv
+import os
+import sqlite3
+import tempfile
+from collections import ChainMap
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+from .cache import atomic_write_bytes, check_source, dict_version, file_stamp, sha1_file
+from .dict_cache import _try_open, cache_path_for, is_compiled, patch_compiled
+from .dict_loader import headword_of, iter_headword_words, mapping_from_words
+from .fulltext import FORMAT_VERSION as FULLTEXT_FORMAT, FulltextIndex, fulltext_path
+from .fulltext import patch_fulltext_index
+from .reverse_index import patch_reverse_index, read_reverse_index, reverse_index_path
+from .variants import fold_mapping, fold_variants
+
+# Optional delta column: `delete` removes the row with that id; anything else
+# (`add`, `change`, empty) adds it, or replaces the row with the same id.
+OP_COLUMN = "op"
+DELETE_OPS = ("delete", "deleted", "d")
+
+
+class DeltaResult(NamedTuple):
+    added: int
+    changed: int
+    deleted: int
+    version: str  # `dict_version` of the updated dict.csv.
+    patched: list[str]  # Caches updated in place (the rest rebuild on next use).
+
+
+def read_delta(path: Path) -> tuple[dict[str, dict[str, str] | None], list[str]]:
+    """`({id: row or None (delete)}, header)`; later rows for the same id win."""
+    rows: dict[str, dict[str, str] | None] = {}
+    with path.open("r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        header = list(reader.fieldnames or [])
+        if "id" not in header:
+            raise ValueError(f"{path}: delta CSV needs an `id` column")
+        for row in reader:
+            row_id = (row.get("id") or "").strip()
+            if not row_id:
+                continue
+            op = (row.get(OP_COLUMN) or "").strip().lower()
+            rows[row_id] = None if op in DELETE_OPS else row
+    return rows, header
+
+
+def _id_order(row_id: str) -> tuple[int, int | str]:
+    # dict.csv is exported `ORDER BY id`: numeric ids compare as numbers.
+    return (0, int(row_id)) if row_id.isdigit() else (1, row_id)
+
+
+def _line_terminator(path: Path) -> str:
+    with path.open("rb") as f:
+        return "\r\n" if f.readline().endswith(b"\r\n") else "\n"
+
+
+def _merge_rows(
+    reader: Iterator[list[str]],
+    id_col: int,
+    delta: dict[str, list[str] | None],
+    old_rows: dict[str, list[str]],
+) -> Iterator[list[str]]:
+    """
+    The rows of the updated CSV, in id order: existing rows are replaced or dropped,
+    new ids are inserted before the first larger id. Replaced / deleted rows are
+    recorded in `old_rows`.
+    """
+    added = sorted(
+        (i for i, row in delta.items() if row is not None), key=_id_order, reverse=True
+    )
+    written: set[str] = set()
+    for row in reader:
+        row_id = row[id_col].strip() if len(row) > id_col else ""
+        while added and _id_order(added[-1]) < _id_order(row_id):
+            new_id = added.pop()
+            if new_id not in written:
+                written.add(new_id)
+                yield delta[new_id]  # type: ignore[misc]
+        if row_id not in delta:
+            yield row
+            continue
+        old_rows[row_id] = row
+        # Written here unless an out-of-order id was already written in its sorted place.
+        if delta[row_id] is not None and row_id not in written:
+            written.add(row_id)
+            yield delta[row_id]  # type: ignore[misc]
+    for new_id in reversed(added):
+        if new_id not in written:
+            yield delta[new_id]  # type: ignore[misc]
+
+
+def _rewrite_csv(
+    path: Path, delta: dict[str, dict[str, str] | None]
+) -> tuple[list[str], dict[str, list[str]]]:
+    """
+    Apply `delta` to dict.csv (atomically replaced). Returns the header and the
+    replaced / deleted rows.
+    """
+    old_rows: dict[str, list[str]] = {}
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with path.open("r", newline="", encoding="utf-8") as src, os.fdopen(
+            fd, "w", newline="", encoding="utf-8"
+        ) as dst:
+            reader = csv.reader(src)
+            header = next(reader, [])
+            if "id" not in header:
+                raise ValueError(f"{path}: dict.csv has no `id` column")
+            rows = {
+                i: None if row is None else [row.get(col) or "" for col in header]
+                for i, row in delta.items()
+            }
+            writer = csv.writer(dst, lineterminator=_line_terminator(path))
+            writer.writerow(header)
+            writer.writerows(_merge_rows(reader, header.index("id"), rows, old_rows))
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+    return header, old_rows
+
+
+def _folded_headword(chinese: str) -> str | None:
+    key = headword_of(chinese)
+    return fold_variants(key) if key is not None else None
+
+
+def apply_delta(
+    dict_path: Path,
+    delta_path: Path,
+    *,
+    cache_dir: Path | None = None,
+    progress: Callable[[str], None] | None = None,
+) -> DeltaResult:
+    """
+    Apply a delta CSV (dict.csv columns plus an optional `op` column) to dict.csv by
+    `id`, then patch the compiled dictionaries, their reverse indexes and the
+    full-text index that were up to date, instead of rebuilding them: only the
+    headwords the delta touches are re-romanized. Caches that were already stale are
+    left to rebuild on next use, as is the headword → row index (its row offsets
+    move with the rewrite).
+    """
+    if is_compiled(dict_path):
+        raise ValueError(f"{dict_path} is a compiled dictionary: re-run `tailo ingest` instead")
+    delta, _header = read_delta(delta_path)
+    caches = []
+    for orthography in (True, False):
+        cpath = cache_path_for(dict_path, orthography=orthography, cache_dir=cache_dir)
+        compiled = _try_open(cpath)
+        if compiled is None:
+            continue
+        if check_source(dict_path, compiled.meta.get("source"))[0] == "fresh":
+            rpath = reverse_index_path(dict_path, orthography=orthography, cache_dir=cache_dir)
+            reverse = read_reverse_index(rpath)
+            if reverse is not None and reverse[1].get("version") != compiled.version:
+                reverse = None
+            caches.append((cpath, orthography, compiled, rpath, reverse and reverse[0]))
+    fpath = fulltext_path(dict_path, cache_dir=cache_dir)
+    fulltext_fresh = False
+    if fpath.exists():
+        with contextlib.suppress(sqlite3.Error):
+            index = FulltextIndex(fpath)
+            meta = index.meta()
+            index.close()
+            fulltext_fresh = (
+                meta.get("format") == FULLTEXT_FORMAT
+                and check_source(dict_path, meta.get("source"))[0] == "fresh"
+            )
+
+    header, old_rows = _rewrite_csv(dict_path, delta)
+    source = dict(file_stamp(dict_path), sha1=sha1_file(dict_path))
+    version = dict_version(source)
+    if progress:
+        progress(f"dict.csv updated ({len(delta)} ids, version {version})")
+
+    chinese_col = header.index("chinese") if "chinese" in header else -1
+    cells = [row[chinese_col] for row in old_rows.values() if 0 <= chinese_col < len(row)]
+    cells += [row.get("chinese") or "" for row in delta.values() if row is not None]
+    affected = {key for cell in cells if (key := _folded_headword(cell)) is not None}
+    words = [
+        (key, word)
+        for key, word in (iter_headword_words(dict_path) if caches else ())
+        if fold_variants(key) in affected
+    ]
+    patched: list[str] = []
+    for cpath, orthography, compiled, rpath, reverse in caches:
+        fresh = fold_mapping(mapping_from_words(words, orthography=orthography))
+        updates = {key: fresh.get(key, []) for key in affected}
+        meta = {"source": source, "version": version}
+        if reverse is not None:
+            rmeta = {"version": version, "orthography": orthography}
+            data = patch_reverse_index(reverse, compiled, ChainMap(updates, compiled), updates, rmeta)
+            atomic_write_bytes(rpath, data)
+            patched.append(rpath.name)
+        atomic_write_bytes(cpath, patch_compiled(compiled, updates, meta))
+        patched.append(cpath.name)
+        if progress:
+            progress(f"patched {cpath.name} ({len(updates)} headwords)")
+    if fulltext_fresh:
+        patch_fulltext_index(fpath, delta, source)
+        patched.append(fpath.name)
+        if progress:
+            progress(f"patched {fpath.name}")
+
+    deleted = sum(1 for i, row in delta.items() if row is None and i in old_rows)
+    changed = sum(1 for i, row in delta.items() if row is not None and i in old_rows)
+    added = sum(1 for i, row in delta.items() if row is not None and i not in old_rows)
+    return DeltaResult(added, changed, deleted, version, patched)
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import struct
+from array import array
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+
+from .cache import (
+    atomic_write_bytes,
+    check_source,
+    default_cache_dir,
+    dict_version,
+    open_mmap,
+    sha1_file,
+    source_key,
+)
+from .dict_loader import load_dict_csv
+from .keytable import (
+    KeyTable,
+    StringPool,
+    pack_file,
+    pack_key_table,
+    pack_string_pool,
+    read_file_header,
+)
+from .stats import Stats
+from .variants import fold_mapping
+
+FORMAT_VERSION = 5
+
+_MAGIC = b"TLDC"
+
+
+class CompiledDict(Mapping[str, list[str]]):
+    """
+    Read-only Hanzi→台羅 mapping backed by a compiled (usually memory-mapped) buffer.
+    Headwords live in a packed key table whose values are arrays of ids into one
+    pool of distinct pronunciations, so no per-entry Python objects exist until an
+    entry is looked up.
+    """
+
+    def __init__(self, buf, meta: dict) -> None:
+        self.meta = meta
+        self.max_key_len: int = meta["max_key_len"]
+        headwords, readings = meta["tables"]
+        self._table = KeyTable(buf, headwords)
+        self._readings = StringPool(buf, readings)
+
+    def get(self, key: str, default=None):  # type: ignore[override]
+        idx = self._table.find(key.encode("utf-8"))
+        if idx < 0:
+            return default
+        pool = self._readings
+        return [pool.get(i).decode("utf-8") for i in array("I", self._table.value(idx))]
+
+    def __getitem__(self, key: str) -> list[str]:
+        vals = self.get(key)
+        if vals is None:
+            raise KeyError(key)
+        return vals
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._table.find(key.encode("utf-8")) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for idx in range(len(self._table)):
+            yield self._table.key(idx).decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    @property
+    def version(self) -> str | None:
+        """Content version of the source dict.csv (see `dict_version`)."""
+        return self.meta.get("version")
+
+    def key(self, idx: int) -> str:
+        """The `idx`-th headword in codepoint order."""
+        return self._table.key(idx).decode("utf-8")
+
+    def prefix_range(self, prefix: str) -> tuple[int, int]:
+        """Index range of the headwords starting with `prefix` (see `key`)."""
+        return self._table.prefix_range(prefix.encode("utf-8"))
+
+
+class LoadedDict(dict[str, list[str]]):
+    """A dictionary parsed into memory (`load_dict(use_cache=False)`), with its content version."""
+
+    def __init__(self, mapping: Mapping[str, list[str]], version: str | None) -> None:
+        # Many headwords share a reading: keep one string object per distinct reading.
+        pool: dict[str, str] = {}
+        super().__init__(
+            (key, [pool.setdefault(v, v) for v in vals]) for key, vals in mapping.items()
+        )
+        self.version = version
+
+
+def compile_dict(mapping: Mapping[str, list[str]], max_key_len: int, meta: dict) -> bytes:
+    """
+    Serialize a mapping (as returned by `load_dict_csv`) into the compiled format:
+    the headword table (values are reading ids) and the interned reading pool. The
+    reverse (romanization) index has its own file (see `reverse_index.py`).
+    """
+    ids: dict[str, int] = {}
+    table = pack_key_table(
+        (key.encode("utf-8"), array("I", [ids.setdefault(v, len(ids)) for v in vals]).tobytes())
+        for key, vals in mapping.items()
+    )
+    readings = pack_string_pool(v.encode("utf-8") for v in ids)
+    meta = dict(
+        meta,
+        format=FORMAT_VERSION,
+        max_key_len=max_key_len,
+        entries=len(mapping),
+        readings=len(ids),
+    )
+    return pack_file(_MAGIC, meta, table, readings)
+
+
+def patch_compiled(
+    compiled: CompiledDict, updates: Mapping[str, list[str]], meta: dict
+) -> bytes:
+    """
+    Re-pack `compiled` with the headwords in `updates` replaced by their new readings
+    (an empty list removes the headword). Untouched entries and pooled readings are
+    copied as packed bytes: nothing is re-romanized. Readings that fall out of use
+    stay in the pool until the next full compile.
+    """
+    table = compiled._table
+    pool = compiled._readings
+    ids = {pool.get(i): i for i in range(len(pool))}
+    skip = {key.encode("utf-8") for key in updates}
+    items = [(key, value) for key, value in table.items() if key not in skip]
+    for key, vals in updates.items():
+        if vals:
+            id_list = [ids.setdefault(v.encode("utf-8"), len(ids)) for v in vals]
+            items.append((key.encode("utf-8"), array("I", id_list).tobytes()))
+    max_key_len = max((len(key.decode("utf-8")) for key, _value in items), default=0)
+    meta = dict(
+        compiled.meta,
+        **meta,
+        max_key_len=max_key_len,
+        entries=len(items),
+        readings=len(ids),
+    )
+    meta.pop("tables", None)
+    return pack_file(_MAGIC, meta, pack_key_table(items), pack_string_pool(ids))
+
+
+def is_compiled(path: Path) -> bool:
+    """True for a compiled dictionary file (e.g. written by `tailo ingest`), not a CSV."""
+    try:
+        with path.open("rb") as f:
+            return f.read(len(_MAGIC)) == _MAGIC
+    except OSError:
+        return False
+
+
+def open_compiled(path: Path) -> CompiledDict:
+    buf = open_mmap(path)
+    meta = read_file_header(buf, _MAGIC)
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported compiled dictionary format")
+    return CompiledDict(buf, meta)
+
+
+def cache_path_for(path: Path, *, orthography: bool, cache_dir: Path | None = None) -> Path:
+    suffix = "orth" if orthography else "raw"
+    return (cache_dir or default_cache_dir()) / f"{source_key(path)}-{suffix}.tldc"
+
+
+def _try_open(path: Path) -> CompiledDict | None:
+    try:
+        return open_compiled(path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def load_dict(
+    path: Path,
+    *,
+    orthography: bool = True,
+    use_cache: bool = True,
+    cache_dir: Path | None = None,
+    stats: Stats | None = None,
+) -> tuple[Mapping[str, list[str]], int]:
+    """
+    Like `load_dict_csv`, with headwords variant-folded (see `variants.py`), and
+    served from a compiled cache keyed by the CSV's size/mtime (fast path) or
+    SHA-1 (after a touch) and the `orthography` flag. The cache is (re)built on
+    first use and whenever the CSV changes. With `stats`, the cache outcome is
+    counted as `dict_cache.fresh|touched|stale|disabled`.
+
+    The result is a `CompiledDict`, memory-mapped from the cache when possible (in
+    memory with a read-only cache dir), so the parsed CSV is dropped as soon as it
+    has been compiled. With `use_cache=False` nothing is compiled: it is the parsed
+    mapping itself (`LoadedDict`, readings interned).
+
+    `path` may also be a compiled dictionary itself (see `ingest.py`); it is then
+    opened as-is (counted as `dict_cache.compiled`).
+    """
+    if is_compiled(path):
+        if stats is not None:
+            stats.add("dict_cache.compiled")
+        compiled = open_compiled(path)
+        if compiled.meta.get("orthography", True) != orthography:
+            flag = "with" if orthography else "without"
+            raise ValueError(
+                f"{path} was compiled {flag} --no-orthography; re-run `tailo ingest` to change it"
+            )
+        return compiled, compiled.max_key_len
+
+    if not use_cache:
+        if stats is not None:
+            stats.add("dict_cache.disabled")
+        mapping, max_len = load_dict_csv(path, orthography=orthography)
+        version = dict_version({"sha1": sha1_file(path)})
+        return LoadedDict(fold_mapping(mapping), version), max_len
+
+    cpath = cache_path_for(path, orthography=orthography, cache_dir=cache_dir)
+    compiled = _try_open(cpath)
+    if compiled is not None and compiled.meta.get("orthography") != orthography:
+        compiled = None
+    state, source = check_source(path, compiled.meta.get("source") if compiled else None)
+    if stats is not None:
+        stats.add(f"dict_cache.{state if compiled is not None else 'stale'}")
+    if compiled is not None and state == "fresh":
+        return compiled, compiled.max_key_len
+
+    meta = {"source": source, "orthography": orthography, "version": dict_version(source)}
+    if compiled is not None and state == "touched":
+        # Content unchanged (e.g. file was touched or copied): refresh the stamp only.
+        data = patch_compiled(compiled, {}, meta)
+        max_len = compiled.max_key_len
+    else:
+        mapping, max_len = load_dict_csv(path, orthography=orthography)
+        data = compile_dict(fold_mapping(mapping), max_len, meta)
+        del mapping
+    del compiled
+    try:
+        atomic_write_bytes(cpath, data)
+    except OSError:
+        return _from_bytes(data), max_len  # Read-only cache dir: still usable, just not cached.
+    reopened = _try_open(cpath)
+    return (reopened if reopened is not None else _from_bytes(data)), max_len
+
+
+def _from_bytes(data: bytes) -> CompiledDict:
+    return CompiledDict(data, read_file_header(data, _MAGIC))
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import csv
 import re
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
 from .romanize import convert_poj_word_to_tailo
@@ -10,6 +11,55 @@ _BRACKETED_RE = re.compile(r"^\[(.*)\]$")
 _HAS_HANZI_RE = re.compile("[\u3400-\u4DBF\u4E00-\u9FFF\uF900-\uFAFF]")
 
 
+def headword_of(chinese: str) -> str | None:
+    """`[ 台灣 ]` → `台灣`; None for cells that are not bracketed Hanzi headwords."""
+    m = _BRACKETED_RE.match(chinese.strip())
+    if not m:
+        return None
+    key = m.group(1).strip()
+    if not key or not _HAS_HANZI_RE.search(key):
+        return None
+    return key
+
+
+def iter_headword_words(path: Path) -> Iterator[tuple[str, str]]:
+    """`(headword, raw POJ word)` for each dict.csv row that has both, in file order."""
+    with path.open("r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if "chinese" not in header or "word" not in header:
+            return
+        chinese_col = header.index("chinese")
+        word_col = header.index("word")
+        width = max(chinese_col, word_col) + 1
+        for row in reader:
+            if len(row) < width:
+                continue
+            key = headword_of(row[chinese_col])
+            if key is None:
+                continue
+            word = row[word_col].strip()
+            if word:
+                yield key, word
+
+
+def mapping_from_words(
+    pairs: Iterable[tuple[str, str]],
+    *,
+    orthography: bool = True,
+) -> dict[str, list[str]]:
+    """Convert `(headword, word)` pairs to 漢字詞條 -> [台羅, ...], keeping each reading once."""
+    mapping: dict[str, list[str]] = {}
+    for key, word in pairs:
+        tailo = convert_poj_word_to_tailo(word, orthography=orthography)
+        if not tailo:
+            continue
+        vals = mapping.setdefault(key, [])
+        if tailo not in vals:
+            vals.append(tailo)
+    return mapping
+
+
 def load_dict_csv(
     path: Path,
     *,
@@ -20,35 +70,7 @@ def load_dict_csv(
       漢字詞條 -> [台羅, 台羅, ...]
     Returns (mapping, max_key_len).
     """
-    mapping: dict[str, list[str]] = {}
-    max_key_len = 0
-
-    with path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            chinese = (row.get("chinese") or "").strip()
-            m = _BRACKETED_RE.match(chinese)
-            if not m:
-                continue
-            key = m.group(1).strip()
-            if not key or not _HAS_HANZI_RE.search(key):
-                continue
-
-            word = (row.get("word") or "").strip()
-            if not word:
-                continue
-
-            tailo = convert_poj_word_to_tailo(word, orthography=orthography)
-            if not tailo:
-                continue
-
-            mapping.setdefault(key, [])
-            if tailo not in mapping[key]:
-                mapping[key].append(tailo)
-
-            if len(key) > max_key_len:
-                max_key_len = len(key)
-
+    mapping = mapping_from_words(iter_headword_words(path), orthography=orthography)
     if not mapping:
         raise ValueError(f"No entries loaded from {path}")
-    return mapping, max_key_len
+    return mapping, max(map(len, mapping))
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import contextlib
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from pathlib import Path
+from typing import NamedTuple
+
+from .cache import check_source, default_cache_dir, dict_version, source_key
+from .dict_cache import is_compiled
+from .dict_loader import headword_of
+from .stats import Stats
+
+FORMAT_VERSION = 2
+
+# dict.csv columns indexed for `tailo search` (as exported by `sql2csv.sh`).
+FIELDS = ("exp", "example", "english", "han", "page")
+
+# The trigram tokenizer (SQLite >= 3.34) matches substrings, which suits the
+# unsegmented Hanzi / kana definitions; terms shorter than a trigram fall back
+# to LIKE filtering.
+_TRIGRAM = 3
+
+
+class SearchResult(NamedTuple):
+    headword: str
+    reading: str  # Raw dict.csv `word` (POJ) from the index; `Converter.search` converts it.
+    page: str
+    snippet: str
+    score: float  # bm25: lower is better; 0.0 when ranking was not possible.
+
+
+def fulltext_path(path: Path, *, cache_dir: Path | None = None) -> Path:
+    return (cache_dir or default_cache_dir()) / f"{source_key(path)}-fulltext.sqlite"
+
+
+def _headword(chinese: str | None) -> str:
+    chinese = chinese or ""
+    return headword_of(chinese) or chinese.strip().strip("[]").strip()
+
+
+def _record(row: Mapping[str, str]) -> tuple:
+    # Numeric ids (as exported by `sql2csv.sh`) double as the FTS rowid, so a delta can
+    # replace a row without scanning the table; other ids get an automatic rowid.
+    row_id = (row.get("id") or "").strip()
+    return (
+        int(row_id) if row_id.isdigit() else None,
+        row_id,
+        _headword(row.get("chinese")),
+        (row.get("word") or "").strip(),
+        *((row.get(field) or "").strip() for field in FIELDS),
+    )
+
+
+def _iter_rows(path: Path) -> Iterator[dict[str, str]]:
+    with path.open("r", newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+_INSERT = (
+    f"INSERT INTO entries(rowid, id, headword, word, {', '.join(FIELDS)}) "
+    f"VALUES ({', '.join('?' * (4 + len(FIELDS)))})"
+)
+
+
+def build_fulltext_index(path: Path, db_path: Path, source: dict) -> None:
+    """Index dict.csv into a fresh SQLite FTS5 database, replacing `db_path` atomically."""
+    write_fulltext_index(db_path, _iter_rows(path), source)
+
+
+def write_fulltext_index(
+    db_path: Path,
+    rows: Iterable[Mapping[str, str]],
+    source: dict,
+    *,
+    version: str | None = None,
+) -> None:
+    """
+    Index dict.csv-shaped rows into a fresh SQLite FTS5 database, replacing `db_path`
+    atomically. `source` is the stamp of the file the index belongs to; `version`
+    defaults to its `dict_version`.
+    """
+    _write_index(db_path, lambda con: con.executemany(_INSERT, map(_record, rows)), source, version)
+
+
+def copy_fulltext_index(
+    db_path: Path,
+    src_db: Path,
+    table: str,
+    columns: Iterable[str],
+    source: dict,
+    *,
+    version: str | None = None,
+) -> None:
+    """
+    `write_fulltext_index` for rows held in a SQLite table with the dict.csv columns
+    (e.g. a loaded SQL dump): one `INSERT ... SELECT`, so only the headword is
+    computed in Python. Missing columns index as empty.
+    """
+    present = set(columns)
+
+    def text(col: str) -> str:
+        return f"trim(coalesce(CAST(src.{col} AS TEXT), ''))" if col in present else "''"
+
+    row_id = text("id")
+    select = ", ".join(
+        [
+            f"CASE WHEN {row_id} GLOB '[0-9]*' AND NOT {row_id} GLOB '*[^0-9]*' "
+            f"THEN CAST({row_id} AS INTEGER) END",
+            row_id,
+            f"tailo_headword({text('chinese')})",
+            *(text(col) for col in ("word", *FIELDS)),
+        ]
+    )
+    order = " ORDER BY src.id" if "id" in present else ""
+
+    def fill(con: sqlite3.Connection) -> None:
+        con.create_function("tailo_headword", 1, _headword, deterministic=True)
+        con.execute("ATTACH DATABASE ? AS dump", (src_db.resolve().as_uri() + "?mode=ro",))
+        con.execute(
+            f"INSERT INTO entries(rowid, id, headword, word, {', '.join(FIELDS)}) "
+            f"SELECT {select} FROM dump.{table} AS src{order}"
+        )
+        con.commit()
+        con.execute("DETACH DATABASE dump")
+
+    _write_index(db_path, fill, source, version)
+
+
+def _write_index(
+    db_path: Path,
+    fill: Callable[[sqlite3.Connection], object],
+    source: dict,
+    version: str | None,
+) -> None:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=db_path.name + ".", suffix=".tmp", dir=db_path.parent)
+    os.close(fd)
+    try:
+        con = sqlite3.connect(tmp)
+        try:
+            con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            try:
+                con.execute(
+                    "CREATE VIRTUAL TABLE entries USING fts5("
+                    "id UNINDEXED, headword UNINDEXED, word UNINDEXED, "
+                    f"{', '.join(FIELDS)}, tokenize='trigram')"
+                )
+            except sqlite3.OperationalError as e:
+                raise RuntimeError(
+                    f"full-text search needs SQLite FTS5 with the trigram tokenizer "
+                    f"(SQLite >= 3.34; this is {sqlite3.sqlite_version}): {e}"
+                ) from e
+            fill(con)
+            con.execute("INSERT INTO entries(entries) VALUES ('optimize')")
+            meta = {
+                "format": FORMAT_VERSION,
+                "source": source,
+                "version": version or dict_version(source),
+            }
+            con.executemany(
+                "INSERT INTO meta VALUES (?, ?)", [(k, json.dumps(v)) for k, v in meta.items()]
+            )
+            con.commit()
+        finally:
+            con.close()
+        os.replace(tmp, db_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+def patch_fulltext_index(
+    db_path: Path, rows: Mapping[str, Mapping[str, str] | None], source: dict
+) -> None:
+    """
+    Apply changed dict.csv rows in place: `rows` maps an `id` to its new row, or to
+    None to delete it. The recorded source stamp and version move to `source`.
+    """
+    with contextlib.closing(sqlite3.connect(db_path)) as con:
+        with con:
+            con.executemany(
+                "DELETE FROM entries WHERE rowid = ?", [(int(i),) for i in rows if i.isdigit()]
+            )
+            other = [(i,) for i in rows if not i.isdigit()]
+            if other:
+                con.executemany("DELETE FROM entries WHERE id = ?", other)
+            con.executemany(_INSERT, [_record(row) for row in rows.values() if row is not None])
+            con.executemany(
+                "UPDATE meta SET value = ? WHERE key = ?",
+                [
+                    (json.dumps(source), "source"),
+                    (json.dumps(dict_version(source)), "version"),
+                ],
+            )
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _snippet(fields: list[str], terms: list[str], width: int = 24) -> str:
+    """Text around the first term occurrence (for queries FTS5 cannot rank)."""
+    for text in fields:
+        low = text.lower()
+        for term in terms:
+            at = low.find(term.lower())
+            if at >= 0:
+                start = max(0, at - width)
+                end = at + len(term) + width
+                return (
+                    ("…" if start else "")
+                    + text[start:at]
+                    + "["
+                    + text[at : at + len(term)]
+                    + "]"
+                    + text[at + len(term) : end]
+                    + ("…" if end < len(text) else "")
+                )
+    return ""
+
+
+class FulltextIndex:
+    """Read-only view of a full-text database built by `build_fulltext_index`."""
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self._con = sqlite3.connect(
+            db_path.resolve().as_uri() + "?mode=ro", uri=True, check_same_thread=False
+        )
+
+    def close(self) -> None:
+        self._con.close()
+
+    def meta(self) -> dict:
+        return {k: json.loads(v) for k, v in self._con.execute("SELECT key, value FROM meta")}
+
+    def search(self, query: str, *, limit: int = 20, offset: int = 0) -> list[SearchResult]:
+        """
+        Entries whose exp/example/english/han/page contain every whitespace-separated
+        term (case-insensitive substring match), best bm25 rank first.
+        """
+        terms = query.split()
+        if not terms or limit <= 0:
+            return []
+        long_terms = [t for t in terms if len(t) >= _TRIGRAM]
+        short_terms = [t for t in terms if len(t) < _TRIGRAM]
+
+        where: list[str] = []
+        params: list[object] = []
+        if long_terms:
+            where.append("entries MATCH ?")
+            params.append(" AND ".join(_quote(t) for t in long_terms))
+        for term in short_terms:
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("(" + " OR ".join(f"{f} LIKE ? ESCAPE '\\'" for f in FIELDS) + ")")
+            params.extend([f"%{escaped}%"] * len(FIELDS))
+
+        if long_terms:
+            snippet = "snippet(entries, -1, '[', ']', '…', 12)"
+            select = f"headword, word, page, {snippet}, bm25(entries)"
+            order = "bm25(entries), rowid"
+        else:
+            select = f"headword, word, page, {', '.join(FIELDS)}"
+            order = "rowid"
+        sql = (
+            f"SELECT {select} FROM entries WHERE {' AND '.join(where)} "
+            f"ORDER BY {order} LIMIT ? OFFSET ?"
+        )
+        rows = self._con.execute(sql, [*params, limit, max(0, offset)]).fetchall()
+
+        if long_terms:
+            return [SearchResult(h, w, p, s, float(score)) for h, w, p, s, score in rows]
+        return [
+            SearchResult(h, w, p, _snippet(list(fields), short_terms), 0.0)
+            for h, w, p, *fields in rows
+        ]
+
+
+def open_fulltext_index(
+    path: Path,
+    *,
+    cache_dir: Path | None = None,
+    stats: Stats | None = None,
+) -> FulltextIndex:
+    """
+    Open the full-text index of a dict.csv, building it on first use and whenever
+    the CSV changes. With `stats`, counts `fulltext.fresh` or `fulltext.built`.
+    """
+    db_path = fulltext_path(path, cache_dir=cache_dir)
+    recorded = None
+    if db_path.exists():
+        try:
+            index = FulltextIndex(db_path)
+            meta = index.meta()
+            index.close()
+            if meta.get("format") == FORMAT_VERSION:
+                recorded = meta.get("source")
+        except sqlite3.Error:
+            recorded = None
+
+    state, source = check_source(path, recorded)
+    if recorded is not None and state in ("fresh", "touched"):
+        if state == "touched":
+            # Content unchanged (e.g. file was touched or copied): refresh the stamp only.
+            with contextlib.suppress(sqlite3.Error):
+                with contextlib.closing(sqlite3.connect(db_path)) as con:
+                    con.execute(
+                        "UPDATE meta SET value = ? WHERE key = 'source'", (json.dumps(source),)
+                    )
+                    con.commit()
+        if stats is not None:
+            stats.add("fulltext.fresh")
+        return FulltextIndex(db_path)
+
+    if is_compiled(path):
+        raise RuntimeError(
+            f"no full-text index for {path}: rebuild it with `tailo ingest` (without --no-fulltext)"
+        )
+    if stats is not None:
+        stats.add("fulltext.built")
+    build_fulltext_index(path, db_path, source)
+    return FulltextIndex(db_path)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import csv
+import struct
+from array import array
+from collections.abc import Iterator
+from pathlib import Path
+
+from .cache import atomic_write_bytes, check_source, default_cache_dir, open_mmap, source_key
+from .dict_loader import headword_of
+from .keytable import KeyTable, pack_file, pack_key_table, read_file_header
+from .stats import Stats
+from .variants import fold_variants
+
+FORMAT_VERSION = 2
+
+_MAGIC = b"TLHI"
+
+
+def iter_rows_with_offsets(path: Path) -> Iterator[tuple[int, list[str], list[str]]]:
+    """Yield `(byte_offset, header, row)` for each CSV record (records may span lines)."""
+    with path.open("rb") as f:
+        pos = 0
+
+        def lines() -> Iterator[str]:
+            nonlocal pos
+            for raw in f:
+                pos += len(raw)
+                yield raw.decode("utf-8")
+
+        # csv.reader pulls exactly the lines of one record per next(), so `pos`
+        # before the call is the record's start offset.
+        reader = csv.reader(lines())
+        header = next(reader, None)
+        if header is None:
+            return
+        while True:
+            start = pos
+            row = next(reader, None)
+            if row is None:
+                return
+            yield start, header, row
+
+
+def build_headword_index(path: Path, source: dict) -> bytes:
+    """
+    One pass over dict.csv (no romanization): variant-folded headword → byte
+    offsets of its rows.
+    """
+    offsets: dict[str, array] = {}
+    columns: list[str] = []
+    for offset, header, row in iter_rows_with_offsets(path):
+        columns = header
+        rec = dict(zip(header, row))
+        key = headword_of(rec.get("chinese") or "")
+        if key is None or not (rec.get("word") or "").strip():
+            continue
+        offsets.setdefault(fold_variants(key), array("Q")).append(offset)
+    table = pack_key_table((key.encode("utf-8"), offs.tobytes()) for key, offs in offsets.items())
+    meta = {"format": FORMAT_VERSION, "source": source, "columns": columns}
+    return pack_file(_MAGIC, meta, table)
+
+
+class HeadwordIndex:
+    """
+    Sorted/hashed on-disk index of dict.csv headwords. A lookup is one hash probe
+    in the mmap'd index plus one seek per matching row; only those rows are parsed.
+    """
+
+    def __init__(self, csv_path: Path, buf, meta: dict) -> None:
+        self.csv_path = csv_path
+        self.meta = meta
+        self._table = KeyTable(buf, meta["tables"][0])
+        self._word_col = meta["columns"].index("word")
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __contains__(self, headword: object) -> bool:
+        return (
+            isinstance(headword, str)
+            and self._table.find(fold_variants(headword).encode("utf-8")) >= 0
+        )
+
+    def words(self, headword: str) -> list[str]:
+        """Raw `word` fields (POJ) of the rows for `headword` (any variant spelling), in file order."""
+        idx = self._table.find(fold_variants(headword).encode("utf-8"))
+        if idx < 0:
+            return []
+        offsets = array("Q")
+        offsets.frombytes(self._table.value(idx))
+        out: list[str] = []
+        with self.csv_path.open("rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                row = next(csv.reader(raw.decode("utf-8") for raw in f), [])
+                if self._word_col < len(row):
+                    out.append(row[self._word_col].strip())
+        return out
+
+
+def open_headword_index(
+    path: Path,
+    *,
+    cache_dir: Path | None = None,
+    stats: Stats | None = None,
+) -> HeadwordIndex:
+    """
+    Open (building or refreshing it if needed) the headword index of a dict.csv.
+    With `stats`, counts `headword_index.fresh` or `headword_index.built`.
+    """
+    ipath = (cache_dir or default_cache_dir()) / f"{source_key(path)}-headwords.tlhi"
+    meta = None
+    try:
+        buf = open_mmap(ipath)
+        meta = read_file_header(buf, _MAGIC)
+        if meta.get("format") != FORMAT_VERSION:
+            meta = None
+    except (OSError, ValueError, struct.error):
+        meta = None
+
+    state, source = check_source(path, meta.get("source") if meta else None)
+    if meta is not None and state == "fresh":
+        if stats is not None:
+            stats.add("headword_index.fresh")
+        return HeadwordIndex(path, buf, meta)
+
+    if stats is not None:
+        stats.add("headword_index.built")
+    data = build_headword_index(path, source)
+    try:
+        atomic_write_bytes(ipath, data)
+    except OSError:
+        pass  # Read-only cache dir: serve from memory.
+    return HeadwordIndex(path, data, read_file_header(data, _MAGIC))
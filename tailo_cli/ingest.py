@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import contextlib
+import re
+import sqlite3
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+from .cache import atomic_write_bytes, dict_version, file_stamp, sha1_file
+from .dict_cache import compile_dict
+from .dict_loader import headword_of, mapping_from_words
+from .fulltext import copy_fulltext_index, fulltext_path
+from .pages import build_page_index, page_index_path
+from .variants import fold_mapping
+
+# The columns `sql2csv.sh` exports from the upstream `dic` table, in order.
+COLUMNS = (
+    "id", "word", "other", "chinese", "exp", "example",
+    "username", "modtime", "han", "english", "page",
+)
+TABLE = "dic"
+
+# Same filters as `sql2csv.sh`, applied in that order: drop `CREATE INDEX ... ON`
+# lines, then each `ALTER TABLE` line together with the line after it.
+_CREATE_INDEX_RE = re.compile(r"^.*CREATE INDEX .* ON .*\n?", re.MULTILINE)
+_ALTER_TABLE_RE = re.compile(r"^.*ALTER TABLE.*(\n.*)?\n?", re.MULTILINE)
+# The dump's own transaction statements are replaced by one transaction per batch.
+_TRANSACTION_RE = re.compile(
+    r"^[ \t]*(BEGIN([ \t]+TRANSACTION)?|COMMIT)[ \t]*;[ \t]*\r?$\n?",
+    re.MULTILINE | re.IGNORECASE,
+)
+# The dump is executed in batches of about this many bytes (cut after a complete
+# statement), so memory stays bounded by the batch, not the dump.
+_BATCH_BYTES = 1 << 20
+_SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+class IngestResult(NamedTuple):
+    rows: int
+    entries: int  # Headwords in the compiled dictionary.
+    output: Path
+    fulltext: Path | None
+    version: str  # `dict_version` of the dump.
+    seconds: float
+
+
+def is_sqlite_file(path: Path) -> bool:
+    with path.open("rb") as f:
+        return f.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+
+
+def _filter(script: str) -> str:
+    if "CREATE INDEX" in script:
+        script = _CREATE_INDEX_RE.sub("", script)
+    if "ALTER TABLE" in script:
+        script = _ALTER_TABLE_RE.sub("", script)
+    return _TRANSACTION_RE.sub("", script)
+
+
+def _iter_batches(dump: Path, progress: Callable[[int, int], None]) -> Iterator[str]:
+    """The dump as scripts of complete statements, filtered like `sql2csv.sh`."""
+    total = dump.stat().st_size
+    done = 0
+    pending = ""
+    with dump.open("rb") as f:
+        while True:
+            block = f.read(_BATCH_BYTES)
+            if not block:
+                break
+            block += f.readline()
+            # An `ALTER TABLE` line takes the next line with it: keep them together.
+            while b"ALTER TABLE" in block[block.rfind(b"\n", 0, len(block) - 1) + 1 :]:
+                line = f.readline()
+                if not line:
+                    break
+                block += line
+            done += len(block)
+            pending = _filter(pending + block.decode("utf-8"))
+            if sqlite3.complete_statement(pending):
+                progress(done, total)
+                yield pending
+                pending = ""
+    if pending.strip():
+        yield pending if sqlite3.complete_statement(pending) else pending + "\n;"
+
+
+def load_sql_dump(
+    dump: Path,
+    db_path: Path,
+    *,
+    progress: Callable[[str], None] | None = None,
+) -> None:
+    """Execute the upstream SQL dump (`dic_can.txt`) into a SQLite database file."""
+    con = sqlite3.connect(db_path, isolation_level=None)
+    reported = [-1]
+
+    def report(done: int, total: int) -> None:
+        pct = done * 100 // total if total else 100
+        if progress and pct // 10 > reported[0]:
+            reported[0] = pct // 10
+            progress(f"dump {pct:3d}% ({done >> 20} MiB)")
+
+    try:
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("PRAGMA synchronous = OFF")
+        for script in _iter_batches(dump, report):
+            con.executescript("BEGIN;\n" + script + "\nCOMMIT;")
+    finally:
+        con.close()
+
+
+def _columns(con: sqlite3.Connection) -> list[str]:
+    present = {row[1] for row in con.execute(f"PRAGMA table_info({TABLE})")}
+    if not {"word", "chinese"} <= present:
+        raise ValueError(f"no `{TABLE}` table with `word` and `chinese` columns in the dump")
+    return [c for c in COLUMNS if c in present]
+
+
+def _iter_headword_words(
+    con: sqlite3.Connection, columns: list[str]
+) -> Iterator[tuple[str, str]]:
+    order = " ORDER BY id" if "id" in columns else ""
+    for chinese, word in con.execute(f"SELECT chinese, word FROM {TABLE}{order}"):
+        key = headword_of(str(chinese or ""))
+        word = str(word or "").strip()
+        if key is not None and word:
+            yield key, word
+
+
+def ingest(
+    source: Path,
+    output: Path,
+    *,
+    orthography: bool = True,
+    fulltext: bool = True,
+    cache_dir: Path | None = None,
+    progress: Callable[[str], None] | None = None,
+) -> IngestResult:
+    """
+    Build a compiled dictionary (`output`, usable as `--dict`), its page index and
+    its full-text index straight from the upstream SQL dump, or from a SQLite database holding the
+    `dic` table, without writing dict.csv. The dump is executed into a temporary
+    SQLite file in batches and the full-text index is filled from it in SQL, so memory
+    holds one batch plus the compiled result.
+    """
+    t0 = time.perf_counter()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    stamp = dict(file_stamp(source), sha1=sha1_file(source))
+    version = dict_version(stamp)
+    with contextlib.ExitStack() as stack:
+        if is_sqlite_file(source):
+            db_path = source
+        else:
+            tmp = stack.enter_context(
+                tempfile.TemporaryDirectory(prefix="tailo-ingest-", dir=output.parent)
+            )
+            db_path = Path(tmp) / "dump.sqlite"
+            load_sql_dump(source, db_path, progress=progress)
+        con = stack.enter_context(
+            contextlib.closing(sqlite3.connect(db_path.resolve().as_uri() + "?mode=ro", uri=True))
+        )
+
+        columns = _columns(con)
+        mapping = fold_mapping(
+            mapping_from_words(_iter_headword_words(con, columns), orthography=orthography)
+        )
+        if not mapping:
+            raise ValueError(f"No entries loaded from {source}")
+        (rows,) = con.execute(f"SELECT count(*) FROM {TABLE}").fetchone()
+        meta = {"source": stamp, "orthography": orthography, "version": version}
+        data = compile_dict(mapping, max(map(len, mapping)), meta)
+        entries = len(mapping)
+        del mapping
+        atomic_write_bytes(output, data)
+        del data
+        if progress:
+            progress(f"wrote {output} ({rows} rows, {entries} headwords)")
+
+        out_stamp = dict(file_stamp(output), sha1=sha1_file(output))
+        if "page" in columns:
+            order = " ORDER BY id" if "id" in columns else ""
+            cells = con.execute(f"SELECT chinese, page FROM {TABLE}{order}")
+            atomic_write_bytes(
+                page_index_path(output, cache_dir=cache_dir), build_page_index(cells, out_stamp)
+            )
+
+        fpath = None
+        if fulltext:
+            fpath = fulltext_path(output, cache_dir=cache_dir)
+            copy_fulltext_index(fpath, db_path, TABLE, columns, out_stamp, version=version)
+            if progress:
+                progress(f"wrote {fpath}")
+    return IngestResult(rows, entries, output, fpath, version, time.perf_counter() - t0)
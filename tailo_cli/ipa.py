@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import re
 import unicodedata
+from functools import lru_cache
 
 _TONE_MARK_TO_TONE: dict[str, int] = {
     "\u0301": 2,  # acute
@@ -120,6 +121,9 @@ def _looks_like_tailo_token(token: str) -> bool:
     return True
 
 
+# Memoized: the set of distinct syllable x tone tokens is small, so on real text almost
+# every token is a single cache hit instead of NFD/NFC passes plus onset/rime scanning.
+@lru_cache(maxsize=1 << 16)
 def tailo_syllable_to_ipa(token: str) -> str:
     """
     Convert one tailo-ish syllable into IPA, keeping tones as superscript digits.
@@ -192,8 +196,4 @@ def tailo_to_ipa(text: str) -> str:
     Non-tailo segments are left unchanged.
     """
 
-    def repl(match: re.Match[str]) -> str:
-        token = match.group(0)
-        return tailo_syllable_to_ipa(token)
-
-    return _TAILO_TOKEN_RE.sub(repl, text)
+    return _TAILO_TOKEN_RE.sub(lambda m: tailo_syllable_to_ipa(m.group(0)), text)
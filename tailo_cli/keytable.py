@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from array import array
+from typing import Iterable, Iterator
+
+_MAGIC = b"TLKT"
+_HEADER = struct.Struct("<4sII")  # magic, count, nslots
+_META_LEN = struct.Struct("<I")
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def pack_key_table(items: Iterable[tuple[bytes, bytes]]) -> bytes:
+    """
+    Pack `(key, value)` pairs into a sorted, memory-mappable table:
+      header | key offsets | value offsets | hash slots | key blob | value blob
+    Keys must be unique; they are sorted by byte order (== codepoint order for UTF-8).
+    """
+    pairs = sorted(items, key=lambda kv: kv[0])
+    count = len(pairs)
+
+    key_offsets = array("I", [0])
+    val_offsets = array("I", [0])
+    key_blob = bytearray()
+    val_blob = bytearray()
+    prev: bytes | None = None
+    for key, value in pairs:
+        if key == prev:
+            raise ValueError(f"duplicate key in key table: {key!r}")
+        prev = key
+        key_blob += key
+        val_blob += value
+        key_offsets.append(len(key_blob))
+        val_offsets.append(len(val_blob))
+
+    nslots = 1
+    while nslots < count * 2:
+        nslots *= 2
+    slots = array("I", bytes(4 * nslots))
+    mask = nslots - 1
+    for idx, (key, _value) in enumerate(pairs):
+        slot = zlib.crc32(key) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = idx + 1
+
+    out = bytearray(_HEADER.pack(_MAGIC, count, nslots))
+    out += key_offsets.tobytes()
+    out += val_offsets.tobytes()
+    out += slots.tobytes()
+    out += key_blob
+    out += val_blob
+    out += bytes(_align8(len(out)) - len(out))
+    return bytes(out)
+
+
+class KeyTable:
+    """Read-only view over a packed key table (bytes, mmap, ...)."""
+
+    def __init__(self, buf, offset: int = 0) -> None:
+        magic, count, nslots = _HEADER.unpack_from(buf, offset)
+        if magic != _MAGIC:
+            raise ValueError("not a key table")
+        view = memoryview(buf)
+        pos = offset + _HEADER.size
+        self._key_offsets = view[pos : pos + 4 * (count + 1)].cast("I")
+        pos += 4 * (count + 1)
+        self._val_offsets = view[pos : pos + 4 * (count + 1)].cast("I")
+        pos += 4 * (count + 1)
+        self._slots = view[pos : pos + 4 * nslots].cast("I")
+        pos += 4 * nslots
+        self._keys_base = pos
+        self._vals_base = pos + self._key_offsets[count]
+        self._buf = buf
+        self._count = count
+        self._mask = nslots - 1
+        self.nbytes = _align8(self._vals_base + self._val_offsets[count] - offset)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def key(self, idx: int) -> bytes:
+        base = self._keys_base
+        return self._buf[base + self._key_offsets[idx] : base + self._key_offsets[idx + 1]]
+
+    def value(self, idx: int) -> bytes:
+        base = self._vals_base
+        return self._buf[base + self._val_offsets[idx] : base + self._val_offsets[idx + 1]]
+
+    def items(self) -> Iterator[tuple[bytes, bytes]]:
+        """All `(key, value)` pairs in key order (for re-packing a patched table)."""
+        count = self._count
+        keys = bytes(self._buf[self._keys_base : self._vals_base])
+        vals = bytes(
+            self._buf[self._vals_base : self._vals_base + self._val_offsets[count]]
+        )
+        key_offsets = self._key_offsets.tolist()
+        val_offsets = self._val_offsets.tolist()
+        for i in range(count):
+            yield (
+                keys[key_offsets[i] : key_offsets[i + 1]],
+                vals[val_offsets[i] : val_offsets[i + 1]],
+            )
+
+    def bisect_left(self, key: bytes, lo: int = 0) -> int:
+        """Index of the first key >= `key` (keys are sorted by bytes)."""
+        hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def prefix_range(self, prefix: bytes) -> tuple[int, int]:
+        """`(lo, hi)` such that keys `lo..hi-1` are exactly those starting with `prefix`."""
+        lo = self.bisect_left(prefix)
+        # 0xff never occurs in UTF-8, so it sorts after every continuation of `prefix`.
+        return lo, self.bisect_left(prefix + b"\xff", lo)
+
+    def find(self, key: bytes) -> int:
+        """Return the index of `key`, or -1."""
+        if not self._count:
+            return -1
+        slots = self._slots
+        mask = self._mask
+        slot = zlib.crc32(key) & mask
+        while True:
+            idx = slots[slot]
+            if not idx:
+                return -1
+            if self.key(idx - 1) == key:
+                return idx - 1
+            slot = (slot + 1) & mask
+
+
+_POOL_MAGIC = b"TLSP"
+_POOL_HEADER = struct.Struct("<4sI")  # magic, count
+
+
+def pack_string_pool(strings: Iterable[bytes]) -> bytes:
+    """
+    Pack byte strings addressed by position (e.g. interned pronunciations):
+      header | offsets | blob
+    """
+    offsets = array("I", [0])
+    blob = bytearray()
+    for item in strings:
+        blob += item
+        offsets.append(len(blob))
+    out = bytearray(_POOL_HEADER.pack(_POOL_MAGIC, len(offsets) - 1))
+    out += offsets.tobytes()
+    out += blob
+    out += bytes(_align8(len(out)) - len(out))
+    return bytes(out)
+
+
+class StringPool:
+    """Read-only view over a packed string pool."""
+
+    def __init__(self, buf, offset: int = 0) -> None:
+        magic, count = _POOL_HEADER.unpack_from(buf, offset)
+        if magic != _POOL_MAGIC:
+            raise ValueError("not a string pool")
+        pos = offset + _POOL_HEADER.size
+        self._offsets = memoryview(buf)[pos : pos + 4 * (count + 1)].cast("I")
+        self._base = pos + 4 * (count + 1)
+        self._buf = buf
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, idx: int) -> bytes:
+        base = self._base
+        return self._buf[base + self._offsets[idx] : base + self._offsets[idx + 1]]
+
+
+def pack_file(magic: bytes, meta: dict, *tables: bytes) -> bytes:
+    """
+    File layout shared by the on-disk indexes:
+      magic (4 bytes) | meta length | JSON meta | padding | table | table ...
+    `meta["tables"]` records each table's offset.
+    """
+    header_len = len(magic) + _META_LEN.size
+    offsets: list[int] = []
+    # Offsets are part of the JSON, whose length moves the offsets: settle on a fixed point.
+    while True:
+        meta = dict(meta, tables=offsets)
+        blob = json.dumps(meta, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        pos = _align8(header_len + len(blob))
+        new_offsets = []
+        for table in tables:
+            new_offsets.append(pos)
+            pos += len(table)
+        if new_offsets == offsets:
+            break
+        offsets = new_offsets
+    head = magic + _META_LEN.pack(len(blob)) + blob
+    return head + bytes(offsets[0] - len(head) if tables else 0) + b"".join(tables)
+
+
+def read_file_header(buf, magic: bytes) -> dict:
+    """Return the JSON meta of a `pack_file` buffer (raises ValueError on a bad magic)."""
+    if buf[: len(magic)] != magic:
+        raise ValueError("unexpected file type")
+    (meta_len,) = _META_LEN.unpack_from(buf, len(magic))
+    start = len(magic) + _META_LEN.size
+    return json.loads(bytes(buf[start : start + meta_len]).decode("utf-8"))
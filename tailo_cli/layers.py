@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import NamedTuple
+
+from .stats import Stats
+
+OVERRIDE = "override"
+EXTEND = "extend"
+LAYER_MODES = (OVERRIDE, EXTEND)
+
+
+class Layer(NamedTuple):
+    """An overlay dictionary (dict.csv or compiled) and how it combines with the layers below."""
+
+    path: Path
+    # `override`: its readings replace those of the layers below for the same headword;
+    # `extend`: they are appended (each reading once).
+    mode: str = OVERRIDE
+
+
+def as_layers(
+    overlays: Sequence[Layer | tuple[str | Path, str] | str | Path],
+) -> tuple[Layer, ...]:
+    """Normalize overlays given as paths or `(path, mode)` pairs."""
+    layers: list[Layer] = []
+    for item in overlays:
+        if isinstance(item, (str, Path)):
+            layer = Layer(Path(item))
+        else:
+            layer = Layer(Path(item[0]), item[1])
+        if layer.mode not in LAYER_MODES:
+            raise ValueError(f"layer mode must be one of {LAYER_MODES}")
+        layers.append(layer)
+    return tuple(layers)
+
+
+def merge_overlays(
+    base: Mapping[str, list[str]],
+    overlays: Sequence[tuple[Mapping[str, list[str]], str]],
+) -> dict[str, list[str]]:
+    """The merged readings of every headword an overlay defines, later overlays on top."""
+    merged: dict[str, list[str]] = {}
+    for mapping, mode in overlays:
+        for key in mapping:
+            vals = mapping[key]
+            if mode == EXTEND:
+                below = merged[key] if key in merged else base.get(key) or []
+                vals = list(below) + [v for v in vals if v not in below]
+            merged[key] = list(vals)
+    return merged
+
+
+class LayeredDict(Mapping[str, list[str]]):
+    """
+    A base dictionary with overlays on top, seen as one mapping. Only the overlays'
+    headwords are merged, into one small dict probed before the base, so each layer
+    keeps its own compiled cache and a probe costs at most two lookups.
+    """
+
+    def __init__(
+        self,
+        base: Mapping[str, list[str]],
+        overlays: Sequence[tuple[Mapping[str, list[str]], str]],
+    ) -> None:
+        self.base = base
+        self._merged = merge_overlays(base, overlays)
+        self._extra = [key for key in self._merged if key not in base]
+        # Version of the whole stack: every layer's content version, in order, with its mode.
+        versions = [getattr(m, "version", None) for m in (base, *(m for m, _mode in overlays))]
+        modes = ["", *(mode for _m, mode in overlays)]
+        self.version: str | None = None
+        if None not in versions:
+            stack = "+".join(f"{v}:{mode}" for v, mode in zip(versions, modes))
+            self.version = hashlib.sha1(stack.encode("utf-8")).hexdigest()[:16]
+
+    def get(self, key: str, default=None):  # type: ignore[override]
+        vals = self._merged.get(key)
+        if vals is None:
+            return self.base.get(key, default)
+        return vals
+
+    def __getitem__(self, key: str) -> list[str]:
+        vals = self.get(key)
+        if vals is None:
+            raise KeyError(key)
+        return vals
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._merged or key in self.base
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.base
+        yield from self._extra
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self._extra)
+
+
+def load_layered(
+    path: Path,
+    overlays: Sequence[Layer],
+    *,
+    orthography: bool = True,
+    use_cache: bool = True,
+    cache_dir: Path | None = None,
+    stats: Stats | None = None,
+) -> tuple[Mapping[str, list[str]], int]:
+    """
+    `load_dict` of `path` with `overlays` merged on top (see `LayeredDict`). Every
+    layer is loaded through its own compiled cache, so changing an overlay never
+    rebuilds the base.
+    """
+    from .dict_cache import load_dict
+
+    kwargs = dict(orthography=orthography, use_cache=use_cache, cache_dir=cache_dir, stats=stats)
+    base, max_len = load_dict(path, **kwargs)
+    if not overlays:
+        return base, max_len
+    loaded: list[tuple[Mapping[str, list[str]], str]] = []
+    for layer in overlays:
+        mapping, layer_len = load_dict(layer.path, **kwargs)
+        loaded.append((mapping, layer.mode))
+        max_len = max(max_len, layer_len)
+    return LayeredDict(base, loaded), max_len
@@ -2,19 +2,33 @@ from __future__ import annotations
 
 from functools import lru_cache
 
-try:
-    from opencc import OpenCC
-except ImportError:  # pragma: no cover
-    OpenCC = None  # type: ignore[assignment]
+
+@lru_cache(maxsize=1)
+def _opencc_class():
+    """`opencc.OpenCC`, or None if not installed; imported on the first conversion."""
+    try:
+        from opencc import OpenCC
+    except ImportError:  # pragma: no cover
+        return None
+    return OpenCC
+
+
+def __getattr__(name: str):
+    # `from .opencc_util import OpenCC` still works (None when not installed), but
+    # importing this module no longer imports `opencc`.
+    if name == "OpenCC":
+        return _opencc_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 @lru_cache(maxsize=8)
 def _get_converter(config: str):
-    if OpenCC is None:  # pragma: no cover
+    cls = _opencc_class()
+    if cls is None:  # pragma: no cover
         raise RuntimeError(
             "OpenCC not available. Install `opencc-python-reimplemented` or pass --no-opencc."
         )
-    return OpenCC(config)
+    return cls(config)
 
 
 def to_traditional(text: str, *, config: str = "s2tw") -> str:
@@ -22,3 +36,9 @@ def to_traditional(text: str, *, config: str = "s2tw") -> str:
         return text
     return _get_converter(config).convert(text)
 
+
+def to_simplified(text: str, *, config: str = "tw2s") -> str:
+    """The inverse direction; used to build the dictionary's own s2t table (`s2t.py`)."""
+    if not text:
+        return text
+    return _get_converter(config).convert(text)
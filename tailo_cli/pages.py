@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import csv
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+from .cache import (
+    atomic_write_bytes,
+    check_source,
+    default_cache_dir,
+    file_stamp,
+    open_mmap,
+    source_key,
+)
+from .dict_loader import headword_of
+from .keytable import KeyTable, pack_file, pack_key_table, read_file_header
+from .stats import Stats
+from .variants import fold_variants
+
+FORMAT_VERSION = 1
+
+_MAGIC = b"TLPG"
+_SEP = "\x1f"
+
+# Downsampling factors for `page_image` (1 = the scan itself).
+SCALES = (1, 2, 4, 8)
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_HEADER = struct.Struct(">IIBBBBB")
+
+
+class PageHit(NamedTuple):
+    headword: str
+    page: str  # dict.csv `page`, e.g. `B0688`.
+    image: Path | None  # The scan (or its cached downsampled copy); None when missing.
+
+
+def default_scan_dir() -> Path:
+    """`./scan` if it exists, else the one at the repository root."""
+    cwd_scan = Path.cwd() / "scan"
+    if cwd_scan.is_dir():
+        return cwd_scan
+    return Path(__file__).resolve().parent.parent / "scan"
+
+
+# -- headword → pages ---------------------------------------------------------------
+
+
+def iter_page_cells(path: Path) -> Iterator[tuple[str, str]]:
+    """`(chinese, page)` cells of each dict.csv row, in file order."""
+    with path.open("r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if "chinese" not in header or "page" not in header:
+            return
+        chinese, page = header.index("chinese"), header.index("page")
+        width = max(chinese, page)
+        for row in reader:
+            if len(row) > width:
+                yield row[chinese], row[page]
+
+
+def build_page_index(cells: Iterable[tuple[str, str]], source: dict) -> bytes:
+    """Variant-folded headword → its distinct pages, in row order."""
+    pages: dict[str, list[str]] = {}
+    for chinese, page in cells:
+        key = headword_of(str(chinese or ""))
+        page = str(page or "").strip()
+        if key is None or not page:
+            continue
+        seen = pages.setdefault(fold_variants(key), [])
+        if page not in seen:
+            seen.append(page)
+    table = pack_key_table(
+        (key.encode("utf-8"), _SEP.join(vals).encode("utf-8")) for key, vals in pages.items()
+    )
+    return pack_file(_MAGIC, {"format": FORMAT_VERSION, "source": source}, table)
+
+
+class PageIndex:
+    """Headword → dict.csv `page` codes, one hash probe in the mmap'd index."""
+
+    def __init__(self, buf, meta: dict) -> None:
+        self.meta = meta
+        self._table = KeyTable(buf, meta["tables"][0])
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def pages(self, headword: str) -> list[str]:
+        idx = self._table.find(fold_variants(headword).encode("utf-8"))
+        if idx < 0:
+            return []
+        return self._table.value(idx).decode("utf-8").split(_SEP)
+
+
+def page_index_path(path: Path, *, cache_dir: Path | None = None) -> Path:
+    return (cache_dir or default_cache_dir()) / f"{source_key(path)}-pages.tlpg"
+
+
+def open_page_index(
+    path: Path,
+    *,
+    cache_dir: Path | None = None,
+    stats: Stats | None = None,
+) -> PageIndex:
+    """
+    Open the page index of a dict.csv, building it on first use and whenever the
+    CSV changes. With `stats`, counts `page_index.fresh` or `page_index.built`.
+    """
+    from .dict_cache import is_compiled
+
+    ipath = page_index_path(path, cache_dir=cache_dir)
+    meta = None
+    try:
+        buf = open_mmap(ipath)
+        meta = read_file_header(buf, _MAGIC)
+        if meta.get("format") != FORMAT_VERSION:
+            meta = None
+    except (OSError, ValueError, struct.error):
+        meta = None
+
+    state, source = check_source(path, meta.get("source") if meta else None)
+    if meta is not None and state == "fresh":
+        if stats is not None:
+            stats.add("page_index.fresh")
+        return PageIndex(buf, meta)
+
+    if is_compiled(path):
+        raise RuntimeError(f"no page index for {path}: rebuild it with `tailo ingest`")
+    if stats is not None:
+        stats.add("page_index.built")
+    data = build_page_index(iter_page_cells(path), source)
+    try:
+        atomic_write_bytes(ipath, data)
+    except OSError:
+        pass  # Read-only cache dir: serve from memory.
+    return PageIndex(data, read_file_header(data, _MAGIC))
+
+
+# -- page → scan ---------------------------------------------------------------------
+
+
+class ScanDir:
+    """Page code → scan image under `root` (`A/A0001.png`, `B/B0688.png`, …), listed once."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._paths: dict[str, Path] | None = None
+
+    def path(self, page: str) -> Path | None:
+        if self._paths is None:
+            paths: dict[str, Path] = {}
+            for dirpath, _dirs, names in os.walk(self.root):
+                for name in sorted(names):
+                    stem, ext = os.path.splitext(name)
+                    if ext.lower() == ".png":
+                        paths.setdefault(stem.upper(), Path(dirpath) / name)
+            self._paths = paths
+        return self._paths.get(page.strip().upper())
+
+
+# -- downsampled images --------------------------------------------------------------
+
+# Recently served images, so a long-lived process re-reads nothing for repeated views.
+_MEMORY: OrderedDict[tuple, bytes] = OrderedDict()
+_MEMORY_ITEMS = 16
+
+
+def page_image(
+    scan: Path,
+    scale: int,
+    *,
+    cache_dir: Path | None = None,
+    stats: Stats | None = None,
+) -> Path:
+    """
+    `scan` downsampled by `scale` (box filter, 8-bit grayscale PNG), cached on disk
+    under `<cache dir>/scans` and keyed by the scan's size/mtime. `scale=1`, or an
+    image neither the built-in 1-bit decoder nor Pillow (if installed) can read,
+    returns `scan` itself. With `stats`, counts `page_image.fresh|built|original`.
+    """
+    if scale not in SCALES:
+        raise ValueError(f"scale must be one of {SCALES}")
+    if scale == 1:
+        return scan
+    stamp = file_stamp(scan)
+    out = (cache_dir or default_cache_dir()) / "scans" / (
+        f"{scan.stem}-{source_key(scan)}-{stamp['size']:x}-{stamp['mtime_ns']:x}-x{scale}.png"
+    )
+    if out.exists():
+        if stats is not None:
+            stats.add("page_image.fresh")
+        return out
+    data = downsample_png(scan.read_bytes(), scale)
+    if data is None:
+        if stats is not None:
+            stats.add("page_image.original")
+        return scan
+    if stats is not None:
+        stats.add("page_image.built")
+    try:
+        atomic_write_bytes(out, data)
+    except OSError:
+        return scan  # Read-only cache dir.
+    return out
+
+
+def read_page_image(
+    scan: Path,
+    scale: int,
+    *,
+    cache_dir: Path | None = None,
+    stats: Stats | None = None,
+) -> bytes:
+    """PNG bytes of `page_image`, kept in memory for the most recent images."""
+    stamp = file_stamp(scan)
+    key = (str(scan.resolve()), stamp["size"], stamp["mtime_ns"], scale)
+    data = _MEMORY.get(key)
+    if data is not None:
+        _MEMORY.move_to_end(key)
+        if stats is not None:
+            stats.add("page_image.memory")
+        return data
+    data = page_image(scan, scale, cache_dir=cache_dir, stats=stats).read_bytes()
+    _MEMORY[key] = data
+    if len(_MEMORY) > _MEMORY_ITEMS:
+        _MEMORY.popitem(last=False)
+    return data
+
+
+def downsample_png(data: bytes, scale: int) -> bytes | None:
+    """
+    Box-downsample a PNG by `scale` into 8-bit grayscale. The scans are 1-bit
+    grayscale, which is decoded here with zlib and byte-table arithmetic; other
+    formats need Pillow (None when it is not installed).
+    """
+    header, idat = _read_png(data)
+    width, height, depth, color, _compression, _filter, interlace = header
+    if depth == 1 and color == 0 and interlace == 0:
+        try:
+            raw = zlib.decompress(idat)
+        except zlib.error as e:
+            raise ValueError(f"corrupt PNG data: {e}") from None
+        rows = _downsample_bilevel(raw, width, height, scale)
+        return _encode_gray(rows, -(-width // scale))
+    return _downsample_with_pillow(data, scale)
+
+
+def _read_png(data: bytes) -> tuple[tuple[int, ...], bytes]:
+    if not data.startswith(_PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    header: tuple[int, ...] = ()
+    idat: list[bytes] = []
+    pos = len(_PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, tag = struct.unpack_from(">I4s", data, pos)
+        body = data[pos + 8 : pos + 8 + length]
+        if tag == b"IHDR":
+            header = _PNG_HEADER.unpack(body)
+        elif tag == b"IDAT":
+            idat.append(body)
+        elif tag == b"IEND":
+            break
+        pos += 12 + length
+    if not header:
+        raise ValueError("PNG without IHDR")
+    return header, b"".join(idat)
+
+
+def _downsample_with_pillow(data: bytes, scale: int) -> bytes | None:
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    import io
+
+    with Image.open(io.BytesIO(data)) as im:
+        small = im.convert("L").reduce(scale)
+    buf = io.BytesIO()
+    small.save(buf, "PNG")
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=None)
+def _masks(size: int) -> tuple[int, int]:
+    # Per-byte masks for adding `size` byte lanes packed into one int.
+    return int.from_bytes(b"\x7f" * size, "big"), int.from_bytes(b"\x80" * size, "big")
+
+
+def _add_lanes(a: bytes, b: bytes) -> bytes:
+    """Bytewise `(a + b) % 256` (the PNG Up filter) without a Python-level loop."""
+    low, high = _masks(len(a))
+    x = int.from_bytes(a, "big")
+    y = int.from_bytes(b, "big")
+    return (((x & low) + (y & low)) ^ ((x ^ y) & high)).to_bytes(len(a), "big")
+
+
+def _unfilter_slow(ftype: int, row: bytes, prev: bytes) -> bytes:
+    # Sub / Average / Paeth with one byte per pixel unit (bit depth < 8).
+    out = bytearray(row)
+    for i in range(len(out)):
+        left = out[i - 1] if i else 0
+        up = prev[i]
+        if ftype == 1:
+            out[i] = (out[i] + left) & 0xFF
+        elif ftype == 3:
+            out[i] = (out[i] + ((left + up) >> 1)) & 0xFF
+        elif ftype == 4:
+            up_left = prev[i - 1] if i else 0
+            p = left + up - up_left
+            pa, pb, pc = abs(p - left), abs(p - up), abs(p - up_left)
+            pred = left if pa <= pb and pa <= pc else up if pb <= pc else up_left
+            out[i] = (out[i] + pred) & 0xFF
+        else:
+            raise ValueError(f"bad PNG filter type {ftype}")
+    return bytes(out)
+
+
+def _unfilter_rows(raw: bytes, stride: int, height: int) -> Iterator[bytes]:
+    prev = bytes(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        ftype = raw[start]
+        row = raw[start + 1 : start + 1 + stride]
+        if ftype == 2:
+            row = _add_lanes(row, prev)
+        elif ftype != 0:
+            row = _unfilter_slow(ftype, row, prev)
+        yield row
+        prev = row
+
+
+@lru_cache(maxsize=None)
+def _count_tables(scale: int) -> tuple[bytes, ...]:
+    # Table k maps a byte of 1-bit pixels to the number of set (white) pixels in
+    # its k-th group of `scale` pixels.
+    mask = (1 << scale) - 1
+    return tuple(
+        bytes(bin((b >> (8 - scale * (k + 1))) & mask).count("1") for b in range(256))
+        for k in range(8 // scale)
+    )
+
+
+@lru_cache(maxsize=None)
+def _gray_table(total: int) -> bytes:
+    return bytes(min(255, count * 255 // total) for count in range(256))
+
+
+def _downsample_bilevel(raw: bytes, width: int, height: int, scale: int) -> list[bytes]:
+    """
+    Rows of 8-bit gray pixels, each the share of white pixels in a `scale`×`scale`
+    block (fewer at the right and bottom edges). Pixel groups are counted with
+    `bytes.translate`; the `scale` rows of a block are summed as byte lanes of one
+    int (at most 64 per lane, so no carries).
+    """
+    stride = (width + 7) // 8
+    groups = 8 // scale
+    tables = _count_tables(scale)
+    size = stride * groups
+    out_width = -(-width // scale)
+    edge = width % scale  # Real pixels in the last column block; its padding bits are 0.
+    out: list[bytes] = []
+    acc = 0
+    block = 0
+    for y, row in enumerate(_unfilter_rows(raw, stride, height)):
+        counts = bytearray(size)
+        for k, table in enumerate(tables):
+            counts[k::groups] = row.translate(table)
+        acc += int.from_bytes(counts, "big")
+        block += 1
+        if block == scale or y == height - 1:
+            counts = acc.to_bytes(size, "big")[:out_width]
+            gray = counts.translate(_gray_table(scale * block))
+            if edge:
+                gray = gray[:-1] + counts[-1:].translate(_gray_table(edge * block))
+            out.append(gray)
+            acc = 0
+            block = 0
+    return out
+
+
+def _png_chunk(tag: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body))
+
+
+def _encode_gray(rows: list[bytes], width: int) -> bytes:
+    header = _PNG_HEADER.pack(width, len(rows), 8, 0, 0, 0, 0)
+    pixels = b"".join(b"\x00" + row for row in rows)
+    return (
+        _PNG_SIGNATURE
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(pixels, 6))
+        + _png_chunk(b"IEND", b"")
+    )
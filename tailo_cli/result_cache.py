@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import atexit
+import functools
+import hashlib
+import json
+import sqlite3
+import time
+import weakref
+from pathlib import Path
+
+from .cache import default_cache_dir
+
+# Part of every key: bump when a change to conversion would make stored results wrong.
+RESULT_FORMAT = 1
+
+DEFAULT_MAX_BYTES = 64 << 20
+
+# Writes (new results, recency of hits, counters) are buffered and flushed in one
+# transaction after this many operations or seconds, and at exit.
+_FLUSH_OPS = 256
+_FLUSH_SECONDS = 1.0
+# Eviction removes least recently used results down to this fraction of the limit, so
+# it runs once per batch of inserts rather than on every insert.
+_EVICT_TO = 0.9
+# Per-entry overhead (key, row and index) counted towards the size limit.
+_ROW_OVERHEAD = 48
+# Recently used results also kept in memory, so a text repeated within one process
+# (a server's hot strings) skips the SQLite lookup.
+_MEMORY_ENTRIES = 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, n INTEGER NOT NULL);
+"""
+_COUNTERS = ("hits", "misses", "bytes", "evictions")
+_ADD_COUNTER = (
+    "INSERT INTO counters (name, n) VALUES (?, ?)"
+    " ON CONFLICT (name) DO UPDATE SET n = n + excluded.n"
+)
+
+# Caches still open at exit get their buffered writes flushed.
+_open: weakref.WeakSet[ResultCache] = weakref.WeakSet()
+
+
+@atexit.register
+def _close_all() -> None:
+    for cache in list(_open):
+        cache.close()
+
+
+def default_result_cache_path() -> Path:
+    return default_cache_dir() / "results.sqlite"
+
+
+@functools.lru_cache(maxsize=64)
+def _scope_hash(scope: tuple[tuple[str, object], ...]):
+    h = hashlib.sha1(json.dumps([RESULT_FORMAT, sorted(scope)]).encode("utf-8"))
+    h.update(b"\0")
+    return h
+
+
+def result_key(scope: tuple[tuple[str, object], ...], text: str) -> bytes:
+    """
+    Key of `text` converted under `scope`: `(name, value)` pairs of the dictionary
+    version and every option that changes the output.
+    """
+    h = _scope_hash(scope).copy()
+    h.update(text.encode("utf-8", "surrogatepass"))
+    return h.digest()
+
+
+class ResultCache:
+    """
+    Persistent text → converted text cache in one SQLite file, shared by every
+    process that opens it (WAL mode; writers take turns through a busy timeout).
+    Size-bounded: once the stored results exceed `max_bytes`, the least recently
+    used are evicted. Hit / miss counts are kept in the file too, so `info()`
+    reports totals across processes and runs.
+    """
+
+    def __init__(self, path: Path, *, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Used by one thread at a time; `close` may run from another (at exit).
+        self._con = sqlite3.connect(
+            path, timeout=10.0, isolation_level=None, check_same_thread=False
+        )
+        self._con.execute("PRAGMA journal_mode = WAL")
+        self._con.execute("PRAGMA synchronous = NORMAL")
+        self._con.executescript(_SCHEMA)
+        self._pending: dict[bytes, str] = {}
+        self._memory: dict[bytes, str] = {}
+        self._touched: set[bytes] = set()
+        self._counts = dict.fromkeys(("hits", "misses"), 0)
+        self._ops = 0
+        self._flushed = time.monotonic()
+        _open.add(self)
+
+    def get(self, key: bytes) -> str | None:
+        value = self._memory.pop(key, None)
+        if value is None:
+            row = self._con.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            value = row[0] if row else None
+        if value is not None:
+            self._remember(key, value)
+            self._touched.add(key)
+        self._counts["hits" if value is not None else "misses"] += 1
+        self._tick()
+        return value
+
+    def put(self, key: bytes, value: str) -> None:
+        self._pending[key] = value
+        self._remember(key, value)
+        self._tick()
+
+    def _remember(self, key: bytes, value: str) -> None:
+        # Dict order is recency order: `get` pops and re-inserts.
+        memory = self._memory
+        memory[key] = value
+        if len(memory) > _MEMORY_ENTRIES:
+            del memory[next(iter(memory))]
+
+    def _tick(self) -> None:
+        self._ops += 1
+        if self._ops >= _FLUSH_OPS or time.monotonic() - self._flushed >= _FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered results, recency and counters; evict if over the size limit."""
+        self._ops = 0
+        self._flushed = time.monotonic()
+        if not (self._pending or self._touched or any(self._counts.values())):
+            return
+        now = time.time_ns()
+        con = self._con
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            added = 0
+            for key, value in self._pending.items():
+                size = len(value.encode("utf-8", "surrogatepass")) + _ROW_OVERHEAD
+                cur = con.execute(
+                    "INSERT OR IGNORE INTO results (key, value, size, used) VALUES (?, ?, ?, ?)",
+                    (key, value, size, now),
+                )
+                if cur.rowcount:
+                    added += size
+            con.executemany(
+                "UPDATE results SET used = ? WHERE key = ?", ((now, key) for key in self._touched)
+            )
+            counts = dict(self._counts, bytes=added)
+            con.executemany(_ADD_COUNTER, counts.items())
+            self._evict()
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        self._pending.clear()
+        self._touched.clear()
+        self._counts = dict.fromkeys(self._counts, 0)
+
+    def _evict(self) -> None:
+        con = self._con
+        total = self._counter("bytes")
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * _EVICT_TO)
+        freed = evicted = 0
+        victims: list[bytes] = []
+        for key, size in con.execute("SELECT key, size FROM results ORDER BY used"):
+            victims.append(key)
+            freed += size
+            evicted += 1
+            if freed >= target:
+                break
+        con.executemany("DELETE FROM results WHERE key = ?", ((key,) for key in victims))
+        for key in victims:
+            self._memory.pop(key, None)
+        con.executemany(_ADD_COUNTER, (("bytes", -freed), ("evictions", evicted)))
+
+    def _counter(self, name: str) -> int:
+        row = self._con.execute("SELECT n FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def info(self) -> dict:
+        """Totals across every process that used the file: entries, bytes, hit rate, evictions."""
+        self.flush()
+        counts = {name: self._counter(name) for name in _COUNTERS}
+        (entries,) = self._con.execute("SELECT count(*) FROM results").fetchone()
+        lookups = counts["hits"] + counts["misses"]
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": counts["bytes"],
+            "max_bytes": self.max_bytes,
+            "file_bytes": sum(
+                p.stat().st_size
+                for p in (self.path, Path(f"{self.path}-wal"))
+                if p.exists()
+            ),
+            "hits": counts["hits"],
+            "misses": counts["misses"],
+            "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0,
+            "evictions": counts["evictions"],
+        }
+
+    def clear(self) -> None:
+        self._pending.clear()
+        self._memory.clear()
+        self._touched.clear()
+        self._counts = dict.fromkeys(self._counts, 0)
+        self._con.execute("BEGIN IMMEDIATE")
+        self._con.execute("DELETE FROM results")
+        self._con.execute("DELETE FROM counters")
+        self._con.execute("COMMIT")
+        self._con.execute("VACUUM")
+
+    def close(self) -> None:
+        if getattr(self, "_con", None) is None:
+            return
+        _open.discard(self)
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass  # Buffered results are only an optimization: drop them.
+        finally:
+            self._con.close()
+            self._con = None  # type: ignore[assignment]
+
+    def __del__(self) -> None:
+        self.close()
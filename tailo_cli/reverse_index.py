@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import re
+import struct
+import unicodedata
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+
+from .cache import atomic_write_bytes, default_cache_dir, open_mmap, source_key
+from .keytable import KeyTable, pack_file, pack_key_table, read_file_header
+from .romanize import convert_poj_word_to_tailo
+from .stats import Stats
+
+FORMAT_VERSION = 1
+
+_MAGIC = b"TLRI"
+
+# Tone diacritics (see `romanize.TONE_COMBINING_MARK`). Other marks, e.g. the POJ
+# o͘ dot (U+0358), are part of the vowel and survive tone stripping.
+_TONE_MARKS_RE = re.compile("[\u0300\u0301\u0302\u030c\u0304\u030d]")
+_SPACES_RE = re.compile(r"\s+")
+
+_GROUP_SEP = "\x1d"
+_FIELD_SEP = "\x1f"
+
+
+def exact_key(reading: str) -> str:
+    """Case- and normalization-insensitive form; spaces count as hyphens."""
+    return unicodedata.normalize("NFC", _SPACES_RE.sub("-", reading.strip().lower()))
+
+
+def toneless_key(reading: str) -> str:
+    text = unicodedata.normalize("NFD", exact_key(reading))
+    return unicodedata.normalize("NFC", _TONE_MARKS_RE.sub("", text))
+
+
+def bare_key(reading: str) -> str:
+    """Toneless and hyphen-insensitive: the key the reverse index is stored under."""
+    return toneless_key(reading).replace("-", "")
+
+
+def normalize_query(query: str, *, orthography: bool = True) -> str:
+    """Accept 台羅 or POJ, with tone marks or tone numbers (`chit8`, `tsi̍t`, `tsit8`)."""
+    return exact_key(convert_poj_word_to_tailo(query, orthography=orthography))
+
+
+def _group_readings(
+    mapping: Mapping[str, list[str]], headwords: Iterable[str]
+) -> dict[str, dict[str, list[str]]]:
+    """Bare key → {reading: [headword, ...]} for `headwords` (visited in codepoint order)."""
+    entries: dict[str, dict[str, list[str]]] = {}
+    for headword in sorted(headwords):
+        for reading in mapping.get(headword) or ():
+            key = bare_key(reading)
+            if key:
+                entries.setdefault(key, {}).setdefault(reading, []).append(headword)
+    return entries
+
+
+def _pack_groups(groups: dict[str, list[str]]) -> bytes:
+    return _GROUP_SEP.join(
+        _FIELD_SEP.join([reading, *headwords]) for reading, headwords in groups.items()
+    ).encode("utf-8")
+
+
+def pack_reverse_table(mapping: Mapping[str, list[str]]) -> bytes:
+    """
+    Bare romanization → groups of `reading, headword, headword, ...` (headwords in
+    codepoint order), so a search filters distinct readings, not every headword.
+    """
+    return pack_key_table(
+        (key.encode("utf-8"), _pack_groups(groups))
+        for key, groups in _group_readings(mapping, mapping).items()
+    )
+
+
+class ReverseIndex:
+    """
+    Romanization → headwords, over a packed table keyed by `bare_key`. Exact and
+    toneless matches are one hashed probe plus a filter over that key's entries.
+    """
+
+    def __init__(self, buf, offset: int = 0) -> None:
+        self._table = KeyTable(buf, offset)
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping[str, list[str]]) -> ReverseIndex:
+        return cls(pack_reverse_table(mapping))
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def patched(
+        self,
+        old: Mapping[str, list[str]],
+        new: Mapping[str, list[str]],
+        headwords: Iterable[str],
+    ) -> bytes:
+        """
+        The packed table for `new`, given that only `headwords` differ from `old`:
+        keys those headwords are (or were) read under are regrouped, every other key
+        is copied as packed bytes.
+        """
+        headwords = set(headwords)
+        affected = {
+            bare_key(reading)
+            for mapping in (old, new)
+            for headword in headwords
+            for reading in mapping.get(headword) or ()
+        }
+        affected.discard("")
+        table = self._table
+        items: list[tuple[bytes, bytes]] = []
+        involved = set(headwords)
+        for key in affected:
+            idx = table.find(key.encode("utf-8"))
+            if idx >= 0:
+                for group in table.value(idx).decode("utf-8").split(_GROUP_SEP):
+                    involved.update(group.split(_FIELD_SEP)[1:])
+        regrouped = _group_readings(new, involved)
+        for key in affected:
+            if key in regrouped:
+                items.append((key.encode("utf-8"), _pack_groups(regrouped[key])))
+        skip = {key.encode("utf-8") for key in affected}
+        items.extend((key, value) for key, value in table.items() if key not in skip)
+        return pack_key_table(items)
+
+    def search(
+        self,
+        query: str,
+        *,
+        tones: bool = True,
+        hyphens: bool = True,
+        orthography: bool = True,
+    ) -> list[tuple[str, str]]:
+        """
+        `(headword, reading)` pairs read as `query`, grouped by reading. `tones=False`
+        ignores tone marks (and numbers); `hyphens=False` ignores syllable boundaries
+        (`tsi̍ttuā` finds 一大).
+        """
+        q = normalize_query(query, orthography=orthography)
+        idx = self._table.find(bare_key(q).encode("utf-8"))
+        if idx < 0:
+            return []
+        if tones:
+            want = q if hyphens else q.replace("-", "")
+        else:
+            want = toneless_key(q) if hyphens else bare_key(q)
+
+        out: list[tuple[str, str]] = []
+        for group in self._table.value(idx).decode("utf-8").split(_GROUP_SEP):
+            reading, *headwords = group.split(_FIELD_SEP)
+            if tones:
+                got = exact_key(reading)
+                if not hyphens:
+                    got = got.replace("-", "")
+            else:
+                got = toneless_key(reading) if hyphens else bare_key(reading)
+            if got == want:
+                out.extend((headword, reading) for headword in headwords)
+        return out
+
+
+def pack_reverse_index(mapping: Mapping[str, list[str]], meta: dict) -> bytes:
+    return pack_file(_MAGIC, dict(meta, format=FORMAT_VERSION), pack_reverse_table(mapping))
+
+
+def patch_reverse_index(
+    index: ReverseIndex,
+    old: Mapping[str, list[str]],
+    new: Mapping[str, list[str]],
+    headwords: Iterable[str],
+    meta: dict,
+) -> bytes:
+    """`index` re-packed for `new` (see `ReverseIndex.patched`), with `meta` recorded."""
+    return pack_file(_MAGIC, dict(meta, format=FORMAT_VERSION), index.patched(old, new, headwords))
+
+
+def reverse_index_path(
+    path: Path, *, orthography: bool, layers: Sequence[Path] = (), cache_dir: Path | None = None
+) -> Path:
+    name = "-".join(source_key(p) for p in (path, *layers))
+    suffix = "orth" if orthography else "raw"
+    return (cache_dir or default_cache_dir()) / f"{name}-{suffix}.tlri"
+
+
+def read_reverse_index(path: Path) -> tuple[ReverseIndex, dict] | None:
+    """The index stored at `path` and its meta, or None when missing or unreadable."""
+    try:
+        buf = open_mmap(path)
+        meta = read_file_header(buf, _MAGIC)
+    except (OSError, ValueError, struct.error):
+        return None
+    if meta.get("format") != FORMAT_VERSION:
+        return None
+    return ReverseIndex(buf, meta["tables"][0]), meta
+
+
+def open_reverse_index(
+    mapping: Mapping[str, list[str]],
+    path: Path | None,
+    *,
+    orthography: bool,
+    layers: Sequence[Path] = (),
+    use_cache: bool = True,
+    cache_dir: Path | None = None,
+    stats: Stats | None = None,
+) -> ReverseIndex:
+    """
+    The reverse index of `mapping`, loaded from the dictionary at `path` (with overlay
+    dictionaries `layers`). It is cached in its own file, valid while `mapping.version`
+    is unchanged, and built on first use, so only `rlookup` pays for it. With
+    `path=None`, a mapping without a version, or `use_cache=False`, it is built in
+    memory. With `stats`, counts `reverse_index.fresh` or `reverse_index.built`.
+    """
+    version = getattr(mapping, "version", None)
+    rpath = None
+    if path is not None and version is not None and use_cache:
+        rpath = reverse_index_path(path, orthography=orthography, layers=layers, cache_dir=cache_dir)
+        found = read_reverse_index(rpath)
+        if found is not None and found[1].get("version") == version:
+            if stats is not None:
+                stats.add("reverse_index.fresh")
+            return found[0]
+
+    if stats is not None:
+        stats.add("reverse_index.built")
+    data = pack_reverse_index(mapping, {"version": version, "orthography": orthography})
+    if rpath is not None:
+        try:
+            atomic_write_bytes(rpath, data)
+        except OSError:
+            pass  # Read-only cache dir: serve from memory.
+    return ReverseIndex(data, read_file_header(data, _MAGIC)["tables"][0])
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import re
+from functools import lru_cache
 
 TONE_COMBINING_MARK = {
     2: "\u0301",  # acute
@@ -79,6 +80,41 @@ def _apply_tone_mark(body: str, tone: int) -> str:
     return body[: mark_index + 1] + combining + body[mark_index + 1 :]
 
 
+# Taiwanese has only a few thousand distinct syllable x tone tokens, so per-token
+# results are memoized: repeated syllables cost one cache hit instead of re-running
+# the orthography and tone-placement rules.
+_TOKEN_CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=_TOKEN_CACHE_SIZE)
+def poj_token_to_tailo(token: str, orthography: bool = True) -> str:
+    """Convert one roman token (`[A-Za-z]+[1-9]?`) as `convert_poj_word_to_tailo` does."""
+    tone = None
+    if token and token[-1].isdigit() and token[-1] != "0":
+        tone = int(token[-1])
+        body = token[:-1]
+    else:
+        body = token
+
+    if orthography:
+        body = _to_tailo_orthography(body)
+    else:
+        body = body.replace("ⁿ", "nn").replace("N", "nn").lower()
+
+    if tone is None:
+        return body
+    return _apply_tone_mark(body, tone)
+
+
+@lru_cache(maxsize=_TOKEN_CACHE_SIZE)
+def numeric_poj_token_to_tailo(token: str, orthography: bool = True) -> str:
+    """Convert one tone-number token (`[A-Za-z]+[1-9]`) as `convert_numeric_poj_in_text` does."""
+    tone = int(token[-1])
+    body = token[:-1]
+    body = _to_tailo_orthography(body) if orthography else body.replace("N", "nn").lower()
+    return _apply_tone_mark(body, tone)
+
+
 def convert_poj_word_to_tailo(text: str, *, orthography: bool = True) -> str:
     """
     Convert a POJ-ish word (e.g. dict.csv `word`) into Tâi-lô-ish output.
@@ -86,26 +122,9 @@ def convert_poj_word_to_tailo(text: str, *, orthography: bool = True) -> str:
     - Safe to run on strings that include punctuation/parentheses; only roman
       syllables are converted.
     """
-
-    def repl(match: re.Match[str]) -> str:
-        token = match.group(0)
-        tone = None
-        if token and token[-1].isdigit() and token[-1] != "0":
-            tone = int(token[-1])
-            body = token[:-1]
-        else:
-            body = token
-
-        if orthography:
-            body = _to_tailo_orthography(body)
-        else:
-            body = body.replace("ⁿ", "nn").replace("N", "nn").lower()
-
-        if tone is None:
-            return body
-        return _apply_tone_mark(body, tone)
-
-    return _ROMAN_SYLLABLE_RE.sub(repl, text.strip())
+    return _ROMAN_SYLLABLE_RE.sub(
+        lambda m: poj_token_to_tailo(m.group(0), orthography), text.strip()
+    )
 
 
 def convert_numeric_poj_in_text(text: str, *, orthography: bool = True) -> str:
@@ -113,13 +132,6 @@ def convert_numeric_poj_in_text(text: str, *, orthography: bool = True) -> str:
     Convert only tone-number syllables (A-Za-z + [1-9]) inside free text.
     Useful for `--mode auto` so we don't mutate unrelated English words.
     """
-
-    def repl(match: re.Match[str]) -> str:
-        token = match.group(0)
-        tone = int(token[-1])
-        body = token[:-1]
-        body = _to_tailo_orthography(body) if orthography else body.replace("N", "nn").lower()
-        return _apply_tone_mark(body, tone)
-
-    return _ROMAN_NUMERIC_RE.sub(repl, text)
-
+    return _ROMAN_NUMERIC_RE.sub(
+        lambda m: numeric_poj_token_to_tailo(m.group(0), orthography), text
+    )
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import re
+import struct
+from collections.abc import Callable, Iterable, Sequence
+from pathlib import Path
+
+from .cache import (
+    atomic_write_bytes,
+    check_source,
+    default_cache_dir,
+    open_mmap,
+    source_key,
+)
+from .keytable import KeyTable, pack_file, pack_key_table, read_file_header
+from .stats import Stats
+
+FORMAT_VERSION = 1
+
+_MAGIC = b"TLST"
+
+# OpenCC Simplified→Traditional config → the config that undoes it. The table is
+# built by running the inverse over the headwords, so only these configs have one.
+INVERSE_CONFIGS = {"s2t": "t2s", "s2tw": "tw2s", "s2twp": "tw2sp", "s2hk": "hk2s"}
+
+# Headwords are converted in one OpenCC call, joined by a separator it leaves alone.
+_JOIN = "\n"
+
+
+def _build_tables(
+    headwords: Iterable[str], to_simplified: Callable[[str], str]
+) -> tuple[dict[str, str], dict[str, str]]:
+    """
+    `(chars, phrases)`:
+    - `chars`: Simplified character → the one Traditional character it stands for in
+      every headword. A character that is itself used in headwords (后, 面, …) is
+      never rewritten on its own.
+    - `phrases`: Simplified spelling → headword, for headwords with a character that is
+      ambiguous (发 → 發 / 髮) or also a headword character, unless that spelling is
+      a headword itself. First headword wins.
+    """
+    headwords = [hw for hw in headwords if _JOIN not in hw]
+    simplified = to_simplified(_JOIN.join(headwords)).split(_JOIN)
+    if len(simplified) != len(headwords):
+        simplified = [to_simplified(hw) for hw in headwords]
+
+    used = {ch for hw in headwords for ch in hw}
+    targets: dict[str, set[str]] = {}
+    changed: list[tuple[str, str]] = []
+    for hw, simp in zip(headwords, simplified):
+        # Length-changing (phrase-level) rewrites would break offsets: skip them.
+        if simp == hw or len(simp) != len(hw):
+            continue
+        changed.append((simp, hw))
+        for s, t in zip(simp, hw):
+            if s != t:
+                targets.setdefault(s, set()).add(t)
+
+    chars = {
+        s: next(iter(ts)) for s, ts in targets.items() if len(ts) == 1 and s not in used
+    }
+    phrases: dict[str, str] = {}
+    known = set(headwords)
+    for simp, hw in changed:
+        # A spelling that is a headword itself already matches as it is.
+        if simp in known:
+            continue
+        if any(s != t and s not in chars for s, t in zip(simp, hw)):
+            phrases.setdefault(simp, hw)
+    return chars, phrases
+
+
+def build_s2t_table(
+    headwords: Iterable[str],
+    to_simplified: Callable[[str], str],
+    *,
+    config: str,
+    source: dict | None = None,
+    layers: list[dict] | None = None,
+) -> bytes:
+    """Pack the table of `_build_tables` (see `S2TTable`) with its meta."""
+    chars, phrases = _build_tables(headwords, to_simplified)
+    meta = {
+        "format": FORMAT_VERSION,
+        "config": config,
+        "source": source,
+        "layers": layers or [],
+        "phrase_starts": "".join(sorted({p[0] for p in phrases})),
+    }
+    return pack_file(
+        _MAGIC,
+        meta,
+        pack_key_table((s.encode("utf-8"), t.encode("utf-8")) for s, t in chars.items()),
+        pack_key_table((s.encode("utf-8"), t.encode("utf-8")) for s, t in phrases.items()),
+    )
+
+
+class S2TTable:
+    """
+    Simplified→Traditional restricted to the dictionary: only spellings that turn
+    into headword text are rewritten, everything else is left as is. Output has the
+    same length as the input, so segment offsets still point into the original.
+    """
+
+    def __init__(self, buf, meta: dict) -> None:
+        self.meta = meta
+        chars = KeyTable(buf, meta["tables"][0])
+        self._translate = {ord(s.decode("utf-8")): t.decode("utf-8") for s, t in chars.items()}
+        # Probed once per candidate length at each position a phrase can start:
+        # a dict is several times faster than hashing into the mmap'd table.
+        self._phrases = {
+            s.decode("utf-8"): t.decode("utf-8")
+            for s, t in KeyTable(buf, meta["tables"][1]).items()
+        }
+        self._lengths = sorted({len(s) for s in self._phrases}, reverse=True)
+        starts = meta["phrase_starts"]
+        self._starts_re = re.compile(f"[{re.escape(starts)}]") if starts else None
+
+    def __len__(self) -> int:
+        return len(self._translate) + len(self._phrases)
+
+    def convert(self, text: str) -> str:
+        """
+        One pass over `text`: phrases at the positions where one can start
+        (longest first), then a `str.translate` of the unambiguous characters.
+        """
+        if self._starts_re is not None:
+            search = self._starts_re.search
+            m = search(text)
+            if m is not None:
+                get = self._phrases.get
+                lengths = self._lengths
+                parts: list[str] = []
+                done = 0
+                while m is not None:
+                    i = m.start()
+                    for length in lengths:
+                        trad = get(text[i : i + length])
+                        if trad is not None:
+                            parts.append(text[done:i])
+                            parts.append(trad)
+                            done = i + length
+                            break
+                    m = search(text, done if done > i else i + 1)
+                parts.append(text[done:])
+                text = "".join(parts)
+        return text.translate(self._translate)
+
+
+def s2t_table_path(
+    path: Path, config: str, *, layers: Sequence[Path] = (), cache_dir: Path | None = None
+) -> Path:
+    name = "-".join(source_key(p) for p in (path, *layers))
+    return (cache_dir or default_cache_dir()) / f"{name}-{config}.tlst"
+
+
+def open_s2t_table(
+    path: Path | None,
+    headwords: Callable[[], Iterable[str]],
+    to_simplified: Callable[[str], str],
+    *,
+    config: str,
+    layers: Sequence[Path] = (),
+    use_cache: bool = True,
+    cache_dir: Path | None = None,
+    stats: Stats | None = None,
+) -> S2TTable:
+    """
+    Open the table for the dictionary at `path` (with overlay dictionaries `layers`,
+    see `layers.py`) and OpenCC `config`, building it from `headwords()` on first
+    use and whenever one of those files changes. With `path=None` (an in-memory
+    mapping) or `use_cache=False` it is built in memory. With `stats`, counts
+    `s2t_table.fresh` or `s2t_table.built`.
+    """
+    tpath = None
+    source = None
+    layer_sources: list[dict] = []
+    if path is not None and use_cache:
+        tpath = s2t_table_path(path, config, layers=layers, cache_dir=cache_dir)
+        meta = None
+        try:
+            buf = open_mmap(tpath)
+            meta = read_file_header(buf, _MAGIC)
+            if meta.get("format") != FORMAT_VERSION or meta.get("config") != config:
+                meta = None
+        except (OSError, ValueError, struct.error):
+            meta = None
+
+        state, source = check_source(path, meta.get("source") if meta else None)
+        fresh = meta is not None and state == "fresh"
+        recorded = meta.get("layers", []) if meta else []
+        for i, layer in enumerate(layers):
+            layer_state, layer_source = check_source(
+                layer, recorded[i] if i < len(recorded) else None
+            )
+            fresh = fresh and layer_state == "fresh"
+            layer_sources.append(layer_source)
+        if fresh:
+            if stats is not None:
+                stats.add("s2t_table.fresh")
+            return S2TTable(buf, meta)
+
+    if stats is not None:
+        stats.add("s2t_table.built")
+    data = build_s2t_table(
+        headwords(), to_simplified, config=config, source=source, layers=layer_sources
+    )
+    if tpath is not None:
+        try:
+            atomic_write_bytes(tpath, data)
+        except OSError:
+            pass  # Read-only cache dir: serve from memory.
+    return S2TTable(data, read_file_header(data, _MAGIC))
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from collections.abc import Iterable
+from typing import Protocol
+
+from .variants import fold_variants
+
+WILDCARDS = "?*"
+
+
+class SortedHeadwords(Protocol):
+    """Headwords in codepoint order with prefix ranges (e.g. `CompiledDict`)."""
+
+    def __len__(self) -> int: ...
+
+    def key(self, idx: int) -> str: ...
+
+    def prefix_range(self, prefix: str) -> tuple[int, int]: ...
+
+
+class SortedKeyList:
+    """`SortedHeadwords` over an in-memory mapping (used when no compiled cache is loaded)."""
+
+    def __init__(self, keys: Iterable[str]) -> None:
+        self._keys = sorted(keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def key(self, idx: int) -> str:
+        return self._keys[idx]
+
+    def prefix_range(self, prefix: str) -> tuple[int, int]:
+        if not prefix:
+            return 0, len(self._keys)
+        lo = bisect_left(self._keys, prefix)
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return lo, bisect_left(self._keys, upper, lo)
+
+
+def split_pattern(pattern: str) -> tuple[str, re.Pattern[str] | None]:
+    """
+    `(literal_prefix, regex)` for a headword pattern: `?` matches one character,
+    `*` any run. `regex` is None when the pattern is a plain prefix (`一*`) or has
+    no wildcards at all.
+    """
+    cut = len(pattern)
+    for i, ch in enumerate(pattern):
+        if ch in WILDCARDS:
+            cut = i
+            break
+    prefix, rest = pattern[:cut], pattern[cut:]
+    if not rest or rest.strip("*") == "":
+        return prefix, None
+    parts = ["." if ch == "?" else ".*" if ch == "*" else re.escape(ch) for ch in rest]
+    return prefix, re.compile(re.escape(prefix) + "".join(parts), re.DOTALL)
+
+
+def match_headwords(
+    keys: SortedHeadwords,
+    pattern: str,
+    *,
+    limit: int = 50,
+    offset: int = 0,
+) -> list[str]:
+    """
+    Headwords matching `pattern` in codepoint order, skipping the first `offset`
+    matches and returning at most `limit`. Only the range sharing the pattern's
+    literal prefix is visited, so `一*` costs two binary searches plus `limit` keys.
+    """
+    pattern = fold_variants(pattern)
+    prefix, regex = split_pattern(pattern)
+    lo, hi = keys.prefix_range(prefix)
+    if limit <= 0 or lo >= hi:
+        return []
+
+    if regex is None:
+        if not pattern.endswith("*"):
+            # No wildcard: just the exact headword, if present.
+            return [prefix] if offset == 0 and keys.key(lo) == prefix else []
+        start = lo + offset
+        return [keys.key(i) for i in range(start, min(hi, start + limit))]
+
+    out: list[str] = []
+    skipped = 0
+    for i in range(lo, hi):
+        key = keys.key(i)
+        if regex.fullmatch(key) is None:
+            continue
+        if skipped < offset:
+            skipped += 1
+            continue
+        out.append(key)
+        if len(out) >= limit:
+            break
+    return out
@@ -0,0 +1,540 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from .api import OUTPUTS, Converter
+from .bench import percentile
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BATCH = 64
+
+# Option values a request may set (anything else is a 400, not a failed batch).
+OPTIONS = {
+    "convert": {
+        "mode": ("auto", "hanzi", "poj"),
+        "ambiguous": ("first", "all"),
+        "unknown": ("keep", "mark"),
+        "output": OUTPUTS,
+    },
+    "lookup": {"output": OUTPUTS},
+}
+# Request fields carrying one item, or a list of items.
+_ITEMS = {"convert": ("text", "texts"), "lookup": ("word", "words")}
+
+_MAX_BODY = 1 << 20
+_MAX_HEADERS = 100
+_LATENCY_WINDOW = 4096  # Recent requests per endpoint kept for percentiles.
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+_worker: Converter | None = None
+
+
+def _warn(message: str) -> None:
+    print(message, file=sys.stderr)
+
+
+def _init_worker(converter_kwargs: dict) -> None:
+    global _worker
+    _worker = Converter(**converter_kwargs, on_opencc_error=_warn)
+
+
+def _warm() -> int:
+    assert _worker is not None
+    _worker.load()
+    return os.getpid()
+
+
+def _run_items(op: str, options: dict, items: list[str]) -> list:
+    conv = _worker
+    assert conv is not None
+    if op == "convert":
+        return conv.convert_many(items, **options)
+    return [conv.lookup(word, **options) for word in items]
+
+
+def _run_batch(op: str, groups: list[tuple[dict, list[str]]]) -> list[list]:
+    """
+    Worker side: one result list per `(options, items)` group. Convert groups go
+    through `convert_many`, so a batch shares the trie decision and memo tables.
+    When a group raises, its items are retried one by one and an item that still
+    fails gets its exception as result, so it does not fail the requests batched
+    with it.
+    """
+    results: list[list] = []
+    for options, items in groups:
+        try:
+            results.append(_run_items(op, options, items))
+        except Exception:
+            values: list = []
+            for item in items:
+                try:
+                    values.extend(_run_items(op, options, [item]))
+                except Exception as e:
+                    values.append(e)
+            results.append(values)
+    return results
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class Metrics:
+    """Request counts, recent latencies, batch sizes and queue depth for `/metrics`."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.requests: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.latencies: dict[str, deque[float]] = {}
+        self.batches = 0
+        self.batched_items = 0
+        self.max_batch = 0
+        self.queued = 0
+        self.in_flight = 0
+
+    def observe(self, endpoint: str, seconds: float, status: int) -> None:
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        if status >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        window = self.latencies.get(endpoint)
+        if window is None:
+            window = self.latencies[endpoint] = deque(maxlen=_LATENCY_WINDOW)
+        window.append(seconds)
+
+    def batch(self, size: int) -> None:
+        self.batches += 1
+        self.batched_items += size
+        self.max_batch = max(self.max_batch, size)
+
+    def to_dict(self) -> dict:
+        uptime = time.monotonic() - self.started
+        endpoints = {}
+        for endpoint, count in sorted(self.requests.items()):
+            latencies = sorted(self.latencies[endpoint])
+            endpoints[endpoint] = {
+                "requests": count,
+                "errors": self.errors.get(endpoint, 0),
+                "rps": round(count / uptime, 2) if uptime else 0.0,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            }
+        return {
+            "uptime_s": round(uptime, 3),
+            "endpoints": endpoints,
+            "batches": {
+                "count": self.batches,
+                "items": self.batched_items,
+                "mean_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+                "max_size": self.max_batch,
+            },
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+        }
+
+
+class Batcher:
+    """
+    Coalesces concurrent requests of one kind (`convert` or `lookup`) into worker
+    calls. A batch is dispatched as soon as a worker is free, taking everything
+    queued by then (up to `max_batch`): an idle server answers at once, a busy one
+    sends fewer, larger batches. `max_wait` (seconds) additionally holds the first
+    request of a batch so that more can join it.
+    """
+
+    def __init__(
+        self,
+        op: str,
+        run: Callable[[str, list[tuple[dict, list[str]]]], Awaitable[list[list]]],
+        metrics: Metrics,
+        *,
+        slots: int,
+        max_batch: int = MAX_BATCH,
+        max_wait: float = 0.0,
+    ) -> None:
+        self.op = op
+        self._run = run
+        self._metrics = metrics
+        self._slots = asyncio.Semaphore(slots)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue[tuple[str, dict, str, asyncio.Future]] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        self._dispatching: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def submit(self, options: dict, items: list[str]) -> list:
+        loop = asyncio.get_running_loop()
+        key = json.dumps(options, sort_keys=True)
+        futures = [loop.create_future() for _ in items]
+        for item, fut in zip(items, futures):
+            self._queue.put_nowait((key, options, item, fut))
+        self._metrics.queued += len(items)
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    async def _loop(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            await self._slots.acquire()
+            if self.max_wait:
+                await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self._metrics.queued -= len(batch)
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch: list[tuple[str, dict, str, asyncio.Future]]) -> None:
+        groups: dict[str, tuple[dict, list[str], list[asyncio.Future]]] = {}
+        for key, options, item, fut in batch:
+            group = groups.setdefault(key, (options, [], []))
+            group[1].append(item)
+            group[2].append(fut)
+        self._metrics.batch(len(batch))
+        self._metrics.in_flight += 1
+        try:
+            results = await self._run(
+                self.op, [(options, items) for options, items, _ in groups.values()]
+            )
+        except Exception as e:  # Dictionary missing / unreadable, worker died, …
+            for _, _, futures in groups.values():
+                for fut in futures:
+                    if not fut.done():
+                        fut.set_exception(e)
+        else:
+            for (_, _, futures), values in zip(groups.values(), results):
+                for fut, value in zip(futures, values):
+                    if fut.done():
+                        continue
+                    if isinstance(value, BaseException):
+                        fut.set_exception(value)  # This item only (see `_run_batch`).
+                    else:
+                        fut.set_result(value)
+        finally:
+            self._metrics.in_flight -= 1
+            self._slots.release()
+
+
+def _options(op: str, params: dict) -> dict:
+    options = {}
+    for name, allowed in OPTIONS[op].items():
+        value = params.get(name)
+        if value is None:
+            continue
+        if value not in allowed:
+            raise HTTPError(400, f"{name} must be one of {list(allowed)}")
+        options[name] = value
+    return options
+
+
+def _items(op: str, params: dict) -> tuple[list[str], bool]:
+    """`(items, many)`: the request's text(s) / word(s)."""
+    one, many = _ITEMS[op]
+    if many in params:
+        items = params[many]
+        if not isinstance(items, list) or not all(isinstance(i, str) for i in items):
+            raise HTTPError(400, f"`{many}` must be a list of strings")
+        return items, True
+    item = params.get(one)
+    if not isinstance(item, str):
+        raise HTTPError(400, f"missing `{one}` (or `{many}`)")
+    return [item], False
+
+
+class Server:
+    """
+    Local HTTP JSON API over one dictionary (stdlib asyncio; HTTP/1.1 keep-alive).
+
+    - `POST /convert` `{"text": ...}` or `{"texts": [...]}` plus `mode`, `ambiguous`,
+      `unknown`, `output` → `{"text": ...}` / `{"texts": [...]}`
+    - `POST /lookup` `{"word": ...}` or `{"words": [...]}` plus `output` →
+      `{"readings": [...]}` / `{"results": [[...], ...]}`
+    - `GET /convert?text=...`, `GET /lookup?word=...` take the same fields as query parameters.
+    - `GET /health`, `GET /metrics`.
+
+    Work runs in `workers` processes (each opens the memory-mapped compiled cache,
+    so the dictionary pages are shared), or in one thread with `workers=0`.
+    """
+
+    def __init__(
+        self,
+        converter_kwargs: dict,
+        *,
+        workers: int | None = None,
+        max_batch: int = MAX_BATCH,
+        max_wait: float = 0.0,
+    ) -> None:
+        self.converter_kwargs = converter_kwargs
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.metrics = Metrics()
+        self.dict_version: str | None = None
+        self._executor: Executor | None = None
+        self.restarts = 0
+        self.last_failure: str | None = None
+        self._batchers: dict[str, Batcher] = {}
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> int:
+        """Load the dictionary, start the workers and listen. Returns the bound port."""
+        loop = asyncio.get_running_loop()
+        # Build / open the compiled cache once here, so workers only map it.
+        conv = Converter(**self.converter_kwargs, on_opencc_error=_warn)
+        await loop.run_in_executor(None, conv.load)
+        self.dict_version = conv.dict_version
+        self._executor = self._new_executor()
+        slots = max(1, self.workers)
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _warm) for _ in range(slots)))
+        for op in OPTIONS:
+            batcher = Batcher(
+                op,
+                self._run,
+                self.metrics,
+                slots=slots,
+                max_batch=self.max_batch,
+                max_wait=self.max_wait,
+            )
+            batcher.start()
+            self._batchers[op] = batcher
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for batcher in self._batchers.values():
+            await batcher.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _new_executor(self) -> Executor:
+        if self.workers > 0:
+            # The first pool forks before we listen. A replacement starts while
+            # clients are connected, and forked workers would keep their sockets
+            # open (no EOF for `Connection: close`), so it spawns fresh interpreters.
+            context = multiprocessing.get_context("spawn") if self._executor else None
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.converter_kwargs,),
+            )
+        return ThreadPoolExecutor(
+            max_workers=1, initializer=_init_worker, initargs=(self.converter_kwargs,)
+        )
+
+    def _pool(self) -> Executor:
+        """
+        The executor, re-created first if it is broken: once a worker process dies
+        (killed for memory, crashed), a `ProcessPoolExecutor` refuses all work.
+        """
+        executor = self._executor
+        assert executor is not None
+        # The stdlib pools record this in `_broken` (False, or the reason).
+        broken = getattr(executor, "_broken", False)
+        if broken:
+            self._restart(executor, str(broken))
+        return self._executor  # type: ignore[return-value]
+
+    def _restart(self, executor: Executor, reason: str) -> None:
+        if self._executor is not executor:
+            return  # Another batch on the same pool already replaced it.
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._new_executor()
+        self.restarts += 1
+        self.last_failure = reason
+
+    async def _run(self, op: str, groups: list[tuple[dict, list[str]]]) -> list[list]:
+        executor = self._pool()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, _run_batch, op, groups)
+        except BrokenExecutor as e:
+            # This batch fails (503); the next one gets fresh workers.
+            self._restart(executor, str(e))
+            raise
+
+    # -- HTTP ---------------------------------------------------------------------------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+                    break
+                if not request_line.strip():
+                    break
+                t0 = time.perf_counter()
+                endpoint = "?"
+                keep_alive = True
+                try:
+                    method, target, version = request_line.decode("utf-8", "replace").split()
+                    headers = await self._read_headers(reader)
+                    keep_alive = (
+                        headers.get("connection", "").lower() != "close"
+                        if version == "HTTP/1.1"
+                        else headers.get("connection", "").lower() == "keep-alive"
+                    )
+                    url = urlsplit(target)
+                    endpoint = url.path
+                    body = await self._read_body(reader, headers)
+                    status, reply = await self._route(method, url.path, url.query, body)
+                except HTTPError as e:
+                    status, reply = e.status, {"error": str(e)}
+                except ValueError:
+                    status, reply, keep_alive = 400, {"error": "malformed request"}, False
+                except Exception as e:
+                    status, reply = 500, {"error": f"{type(e).__name__}: {e}"}
+                self._respond(writer, status, reply, keep_alive)
+                await writer.drain()
+                if endpoint in ("/convert", "/lookup", "/health", "/metrics"):
+                    self.metrics.observe(endpoint, time.perf_counter() - t0, status)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def _read_headers(reader: asyncio.StreamReader) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        for _ in range(_MAX_HEADERS):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        raise HTTPError(400, "too many headers")
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, headers: dict[str, str]) -> bytes:
+        length = int(headers.get("content-length") or 0)
+        if length > _MAX_BODY:
+            raise HTTPError(413, f"body over {_MAX_BODY} bytes")
+        return await reader.readexactly(length) if length else b""
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: int, reply: dict, keep_alive: bool) -> None:
+        body = json.dumps(reply, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+    async def _route(self, method: str, path: str, query: str, body: bytes) -> tuple[int, dict]:
+        if path == "/health":
+            self._pool()  # A pool broken while idle is replaced now, not on the next request.
+            return 200, {
+                "status": "ok",
+                "pid": os.getpid(),
+                "workers": self.workers,
+                "executor": {
+                    "kind": "processes" if self.workers > 0 else "thread",
+                    "restarts": self.restarts,
+                    "last_failure": self.last_failure,
+                },
+                "dict_version": self.dict_version,
+                "uptime_s": round(time.monotonic() - self.metrics.started, 3),
+            }
+        if path == "/metrics":
+            return 200, self.metrics.to_dict()
+        op = path.strip("/")
+        if op not in self._batchers:
+            raise HTTPError(404, f"no such endpoint: {path}")
+        if method == "GET":
+            params: dict = dict(parse_qsl(query))
+        elif method == "POST":
+            try:
+                params = json.loads(body.decode("utf-8")) if body else {}
+            except ValueError:
+                raise HTTPError(400, "body must be a JSON object") from None
+            if not isinstance(params, dict):
+                raise HTTPError(400, "body must be a JSON object")
+        else:
+            raise HTTPError(405, f"{method} not allowed")
+        options = _options(op, params)
+        items, many = _items(op, params)
+        try:
+            results = await self._batchers[op].submit(options, items)
+        except (FileNotFoundError, ValueError, RuntimeError) as e:
+            raise HTTPError(503, str(e)) from e
+        if op == "convert":
+            return 200, {"texts": results} if many else {"text": results[0]}
+        return 200, {"results": results} if many else {"readings": results[0]}
+
+
+def serve(
+    converter_kwargs: dict,
+    *,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    workers: int | None = None,
+    max_batch: int = MAX_BATCH,
+    max_wait: float = 0.0,
+    on_ready: Callable[[str, int], None] | None = None,
+) -> None:
+    """Run a `Server` until interrupted (Ctrl-C / SIGTERM ends it cleanly)."""
+
+    async def main() -> None:
+        server = Server(converter_kwargs, workers=workers, max_batch=max_batch, max_wait=max_wait)
+        bound = await server.start(host, port)
+        if on_ready:
+            on_ready(host, bound)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        try:
+            await stop.wait()
+        finally:
+            await server.close()
+
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import time
+from collections.abc import Callable, Iterator
+from typing import TextIO
+
+# Shared no-op context for disabled instrumentation: `timed(None, ...)` costs one
+# branch and no allocation.
+_DISABLED = contextlib.nullcontext()
+
+
+class Stats:
+    """
+    Per-stage timings and named counters, filled in by `Converter(stats=...)`,
+    `load_dict(stats=...)` and the CLI's `--stats`.
+
+    Stages: `dict_load`, `trie_build`, `index_open`, `s2t_table`, `s2t`, `opencc`,
+    `segment`, `romanize`, `ipa`, `match`, `rlookup`, `search`, `page_image`,
+    `reverse_build`, and `total` (the whole CLI command).
+    Counters are dotted names, e.g. `segment.candidates` (segmentations evaluated),
+    `segment.probes` (dictionary / trie probes), `dict_cache.fresh`, `romanize.memo_hits`.
+
+    Hooks (`on_stage(stage, seconds)`) run after every timed stage, so callers can
+    feed their own profiler or metrics system without parsing the report.
+    """
+
+    def __init__(self, on_stage: Callable[[str, float], None] | None = None) -> None:
+        self.timings: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self.counters: dict[str, int] = {}
+        self.hooks: list[Callable[[str, float], None]] = [on_stage] if on_stage else []
+
+    def add(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        for hook in self.hooks:
+            hook(stage, seconds)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, *, memo: tuple = ()) -> Iterator[None]:
+        """
+        Time a block as stage `name`. `memo` lists `lru_cache`d functions whose hits and
+        misses during the block are counted as `name.memo_hits` / `name.memo_misses`.
+        """
+        before = [fn.cache_info() for fn in memo]
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+            for fn, info in zip(memo, before):
+                after = fn.cache_info()
+                self.add(f"{name}.memo_hits", after.hits - info.hits)
+                self.add(f"{name}.memo_misses", after.misses - info.misses)
+
+    def merge(self, report: dict) -> None:
+        """Add a `to_dict()` report (e.g. from a worker process) into these totals."""
+        for stage, t in report.get("timings", {}).items():
+            self.timings[stage] = self.timings.get(stage, 0.0) + t["seconds"]
+            self.calls[stage] = self.calls.get(stage, 0) + t["calls"]
+        for name, n in report.get("counters", {}).items():
+            self.add(name, n)
+
+    def to_dict(self) -> dict:
+        return {
+            "timings": {
+                stage: {"seconds": round(self.timings[stage], 6), "calls": self.calls[stage]}
+                for stage in self.timings
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def report(self, file: TextIO) -> None:
+        """Write the JSON report as one line (the CLI writes it to stderr)."""
+        file.write(json.dumps(self.to_dict(), ensure_ascii=False) + "\n")
+
+
+def timed(stats: Stats | None, stage: str, *, memo: tuple = ()):
+    """`stats.stage(...)`, or a shared no-op context when instrumentation is off."""
+    return _DISABLED if stats is None else stats.stage(stage, memo=memo)
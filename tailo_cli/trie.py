@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+# Children are keyed by single characters, so the empty string can never collide.
+_VALUES = ""
+
+
+class HeadwordTrie:
+    """
+    Character trie over dictionary headwords for longest-match segmentation.
+    One forward walk per position finds the longest headword, without slicing
+    candidate substrings or bounding the probe length by `max_key_len`.
+    """
+
+    def __init__(self) -> None:
+        self._root: dict = {}
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping[str, list[str]]) -> HeadwordTrie:
+        trie = cls()
+        for key, vals in mapping.items():
+            if vals:
+                trie.insert(key, vals)
+        return trie
+
+    def insert(self, key: str, vals: list[str]) -> None:
+        node = self._root
+        for ch in key:
+            nxt = node.get(ch)
+            if nxt is None:
+                nxt = node[ch] = {}
+            node = nxt
+        node[_VALUES] = vals
+
+    def longest_match(self, text: str, start: int) -> tuple[int, list[str]] | None:
+        """Return `(length, values)` of the longest headword at `text[start:]`, or None."""
+        node = self._root
+        best = None
+        i = start
+        n = len(text)
+        while i < n:
+            node = node.get(text[i])
+            if node is None:
+                break
+            i += 1
+            vals = node.get(_VALUES)
+            if vals:
+                best = (i - start, vals)
+        return best
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+# Interchangeable forms of the same character, folded to one canonical form on both
+# the dictionary side (at build time) and the input side, so one segmentation pass
+# matches either spelling. `dict.csv` writes "台" (e.g. 台灣), so that is canonical
+# for 臺; elsewhere the canonical form is the one Taiwanese orthography (and OpenCC
+# s2tw output) uses. Keep this to true variants: folding must never merge two
+# characters that are distinct words.
+VARIANTS: dict[str, str] = {
+    "臺": "台",
+    "枱": "檯",
+    "裏": "裡",
+    "着": "著",
+    "爲": "為",
+    "峯": "峰",
+    "羣": "群",
+    "牀": "床",
+    "綫": "線",
+    "麪": "麵",
+    "衆": "眾",
+    "衞": "衛",
+    "啓": "啟",
+    "敍": "敘",
+    "敎": "教",
+    "戸": "戶",
+    "户": "戶",
+    "温": "溫",
+    "説": "說",
+    "脱": "脫",
+    "税": "稅",
+    "鋭": "銳",
+    "閲": "閱",
+    "悦": "悅",
+    "内": "內",
+    "兑": "兌",
+    "吿": "告",
+    "眞": "真",
+    "淸": "清",
+    "靑": "青",
+    "黄": "黃",
+    "僞": "偽",
+    "鷄": "雞",
+    "粧": "妝",
+    "廐": "廄",
+    "竪": "豎",
+    "踪": "蹤",
+    "綉": "繡",
+    "蔴": "麻",
+    "汚": "污",
+    "汙": "污",
+    "鉢": "缽",
+    "嫺": "嫻",
+    "擧": "舉",
+    "卽": "即",
+    "旣": "既",
+    "鎭": "鎮",
+    "愼": "慎",
+}
+
+_FOLD_TABLE = str.maketrans(VARIANTS)
+
+
+def fold_variants(text: str) -> str:
+    """Map variant characters to their canonical form (1:1, so offsets are preserved)."""
+    return text.translate(_FOLD_TABLE)
+
+
+def fold_mapping(mapping: Mapping[str, list[str]]) -> Mapping[str, list[str]]:
+    """
+    Fold dictionary keys. Entries whose keys fold together are merged in
+    mapping order, keeping each reading once. Returns `mapping` itself when
+    no key changes.
+    """
+    if not any(fold_variants(key) != key for key in mapping):
+        return mapping
+    folded: dict[str, list[str]] = {}
+    for key, vals in mapping.items():
+        merged = folded.setdefault(fold_variants(key), [])
+        for v in vals:
+            if v not in merged:
+                merged.append(v)
+    return folded
@@ -1,14 +1,80 @@
+import asyncio
 import contextlib
 import io
+import json
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
 import tempfile
+import threading
+import zlib
 from pathlib import Path
 import unittest
+from unittest import mock
 
-from tailo_cli.__main__ import main as tailo_main
-from tailo_cli.converter import hanzi_to_tailo
+from tailo_cli import bench, daemon, server
+from tailo_cli import delta as tailo_delta
+from tailo_cli import pages as tailo_pages
+from tailo_cli import result_cache as tailo_result_cache
+from tailo_cli import s2t as tailo_s2t
+from tailo_cli.__main__ import _run as tailo_run, main as tailo_main
+from tailo_cli.api import Converter, iter_chunks
+from tailo_cli.batch import _convert_file
+from tailo_cli.converter import (
+    contains_hanzi,
+    hanzi_to_tailo,
+    hanzi_to_tailo_with_stats,
+    iter_hanzi_runs,
+    iter_segments,
+)
+from tailo_cli.dict_cache import (
+    CompiledDict,
+    LoadedDict,
+    cache_path_for,
+    compile_dict,
+    load_dict,
+    open_compiled,
+)
+from tailo_cli.dict_loader import load_dict_csv
+from tailo_cli.headword_index import open_headword_index
+from tailo_cli.ingest import ingest
 from tailo_cli.ipa import tailo_syllable_to_ipa, tailo_to_ipa
 from tailo_cli.opencc_util import OpenCC, to_traditional
-from tailo_cli.romanize import convert_numeric_poj_in_text, convert_poj_word_to_tailo
+from tailo_cli.reverse_index import ReverseIndex, open_reverse_index
+from tailo_cli.search import SortedKeyList, match_headwords
+from tailo_cli.server import _run_batch
+from tailo_cli.stats import Stats
+from tailo_cli.romanize import (
+    convert_numeric_poj_in_text,
+    convert_poj_word_to_tailo,
+    numeric_poj_token_to_tailo,
+    poj_token_to_tailo,
+)
+from tailo_cli.trie import HeadwordTrie
+from tailo_cli.variants import fold_mapping, fold_variants
+
+_cache_tmpdir: tempfile.TemporaryDirectory | None = None
+_saved_cache_env: str | None = None
+
+
+def setUpModule() -> None:
+    # Keep compiled-dictionary caches out of the user's real cache dir.
+    global _cache_tmpdir, _saved_cache_env
+    _cache_tmpdir = tempfile.TemporaryDirectory()
+    _saved_cache_env = os.environ.get("TAILO_CACHE_DIR")
+    os.environ["TAILO_CACHE_DIR"] = _cache_tmpdir.name
+
+
+def tearDownModule() -> None:
+    if _saved_cache_env is None:
+        os.environ.pop("TAILO_CACHE_DIR", None)
+    else:
+        os.environ["TAILO_CACHE_DIR"] = _saved_cache_env
+    if _cache_tmpdir is not None:
+        _cache_tmpdir.cleanup()
 
 
 class TestRomanize(unittest.TestCase):
@@ -22,6 +88,33 @@ class TestRomanize(unittest.TestCase):
         self.assertEqual(convert_numeric_poj_in_text("foo chit8 bar"), "foo tsi̍t bar")
 
 
+class TestSyllableTables(unittest.TestCase):
+    ONSETS = ("", "p", "ph", "b", "m", "t", "th", "n", "l", "k", "kh", "g", "ng", "h", "ch", "chh", "s", "j")
+    RIMES = ("a", "ai", "au", "am", "an", "ang", "ap", "at", "ak", "ah", "e", "i", "ia", "iau", "iong",
+             "o", "oa", "oai", "oe", "o͘", "u", "ui", "aN", "iN", "m", "ng", "eng", "ek", "oan")
+
+    def _tokens(self):
+        for onset in self.ONSETS:
+            for rime in self.RIMES:
+                for tone in range(1, 9):
+                    yield f"{onset}{rime}{tone}"
+
+    def test_memoized_tables_match_rules(self) -> None:
+        for _ in range(2):  # Second pass is served from the tables.
+            for token in self._tokens():
+                for orthography in (True, False):
+                    self.assertEqual(
+                        poj_token_to_tailo(token, orthography),
+                        poj_token_to_tailo.__wrapped__(token, orthography),
+                    )
+                    self.assertEqual(
+                        numeric_poj_token_to_tailo(token, orthography),
+                        numeric_poj_token_to_tailo.__wrapped__(token, orthography),
+                    )
+                tailo = poj_token_to_tailo(token)
+                self.assertEqual(tailo_syllable_to_ipa(tailo), tailo_syllable_to_ipa.__wrapped__(tailo))
+
+
 class TestHanziConversion(unittest.TestCase):
     def test_longest_match_and_spacing(self) -> None:
         mapping = {
@@ -43,6 +136,750 @@ class TestHanziConversion(unittest.TestCase):
         out = hanzi_to_tailo("二", mapping, max_key_len=1, unknown="mark")
         self.assertEqual(out, "<?>")
 
+    def test_variant_folding(self) -> None:
+        mapping = fold_mapping({"臺灣": ["tâi-uân"], "台灣": ["tâi-uân", "tâi-ôan"], "裡": ["lāi"]})
+        self.assertEqual(mapping, {"台灣": ["tâi-uân", "tâi-ôan"], "裡": ["lāi"]})
+        text = "臺灣裏戸"
+        self.assertEqual(fold_variants(text), "台灣裡戶")
+        out = hanzi_to_tailo_with_stats(text, mapping, max_key_len=2, folded=fold_variants(text))
+        # Unknown characters keep their original spelling.
+        self.assertEqual(out, ("tâi-uân lāi戸", 3, 2, 1))
+
+    def test_trie_matcher_matches_probing(self) -> None:
+        mapping = {
+            "一": ["tsi̍t", "it"],
+            "大": ["tuā"],
+            "囝": ["kiánn"],
+            "一大": ["tsi̍t-tuā"],
+            "一大囝仔": ["x"],
+            "a一": ["y"],
+        }
+        trie = HeadwordTrie.from_mapping(mapping)
+        for text in ("一大囝", "一大囝仔", "一大囝a一二", "", "一x大", "一大囝仔仔"):
+            for unknown in ("keep", "mark"):
+                self.assertEqual(
+                    hanzi_to_tailo_with_stats(text, mapping, max_key_len=4, unknown=unknown),
+                    hanzi_to_tailo_with_stats(
+                        text, mapping, max_key_len=4, unknown=unknown, matcher=trie
+                    ),
+                )
+
+    def test_hanzi_runs_pass_text_through_in_slices(self) -> None:
+        text = "Goá sī 臺灣人, 𠀀 chit-ê 一a一。"
+        self.assertTrue(contains_hanzi(text))
+        self.assertFalse(contains_hanzi("Goá sī tâi-uân-lâng"))
+        self.assertEqual(
+            [text[a:b] for a, b in iter_hanzi_runs(text)], ["臺灣人", "𠀀", "一", "一"]
+        )
+        mapping = {"臺灣": ["tâi-uân"], "a一": ["y"], "一a": ["z"]}
+        segments = list(iter_segments(text, mapping, max_key_len=2))
+        self.assertEqual(
+            [(s.piece, s.readings) for s in segments],
+            [
+                ("Goá sī ", None), ("臺灣", ["tâi-uân"]), ("人", None), (", ", None),
+                ("𠀀", None), (" chit-ê ", None), ("一a", ["z"]), ("一", None), ("。", None),
+            ],
+        )
+        self.assertEqual("".join(s.piece for s in segments), text)
+
+
+class TestConverterApi(unittest.TestCase):
+    def test_convert_lookup_and_convert_many(self) -> None:
+        mapping = {"台灣": ["tâi-uân"], "一": ["tsi̍t", "it"]}
+        conv = Converter(mapping=mapping, opencc=None)
+        self.assertEqual(conv.max_key_len, 2)
+        self.assertEqual(conv.convert("臺灣 chit8"), "tâi-uân tsi̍t")
+        self.assertEqual(conv.convert("一", mode="hanzi", ambiguous="all"), "{tsi̍t/it}")
+        self.assertEqual(conv.convert("chit8", mode="poj", output="ipa"), "t͡sit̚⁸")
+        self.assertEqual(conv.convert_many(["一", "二"], unknown="mark"), ["tsi̍t", "<?>"])
+        self.assertEqual(conv.lookup("臺灣"), ["tâi-uân"])
+        self.assertEqual(conv.lookup("二"), [])
+        self.assertEqual(conv.lookup_best_effort("台灣嘛"), "tâi-uân嘛")
+
+    def test_opencc_only_for_unmatched_runs(self) -> None:
+        calls: list[tuple[str, str]] = []
+        pairs = {"简": "簡", "单": "單", "发": "發"}
+
+        def fake_s2t(text: str, config: str = "s2tw") -> str:
+            calls.append((config, text))
+            for simp, trad in pairs.items():
+                text = text.replace(simp, trad)
+            return text
+
+        def fake_t2s(text: str, config: str = "tw2s") -> str:
+            calls.append((config, text))
+            for simp, trad in pairs.items():
+                text = text.replace(trad, simp)
+            return text
+
+        conv = Converter(mapping={"台灣": ["tâi-uân"], "簡單": ["kán-tan"], "發": ["huat"]})
+        with mock.patch("tailo_cli.opencc_util.to_traditional", fake_s2t), mock.patch(
+            "tailo_cli.opencc_util.to_simplified", fake_t2s
+        ):
+            self.assertEqual(conv.convert("臺灣"), "tâi-uân")
+            self.assertEqual(calls, [])
+            # The dictionary's own table, built once from its headwords.
+            self.assertEqual(conv.convert("臺灣，简单嘛"), "tâi-uân，kán-tan嘛")
+            self.assertEqual(conv.lookup("发"), ["huat"])
+            self.assertEqual(calls, [("tw2s", "台灣\n簡單\n發")])
+            # Full OpenCC only with the fallback, for runs still unmatched.
+            calls.clear()
+            conv.opencc_fallback = True
+            self.assertEqual(conv.convert("简单嘛"), "kán-tan嘛")
+            self.assertEqual(calls, [("s2tw", "简单嘛")])
+
+    def test_token_stream_offsets_and_readings(self) -> None:
+        conv = Converter(mapping={"台灣": ["tâi-uân"], "一": ["tsi̍t", "it"]}, opencc=None)
+        text = "臺灣 chit8\n一嘛, ok"
+        tokens = list(conv.tokens(text))
+        self.assertEqual(
+            [(t.start, t.end, t.headword, t.reading, t.alternatives, t.unknown) for t in tokens],
+            [
+                (0, 2, "台灣", "tâi-uân", [], False),
+                (3, 8, None, "tsi̍t", [], False),
+                (9, 10, "一", "tsi̍t", ["it"], False),
+                (10, 11, None, None, [], True),
+                (11, 12, None, ",", [], False),
+                (13, 15, None, "ok", [], False),
+            ],
+        )
+        self.assertTrue(all(text[t.start : t.end] == t.text for t in tokens))
+        # Chunks (e.g. `iter_chunks`) keep offsets into the whole input.
+        self.assertEqual(list(conv.tokens(["臺灣 chit8\n", "一嘛, ok"])), tokens)
+        self.assertEqual([t.reading for t in conv.tokens("一 chit8", mode="hanzi")], ["tsi̍t", "chit8"])
+        self.assertEqual([t.reading for t in conv.tokens("一", output="ipa")], ["t͡sit̚⁸"])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text("word,chinese\nchit8,[一]\nit4,[一]\n", encoding="utf-8")
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                rc = tailo_run(["--no-opencc", "--dict", str(dict_path), "--format", "jsonl", "一二"])
+            lines = [json.loads(line) for line in out.getvalue().splitlines()]
+            self.assertEqual(rc, 0)
+            self.assertEqual(
+                lines,
+                [
+                    {"start": 0, "end": 1, "text": "一", "headword": "一", "reading": "tsi̍t",
+                     "alternatives": ["it"], "unknown": False},
+                    {"start": 1, "end": 2, "text": "二", "headword": None, "reading": None,
+                     "alternatives": [], "unknown": True},
+                ],
+            )
+
+    def test_token_stream_length_changing_run_is_one_token(self) -> None:
+        # Phrase-level configs (s2twp) may change the run's length: 盘 → 隨身碟.
+        conv = Converter(mapping={"一": ["tsi̍t"], "隨身碟": ["suî-sin-ti̍p"]}, opencc="s2twp")
+        with mock.patch.object(conv, "_to_traditional", lambda run: run.replace("盘", "隨身碟")):
+            tokens = list(conv.tokens("有一盘 ok"))
+        self.assertEqual(
+            [(t.start, t.end, t.text, t.headword, t.reading) for t in tokens],
+            [(0, 3, "有一盘", None, "有 tsi̍t suî-sin-ti̍p"), (4, 6, "ok", None, "ok")],
+        )
+
+    def test_stats_hooks_and_counters(self) -> None:
+        seen: list[str] = []
+        stats = Stats(on_stage=lambda stage, seconds: seen.append(stage))
+        conv = Converter(mapping={"台灣": ["tâi-uân"]}, opencc=None, stats=stats)
+        self.assertEqual(conv.convert("臺灣嘛 chit8", output="ipa"), "tai⁵-uan⁵嘛 t͡sit̚⁸")
+        report = stats.to_dict()
+        self.assertEqual(seen, ["trie_build", "segment", "romanize", "ipa"])
+        self.assertEqual(report["counters"]["segment.candidates"], 1)
+        self.assertEqual(report["counters"]["segment.matched_chars"], 2)
+        self.assertEqual(report["counters"]["segment.unknown_chars"], 1)
+        self.assertGreater(report["counters"]["segment.probes"], 0)
+        self.assertEqual(report["timings"]["segment"]["calls"], 1)
+
+        conv.stats = None
+        conv.convert("臺灣")
+        self.assertEqual(stats.to_dict(), report)
+
+    def test_dictionary_is_loaded_lazily(self) -> None:
+        conv = Converter(Path("does-not-exist.csv"), opencc=None)
+        self.assertEqual(conv.convert("chit8"), "tsi̍t")
+        with self.assertRaises(FileNotFoundError):
+            conv.convert("一")
+
+
+class TestDictCache(unittest.TestCase):
+    def test_compiled_cache_matches_csv_and_rebuilds_when_stale(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            cache_dir = Path(tmpdir) / "cache"
+            dict_path.write_text(
+                "word,chinese\nchit8,[一]\nit4,[一]\ntai5-uan5,[台灣]\n", encoding="utf-8"
+            )
+            expected, expected_len = load_dict_csv(dict_path)
+
+            load_dict(dict_path, cache_dir=cache_dir)
+            self.assertTrue(cache_path_for(dict_path, orthography=True, cache_dir=cache_dir).exists())
+
+            mapping, max_len = load_dict(dict_path, cache_dir=cache_dir)
+            self.assertIsInstance(mapping, CompiledDict)
+            self.assertEqual(max_len, expected_len)
+            self.assertEqual(dict(mapping.items()), expected)
+            self.assertIsNone(mapping.get("二"))
+
+            dict_path.write_text("word,chinese\nji7,[二]\n", encoding="utf-8")
+            mapping, max_len = load_dict(dict_path, cache_dir=cache_dir)
+            self.assertEqual(mapping.get("二"), ["jī"])
+            self.assertNotIn("一", mapping)
+            self.assertEqual(max_len, 1)
+
+    def test_readings_are_interned_and_every_load_is_compact(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text(
+                "word,chinese\nchit8,[一]\nit4,[一]\nit4,[乙]\nchit8,[蜀]\n", encoding="utf-8"
+            )
+            expected, _ = load_dict_csv(dict_path)
+            for _ in range(2):
+                mapping, _ = load_dict(dict_path, cache_dir=Path(tmpdir) / "cache")
+                self.assertIsInstance(mapping, CompiledDict)
+                self.assertEqual(dict(mapping.items()), expected)
+            self.assertEqual(mapping.meta["readings"], 2)
+
+            # Without the cache nothing is compiled: the parsed mapping, readings shared.
+            parsed, _ = load_dict(dict_path, use_cache=False)
+            self.assertIsInstance(parsed, LoadedDict)
+            self.assertEqual(parsed, expected)
+            self.assertIs(parsed["一"][0], parsed["蜀"][0])
+            self.assertEqual(parsed.version, mapping.version)
+
+    def test_delta_patches_caches_in_place(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            cache_dir = Path(tmpdir) / "cache"
+            dict_path.write_text(
+                "id,word,chinese,exp\n1,chit8,[一],one\n2,it4,[一],one\n"
+                "4,tai5-uan5,[臺灣],taiwan\n5,ji7,[二],two\n",
+                encoding="utf-8",
+            )
+            before, _ = load_dict(dict_path, cache_dir=cache_dir)
+            load_dict(dict_path, cache_dir=cache_dir)
+            open_reverse_index(before, dict_path, orthography=True, cache_dir=cache_dir)
+            old_version = before.version
+            delta_path = Path(tmpdir) / "delta.csv"
+            delta_path.write_text(
+                "id,word,chinese,exp,op\n2,,,,delete\n3,sann1,[三],three,add\n"
+                "5,nng7,[二],two,change\n6,tai5,[台],tai,\n",
+                encoding="utf-8",
+            )
+            result = tailo_delta.apply_delta(dict_path, delta_path, cache_dir=cache_dir)
+            self.assertEqual(result[:3], (2, 1, 1))
+            self.assertEqual(len(result.patched), 2)
+            self.assertEqual(
+                [line.split(",")[0] for line in dict_path.read_text(encoding="utf-8").split()],
+                ["id", "1", "3", "4", "5", "6"],
+            )
+
+            stats = Stats()
+            mapping, max_len = load_dict(dict_path, cache_dir=cache_dir, stats=stats)
+            self.assertEqual(stats.counters, {"dict_cache.fresh": 1})
+            expected, expected_len = load_dict_csv(dict_path)
+            self.assertEqual(dict(mapping.items()), fold_mapping(expected))
+            self.assertEqual(max_len, expected_len)
+            reverse = open_reverse_index(
+                mapping, dict_path, orthography=True, cache_dir=cache_dir, stats=stats
+            )
+            self.assertEqual(reverse.search("tâi"), [("台", "tâi")])
+            self.assertEqual(reverse.search("it"), [])
+            self.assertEqual(stats.counters["reverse_index.fresh"], 1)
+            self.assertNotEqual(mapping.version, old_version)
+            self.assertEqual(Converter(dict_path, opencc=None).dict_version, mapping.version)
+
+    def test_delta_inserts_new_ids_before_changed_rows(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text(
+                "id,word,chinese\n1,chit8,[一]\n3,sann1,[三]\n5,goo7,[五]\n", encoding="utf-8"
+            )
+            delta_path = Path(tmpdir) / "delta.csv"
+            delta_path.write_text(
+                "id,word,chinese,op\n2,nng7,[二],add\n3,sam1,[三],change\n", encoding="utf-8"
+            )
+            tailo_delta.apply_delta(dict_path, delta_path, cache_dir=Path(tmpdir) / "cache")
+            self.assertEqual(
+                [line.split(",")[0] for line in dict_path.read_text(encoding="utf-8").split()],
+                ["id", "1", "2", "3", "5"],
+            )
+
+    def test_orthography_flag_keys_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            cache_dir = Path(tmpdir) / "cache"
+            dict_path.write_text("word,chinese\nchit8,[一]\n", encoding="utf-8")
+
+            load_dict(dict_path, cache_dir=cache_dir)
+            mapping, _max_len = load_dict(dict_path, orthography=False, cache_dir=cache_dir)
+            self.assertEqual(mapping["一"], ["chi̍t"])
+            mapping, _max_len = load_dict(dict_path, cache_dir=cache_dir)
+            self.assertEqual(mapping["一"], ["tsi̍t"])
+
+
+class TestDictLayers(unittest.TestCase):
+    def test_overlays_override_or_extend_and_are_cached_per_layer(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            base = Path(tmpdir) / "dict.csv"
+            names = Path(tmpdir) / "names.csv"
+            extra = Path(tmpdir) / "extra.csv"
+            base.write_text(
+                "word,chinese\nchit8,[一]\ntai5-uan5,[台灣]\nlang5,[人]\n", encoding="utf-8"
+            )
+            names.write_text("word,chinese\ntai5-oan2,[臺灣]\na-bing2,[阿明]\n", encoding="utf-8")
+            extra.write_text("word,chinese\nit4,[一]\nchit8,[一]\n", encoding="utf-8")
+
+            stats = Stats()
+            conv = Converter(base, overlays=[names, (extra, "extend")], opencc=None, stats=stats)
+            # The overlay's 台灣 replaces the base's; 一 gains a reading; 阿明 is new.
+            self.assertEqual(conv.lookup("台灣"), ["tâi-uán"])
+            self.assertEqual(conv.lookup("一"), ["tsi̍t", "it"])
+            self.assertEqual(conv.convert("阿明一人", ambiguous="all"), "{a-bíng}{tsi̍t/it}{lâng}")
+            self.assertEqual(conv.max_key_len, 2)
+            self.assertEqual(len(conv.mapping), 4)
+            self.assertEqual(stats.to_dict()["counters"]["dict_cache.stale"], 3)
+            version = conv.dict_version
+            self.assertIsNotNone(version)
+
+            # Editing an overlay rebuilds that layer only; the base cache is reused.
+            names.write_text("word,chinese\na-bing5,[阿明]\n", encoding="utf-8")
+            stats = Stats()
+            conv = Converter(base, overlays=[names, (extra, "extend")], opencc=None, stats=stats)
+            self.assertEqual(conv.convert("台灣阿明"), "tâi-uân a-bîng")
+            counters = stats.to_dict()["counters"]
+            self.assertEqual((counters["dict_cache.fresh"], counters["dict_cache.stale"]), (2, 1))
+            self.assertNotEqual(conv.dict_version, version)
+
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                rc = tailo_run(
+                    ["--no-opencc", "--dict", str(base), "--dict-extend", str(extra),
+                     "--dict", str(names), "--ambiguous", "all", "一阿明"]
+                )
+            self.assertEqual((rc, out.getvalue()), (0, "{tsi̍t/it}{a-bîng}\n"))
+            with self.assertRaises(ValueError):
+                Converter(mapping={"一": ["tsi̍t"]}, overlays=[names])
+
+
+class TestHeadwordIndex(unittest.TestCase):
+    def test_index_finds_rows_without_loading_dictionary(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text(
+                'id,word,chinese,exp\n'
+                '1,chit8,[一],"multi\nline, quoted"\n'
+                '2,tai5-uan5,[台灣],x\n'
+                '3,it4,[一],y\n'
+                '4,,[二],no word\n',
+                encoding="utf-8",
+            )
+            index = open_headword_index(dict_path, cache_dir=Path(tmpdir) / "cache")
+            self.assertEqual(index.words("一"), ["chit8", "it4"])
+            self.assertEqual(index.words("台灣"), ["tai5-uan5"])
+            self.assertEqual(index.words("二"), [])
+            self.assertNotIn("二", index)
+
+            conv = Converter(dict_path, opencc=None)
+            self.assertEqual(conv.lookup("臺灣"), ["tâi-uân"])
+            self.assertEqual(conv.lookup("一", output="ipa"), ["t͡sit̚⁸", "it̚⁴"])
+            self.assertIsNone(conv._mapping)
+
+            # With OpenCC, the s2t table (built from the whole dictionary) only after a miss.
+            calls: list[str] = []
+
+            def fake_t2s(text: str, config: str = "tw2s") -> str:
+                calls.append(text)
+                return text.replace("灣", "湾")
+
+            conv = Converter(dict_path)
+            with mock.patch("tailo_cli.opencc_util.to_simplified", fake_t2s):
+                self.assertEqual(conv.lookup("臺灣"), ["tâi-uân"])
+                self.assertEqual((conv._mapping, calls), (None, []))
+                self.assertEqual(conv.lookup("台湾"), ["tâi-uân"])
+                self.assertEqual(len(calls), 1)
+
+
+class TestReverseIndex(unittest.TestCase):
+    def test_exact_toneless_and_hyphen_insensitive(self) -> None:
+        mapping = {
+            "一": ["tsi̍t", "it"],
+            "蜀": ["tsi̍t"],
+            "即": ["tsit"],
+            "一大": ["tsi̍t-tuā"],
+        }
+        index = ReverseIndex.from_mapping(mapping)
+        self.assertEqual(index.search("tsi̍t"), [("一", "tsi̍t"), ("蜀", "tsi̍t")])
+        self.assertEqual(index.search("chit8"), index.search("tsit8"))
+        self.assertEqual(index.search("TSIT"), [("即", "tsit")])
+        self.assertEqual(
+            index.search("tsit", tones=False), [("一", "tsi̍t"), ("蜀", "tsi̍t"), ("即", "tsit")]
+        )
+        self.assertEqual(index.search("tsit8 tua7"), [("一大", "tsi̍t-tuā")])
+        self.assertEqual(index.search("tsi̍ttuā"), [])
+        self.assertEqual(index.search("tsi̍ttuā", hyphens=False), [("一大", "tsi̍t-tuā")])
+        self.assertEqual(index.search("tsittua", tones=False, hyphens=False), [("一大", "tsi̍t-tuā")])
+        self.assertEqual(index.search("bo5"), [])
+
+    def test_rlookup_from_compiled_dict(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text(
+                "word,chinese\nchit8,[一]\nit4,[一]\ntai5-uan5,[台灣]\n", encoding="utf-8"
+            )
+            # The reverse index is built on the first rlookup only, then served from its file.
+            for state in ("built", "fresh"):
+                stats = Stats()
+                conv = Converter(dict_path, opencc=None, stats=stats)
+                self.assertIsInstance(conv.mapping, CompiledDict)
+                self.assertNotIn(f"reverse_index.{state}", stats.counters)
+                self.assertEqual(conv.rlookup("tai5-oan5"), [("台灣", "tâi-uân")])
+                self.assertEqual(conv.rlookup("it", output="ipa"), [("一", "it̚⁴")])
+                self.assertEqual(stats.counters[f"reverse_index.{state}"], 1)
+
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                rc = tailo_run(["rlookup", "--dict", str(dict_path), "--toneless", "tsit"])
+            self.assertEqual(rc, 0)
+            self.assertEqual(stdout.getvalue(), "一\ttsi̍t\n")
+
+
+class TestHeadwordMatch(unittest.TestCase):
+    MAPPING = {
+        "一": ["tsi̍t"],
+        "一大": ["tsi̍t-tuā"],
+        "一个仔": ["x"],
+        "一大仔": ["y"],
+        "一大囝仔": ["z"],
+        "二": ["jī"],
+        "台灣": ["tâi-uân"],
+    }
+
+    def test_prefix_wildcards_and_pagination(self) -> None:
+        keys = SortedKeyList(self.MAPPING)
+        self.assertEqual(match_headwords(keys, "一*"), ["一", "一个仔", "一大", "一大仔", "一大囝仔"])
+        self.assertEqual(match_headwords(keys, "一*", limit=2, offset=1), ["一个仔", "一大"])
+        self.assertEqual(match_headwords(keys, "一?仔"), ["一个仔", "一大仔"])
+        self.assertEqual(match_headwords(keys, "一?仔", offset=1), ["一大仔"])
+        self.assertEqual(match_headwords(keys, "一*仔"), ["一个仔", "一大仔", "一大囝仔"])
+        self.assertEqual(match_headwords(keys, "?"), ["一", "二"])
+        self.assertEqual(match_headwords(keys, "臺*"), ["台灣"])
+        self.assertEqual(match_headwords(keys, "一大"), ["一大"])
+        self.assertEqual(match_headwords(keys, "三*"), [])
+
+    def test_compiled_dict_matches_in_memory(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "dict.tldc"
+            path.write_bytes(compile_dict(self.MAPPING, 4, {}))
+            compiled = open_compiled(path)
+            keys = SortedKeyList(self.MAPPING)
+            for pattern in ("一*", "一?仔", "*仔", "?", "*", "台*", "一", ""):
+                for offset in (0, 1, 3):
+                    self.assertEqual(
+                        match_headwords(compiled, pattern, offset=offset),
+                        match_headwords(keys, pattern, offset=offset),
+                        (pattern, offset),
+                    )
+        conv = Converter(mapping=self.MAPPING, opencc=None)
+        self.assertEqual(conv.match_headwords("一?", limit=1), [("一大", ["tsi̍t-tuā"])])
+
+
+def _has_fts5_trigram() -> bool:
+    try:
+        con = sqlite3.connect(":memory:")
+        con.execute("CREATE VIRTUAL TABLE t USING fts5(a, tokenize='trigram')")
+    except sqlite3.Error:
+        return False
+    return True
+
+
+@unittest.skipUnless(_has_fts5_trigram(), "SQLite FTS5 trigram tokenizer not available")
+class TestFulltextSearch(unittest.TestCase):
+    def test_ranked_search_and_reuse(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text(
+                "id,word,chinese,exp,example,english,han,page\n"
+                "1,chit8,[一],數字ê一,一个人,one,,A0001\n"
+                "2,tai5-uan5,[台灣],島ê名,,Taiwan island; island country,,A0002\n"
+                "3,to2,[島],島嶼,,a small island in the sea near the coast,,B0003\n",
+                encoding="utf-8",
+            )
+            conv = Converter(dict_path, opencc=None, stats=Stats())
+            hits = conv.search("island")
+            self.assertEqual([h.headword for h in hits][:1], ["台灣"])
+            self.assertEqual({h.headword for h in hits}, {"台灣", "島"})
+            self.assertEqual(hits[0].reading, "tâi-uân")
+            self.assertIn("[island]", hits[0].snippet)
+            self.assertEqual([h.headword for h in conv.search("island", offset=1, limit=5)], ["島"])
+            self.assertEqual([h.headword for h in conv.search("B00")], ["島"])
+            self.assertEqual([(h.headword, h.snippet) for h in conv.search("數字")], [("一", "[數字]ê一")])
+            self.assertEqual(conv.search("island one"), [])
+            self.assertEqual(conv.stats.counters["fulltext.built"], 1)
+
+            conv = Converter(dict_path, opencc=None, stats=Stats())
+            self.assertEqual(len(conv.search("island")), 2)
+            self.assertEqual(conv.stats.counters["fulltext.fresh"], 1)
+
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                rc = tailo_run(["search", "--dict", str(dict_path), "--output", "ipa", "one"])
+            self.assertEqual(rc, 0)
+            self.assertEqual(stdout.getvalue(), "一\tt͡sit̚⁸\tA0001\t[one]\n")
+
+            delta_path = Path(tmpdir) / "delta.csv"
+            delta_path.write_text(
+                "id,word,chinese,english,op\n3,,,,delete\n4,soann1,[山],mountain island,\n",
+                encoding="utf-8",
+            )
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+                rc = tailo_main(["update", "--dict", str(dict_path), str(delta_path)])
+            self.assertEqual(rc, 0)
+            self.assertTrue(stdout.getvalue().startswith("added 1, changed 0, deleted 1;"))
+            conv = Converter(dict_path, opencc=None, stats=Stats())
+            self.assertEqual({h.headword for h in conv.search("island")}, {"台灣", "山"})
+            self.assertEqual(conv.stats.counters["fulltext.fresh"], 1)
+
+
+@unittest.skipUnless(_has_fts5_trigram(), "SQLite FTS5 trigram tokenizer not available")
+class TestIngest(unittest.TestCase):
+    DUMP = (
+        "PRAGMA foreign_keys=OFF;\n"
+        "BEGIN TRANSACTION;\n"
+        "CREATE TABLE dic (\n  id integer PRIMARY KEY,\n  word text,\n  chinese text,\n"
+        "  exp text,\n  english text,\n  page text\n);\n"
+        "INSERT INTO dic VALUES(2,'tai5-uan5','[台灣]','島ê名','Taiwan island','A0002');\n"
+        "INSERT INTO dic VALUES(1,'chit8','[一]','數字\n一','one','A0001');\n"
+        "CREATE INDEX dic_word ON dic (word);\n"
+        "ALTER TABLE dic ADD COLUMN broken\n  text;\n"
+        "INSERT INTO dic VALUES(3,'it4','[一]',NULL,'one','A0003');\n"
+        "COMMIT;\n"
+    )
+
+    def test_dump_to_compiled_dict_and_fulltext(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dump = Path(tmpdir) / "dic_can.txt"
+            dump.write_text(self.DUMP, encoding="utf-8")
+            out = Path(tmpdir) / "out" / "dict.tldc"
+            stdout, stderr = io.StringIO(), io.StringIO()
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                rc = tailo_main(["ingest", "-o", str(out), str(dump)])
+            self.assertEqual(rc, 0)
+            self.assertTrue(stdout.getvalue().startswith("3 rows, 2 headwords → "))
+            self.assertIn("dump 100%", stderr.getvalue())
+            self.assertEqual(list(out.parent.iterdir()), [out])
+
+            stats = Stats()
+            mapping, max_len = load_dict(out, stats=stats)
+            self.assertEqual(stats.counters, {"dict_cache.compiled": 1})
+            self.assertEqual(dict(mapping.items()), {"一": ["tsi̍t", "it"], "台灣": ["tâi-uân"]})
+            self.assertEqual(max_len, 2)
+            with self.assertRaises(ValueError):
+                load_dict(out, orthography=False)
+
+            conv = Converter(out, opencc=None, stats=Stats())
+            self.assertEqual(conv.convert("一台灣"), "tsi̍t tâi-uân")
+            self.assertEqual([h.headword for h in conv.search("island")], ["台灣"])
+            self.assertEqual(sorted(h.page for h in conv.search("one")), ["A0001", "A0003"])
+            self.assertEqual(conv.stats.counters["fulltext.fresh"], 1)
+
+            # A SQLite database holding the `dic` table is read directly.
+            db = Path(tmpdir) / "dic.sqlite"
+            with contextlib.closing(sqlite3.connect(db)) as con:
+                con.executescript(self.DUMP.replace("ALTER TABLE dic ADD COLUMN broken\n  text;\n", ""))
+            result = ingest(db, Path(tmpdir) / "db.tldc", fulltext=False)
+            self.assertEqual((result.rows, result.entries, result.fulltext), (3, 2, None))
+            copy, _ = load_dict(result.output)
+            self.assertEqual(dict(copy.items()), dict(mapping.items()))
+            self.assertEqual([hit.page for hit in Converter(out, opencc=None).pages("一")], ["A0001", "A0003"])
+
+            # A dump path that is a directory is reported like a missing one.
+            with contextlib.redirect_stderr(io.StringIO()) as stderr:
+                rc = tailo_main(["ingest", "-o", str(out), tmpdir])
+            self.assertEqual(rc, 2)
+            self.assertEqual(stderr.getvalue().strip().rsplit(": ", 1)[-1], tmpdir)
+
+
+def _bilevel_png(rows: list[str]) -> bytes:
+    """1-bit grayscale PNG (`#` = black), rows alternately stored with the None / Up filters."""
+    width = len(rows[0])
+    stride = -(-width // 8)
+    bits = ["".join("0" if c == "#" else "1" for c in row).ljust(stride * 8, "0") for row in rows]
+    packed = [int(row, 2).to_bytes(stride, "big") for row in bits]
+    raw = b""
+    prev = bytes(stride)
+    for y, row in enumerate(packed):
+        if y % 2:
+            raw += b"\x02" + bytes((a - b) & 0xFF for a, b in zip(row, prev))
+        else:
+            raw += b"\x00" + row
+        prev = row
+    header = tailo_pages._PNG_HEADER.pack(width, len(rows), 1, 0, 0, 0, 0)
+    return (
+        tailo_pages._PNG_SIGNATURE
+        + tailo_pages._png_chunk(b"IHDR", header)
+        + tailo_pages._png_chunk(b"IDAT", zlib.compress(raw))
+        + tailo_pages._png_chunk(b"IEND", b"")
+    )
+
+
+class TestPages(unittest.TestCase):
+    def test_headword_pages_and_cached_downsampled_scans(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text(
+                "id,word,chinese,page\n1,chit8,[一],B0002\n2,it4,[一],B0002\n"
+                "3,tai5-uan5,[台灣],A0001\n4,tai5,[台],C9999\n",
+                encoding="utf-8",
+            )
+            scans = Path(tmpdir) / "scan"
+            (scans / "B").mkdir(parents=True)
+            (scans / "B" / "B0002.png").write_bytes(
+                _bilevel_png(["##..#", "##...", "....#", "....#", "#####"])
+            )
+            conv = Converter(dict_path, opencc=None, stats=Stats())
+            hits = conv.pages("一", scan_dir=scans)
+            self.assertEqual(hits, [tailo_pages.PageHit("一", "B0002", scans / "B" / "B0002.png")])
+            self.assertEqual(conv.pages("臺", scan_dir=scans), [tailo_pages.PageHit("台", "C9999", None)])
+            self.assertEqual(conv.pages("二", scan_dir=scans), [])
+            self.assertEqual(conv.stats.counters["page_index.built"], 1)
+
+            (hit,) = conv.pages("一", scale=2, scan_dir=scans)
+            header, idat = tailo_pages._read_png(hit.image.read_bytes())
+            self.assertEqual(header[:4], (3, 3, 8, 0))
+            pixels = zlib.decompress(idat)
+            # Filter byte, then one gray pixel per 2×2 block: its share of white pixels
+            # (of the real ones in the 1-pixel-wide last column).
+            self.assertEqual(pixels, b"\x00\x00\xff\x7f" + b"\x00\xff\xff\x00" + b"\x00\x00\x00\x00")
+            conv.pages("一", scale=2, scan_dir=scans)
+            self.assertEqual(conv.stats.counters["page_image.built"], 1)
+            self.assertEqual(conv.stats.counters["page_image.fresh"], 1)
+
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                rc = tailo_run(["page", "--dict", str(dict_path), "--scans", str(scans), "台灣"])
+            self.assertEqual(rc, 0)
+            self.assertEqual(stdout.getvalue(), "台灣\tA0001\t-\n")
+
+            # A truncated scan is reported, not a traceback.
+            png = (scans / "B" / "B0002.png").read_bytes()
+            (scans / "B" / "B0002.png").write_bytes(png[:-20])
+            with contextlib.redirect_stderr(io.StringIO()) as stderr:
+                rc = tailo_run(["page", "--dict", str(dict_path), "--scans", str(scans), "--scale", "4", "一"])
+            self.assertEqual(rc, 2)
+            self.assertIn("corrupt PNG data", stderr.getvalue())
+
+
+class TestS2TTable(unittest.TestCase):
+    T2S = str.maketrans("頭髮發後麵臺灣", "头发发后面台湾")
+
+    def test_ambiguous_characters_go_through_phrases(self) -> None:
+        headwords = ["頭髮", "發", "後面", "皇后", "麵", "面", "臺灣"]
+        table = tailo_s2t.open_s2t_table(
+            None, lambda: headwords, lambda t: t.translate(self.T2S), config="s2tw"
+        )
+        # 发 (發/髮) and 后 (a headword character) only in context; 面 is a headword.
+        self.assertEqual(table.convert("头发和发后面台湾面 abc"), "頭髮和發後面臺灣面 abc")
+        self.assertEqual(table.convert("后"), "后")
+
+    def test_cached_and_rebuilt_when_the_dict_changes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dict_path = Path(tmp) / "dict.csv"
+            dict_path.write_text("word,chinese\ntai5-oan5,臺灣\n", encoding="utf-8")
+            headwords = ["臺灣"]
+            stats = Stats()
+
+            def open_table() -> tailo_s2t.S2TTable:
+                return tailo_s2t.open_s2t_table(
+                    dict_path,
+                    lambda: headwords,
+                    lambda t: t.translate(self.T2S),
+                    config="s2tw",
+                    cache_dir=Path(tmp) / "cache",
+                    stats=stats,
+                )
+
+            self.assertEqual(open_table().convert("台湾"), "臺灣")
+            self.assertEqual(open_table().convert("台湾"), "臺灣")
+            dict_path.write_text("word,chinese\nthau5-mo5,頭髮\n", encoding="utf-8")
+            headwords = ["頭髮"]
+            self.assertEqual(open_table().convert("台湾头发"), "台湾頭髮")
+            counters = stats.to_dict()["counters"]
+            self.assertEqual((counters["s2t_table.built"], counters["s2t_table.fresh"]), (2, 1))
+
+
+class TestResultCache(unittest.TestCase):
+    def test_results_are_reused_across_converters_until_the_dict_changes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dict_path = Path(tmp) / "dict.csv"
+            dict_path.write_text("word,chinese\nlang5,[人]\nchit8,[一]\n", encoding="utf-8")
+            db = Path(tmp) / "results.sqlite"
+
+            def converter(stats: Stats | None = None) -> Converter:
+                return Converter(dict_path, opencc=None, result_cache=db, stats=stats)
+
+            stats = Stats()
+            conv = converter(stats)
+            self.assertEqual(conv.convert("一人"), "tsi̍t lâng")
+            self.assertEqual(conv.convert("一人"), "tsi̍t lâng")
+            # Every output option is part of the key.
+            self.assertEqual(conv.convert("一人", output="ipa"), conv.convert("一人", output="ipa"))
+            self.assertEqual(conv.convert("一人", unknown="mark"), "tsi̍t lâng")
+            counters = stats.to_dict()["counters"]
+            self.assertEqual((counters["result_cache.hits"], counters["result_cache.misses"]), (2, 3))
+            conv._result_cache().flush()
+
+            # Another converter (or process) on the same file sees the results.
+            stats = Stats()
+            self.assertEqual(converter(stats).convert("一人"), "tsi̍t lâng")
+            self.assertEqual(stats.to_dict()["counters"]["result_cache.hits"], 1)
+
+            # A new dictionary version misses instead of returning stale output.
+            dict_path.write_text("word,chinese\nlang5,[人]\nit4,[一]\n", encoding="utf-8")
+            stats = Stats()
+            self.assertEqual(converter(stats).convert("一人"), "it lâng")
+            self.assertEqual(stats.to_dict()["counters"]["result_cache.misses"], 1)
+            info = converter().result_cache_info()
+            self.assertEqual((info["entries"], info["hits"], info["misses"]), (4, 3, 4))
+            self.assertEqual(info["hit_rate"], 0.4286)
+
+    def test_results_are_not_stored_under_a_missing_opencc(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dict_path = Path(tmp) / "dict.csv"
+            dict_path.write_text("word,chinese\nlang5,[人]\nmng5,[門]\n", encoding="utf-8")
+            db = Path(tmp) / "results.sqlite"
+            errors: list[str] = []
+            conv = Converter(dict_path, opencc="s2tw", result_cache=db, on_opencc_error=errors.append)
+            missing = RuntimeError("OpenCC is not installed")
+            with mock.patch("tailo_cli.opencc_util.to_traditional", side_effect=missing):
+                self.assertEqual(conv.convert("门人"), "门 lâng")
+            self.assertEqual((conv.opencc, errors), (None, ["OpenCC is not installed"]))
+            conv._result_cache().flush()
+            self.assertEqual(conv.result_cache_info()["entries"], 0)
+
+            # Where OpenCC works, the ("opencc", "s2tw") key gets the converted text.
+            with mock.patch("tailo_cli.opencc_util.to_traditional", return_value="門人"):
+                conv = Converter(dict_path, opencc="s2tw", result_cache=db)
+                self.assertEqual(conv.convert("门人"), "m̂ng lâng")
+
+    def test_size_bound_evicts_least_recently_used(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = tailo_result_cache.ResultCache(Path(tmp) / "r.sqlite", max_bytes=1000)
+            keys = [tailo_result_cache.result_key((), str(i)) for i in range(11)]
+            for key in keys[:8]:
+                cache.put(key, "x" * 52)  # 100 bytes with the per-entry overhead.
+            cache.flush()
+            self.assertIsNotNone(cache.get(keys[0]))  # Now more recent than keys[1:8].
+            cache.flush()
+            for key in keys[8:]:
+                cache.put(key, "x" * 52)
+            info = cache.info()
+            # Over the limit: down to 90% of it, least recently used first.
+            self.assertEqual((info["entries"], info["bytes"], info["evictions"]), (9, 900, 2))
+            kept = [cache.get(key) is not None for key in keys]
+            self.assertEqual((kept[0], sum(kept[1:8]), kept[8:]), (True, 5, [True] * 3))
+            cache.clear()
+            self.assertEqual(cache.info()["entries"], 0)
+            cache.close()
+
 
 class TestOpenCC(unittest.TestCase):
     @unittest.skipIf(OpenCC is None, "OpenCC not installed")
@@ -108,5 +945,408 @@ class TestLookupCli(unittest.TestCase):
             self.assertEqual(stdout.getvalue().strip(), "tâi-uân嘛")
 
 
+class TestStatsCli(unittest.TestCase):
+    def test_stats_report_on_stderr(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text("word,chinese\nchit8,[一]\n", encoding="utf-8")
+            stdout = io.StringIO()
+            stderr = io.StringIO()
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                rc = tailo_run(["--no-opencc", "--dict", str(dict_path), "--stats", "一"])
+            self.assertEqual(rc, 0)
+            self.assertEqual(stdout.getvalue(), "tsi̍t\n")
+            report = json.loads(stderr.getvalue())
+            self.assertIn("dict_load", report["timings"])
+            self.assertIn("total", report["timings"])
+            self.assertEqual(report["counters"]["dict_cache.stale"], 1)
+
+
+class TestStartup(unittest.TestCase):
+    # Cumulative `python -X importtime` microseconds for the package's own modules
+    # (stdlib dependencies included) on `tailo --mode poj`.
+    IMPORT_BUDGET_US = 100_000
+    NOT_IMPORTED = (
+        "opencc", "sqlite3", "socket", "hashlib", "tempfile",
+        "tailo_cli.dict_cache", "tailo_cli.fulltext", "tailo_cli.headword_index",
+        "tailo_cli.ipa", "tailo_cli.opencc_util", "tailo_cli.daemon", "tailo_cli.batch",
+        "tailo_cli.pages", "tailo_cli.server", "tailo_cli.s2t", "tailo_cli.layers", "asyncio",
+        "tailo_cli.result_cache",
+    )
+
+    def test_startup_import_budget(self) -> None:
+        env = dict(os.environ, TAILO_NO_DAEMON="1")
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "tailo_cli", "--mode", "poj", "chit8"],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=Path(__file__).resolve().parent.parent,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout, "tsi̍t\n")
+
+        imported: set[str] = set()
+        total = 0
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _self_us, cumulative, name = line[len("import time:") :].split("|")
+            if not cumulative.strip().isdigit():
+                continue  # Header line.
+            imported.add(name.strip())
+            if name.startswith(" tailo_cli"):  # Top level only: nested times are included.
+                total += int(cumulative)
+        for module in self.NOT_IMPORTED:
+            self.assertNotIn(module, imported)
+        self.assertLess(total, self.IMPORT_BUDGET_US)
+
+
+class TestStreamingCli(unittest.TestCase):
+    def test_stream_converts_line_by_line(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text("word,chinese\ntai5-uan5,[台灣]\n", encoding="utf-8")
+
+            stdout = io.StringIO()
+            with mock.patch("sys.stdin", io.StringIO("台灣 chit8\n\nabc")), contextlib.redirect_stdout(
+                stdout
+            ):
+                rc = tailo_main(["--stream", "--no-opencc", "--dict", str(dict_path)])
+
+            self.assertEqual(rc, 0)
+            self.assertEqual(stdout.getvalue(), "tâi-uân tsi̍t\n\nabc")
+
+    def test_long_lines_are_split_between_words(self) -> None:
+        chunks = list(iter_chunks(io.StringIO("chit8 e5 tai5\nx\n"), limit=7))
+        self.assertEqual("".join(chunks), "chit8 e5 tai5\nx\n")
+        self.assertEqual(chunks[0], "chit8 ")
+        self.assertTrue(all(len(c) <= 8 for c in chunks))
+
+        conv = Converter(mapping={})
+        text = "chit8 e5 tai5 ho2\n  boe7 x\n"
+        streamed = "".join(conv.convert_stream(iter_chunks(io.StringIO(text), limit=7), mode="poj"))
+        self.assertEqual(streamed, "tsi̍t ê tâi hó\n  buē x\n")
+        self.assertEqual(streamed.rstrip("\n"), conv.convert(text, mode="poj"))
+
+
+def _convert_file_or_die(src: str, dst: str) -> dict | None:
+    """`batch._convert_file` whose worker process dies on files named `die.txt`."""
+    if src.endswith("die.txt"):
+        os._exit(1)
+    return _convert_file(src, dst)
+
+
+class TestBatchCli(unittest.TestCase):
+    def test_batch_converts_tree_and_resumes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            dict_path = root / "dict.csv"
+            dict_path.write_text("word,chinese\ntai5-uan5,[台灣]\n", encoding="utf-8")
+            (root / "in" / "sub").mkdir(parents=True)
+            (root / "in" / "a.txt").write_text("台灣\nchit8\n", encoding="utf-8")
+            (root / "in" / "sub" / "b.txt").write_text("台灣人", encoding="utf-8")
+            (root / "in" / "skip.md").write_text("台灣", encoding="utf-8")
+            argv = ["batch", "--no-opencc", "--dict", str(dict_path), "-q"]
+
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                rc = tailo_main(argv + ["-j", "2", str(root / "in"), str(root / "out")])
+            self.assertEqual(rc, 0)
+            self.assertEqual((root / "out" / "a.txt").read_text(encoding="utf-8"), "tâi-uân\ntsi̍t\n")
+            self.assertEqual((root / "out" / "sub" / "b.txt").read_text(encoding="utf-8"), "tâi-uân人")
+            self.assertFalse((root / "out" / "skip.md").exists())
+            self.assertIn("converted 2, skipped 0", stderr.getvalue())
+
+            (root / "in" / "c.txt").write_text("chit8", encoding="utf-8")
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                rc = tailo_main(argv + ["-j", "1", str(root / "in"), str(root / "out")])
+            self.assertEqual(rc, 0)
+            self.assertIn("converted 1, skipped 2", stderr.getvalue())
+            self.assertEqual((root / "out" / "c.txt").read_text(encoding="utf-8"), "tsi̍t")
+
+            # A new dictionary version converts everything again instead of mixing versions.
+            dict_path.write_text("word,chinese\ntai5-oan5,[台灣]\n", encoding="utf-8")
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                rc = tailo_main(argv + ["-j", "1", str(root / "in"), str(root / "out")])
+            self.assertEqual(rc, 0)
+            self.assertIn("converted 3, skipped 0", stderr.getvalue())
+            self.assertEqual((root / "out" / "sub" / "b.txt").read_text(encoding="utf-8"), "tâi-uân人")
+
+    def test_batch_failures_are_contained(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "in").mkdir()
+            (root / "in" / "a.txt").write_text("chit8", encoding="utf-8")
+            (root / "in" / "bad.txt").write_bytes(b"chit8 \xff")
+            argv = ["batch", "--mode", "poj", str(root / "in"), str(root / "out")]
+
+            # A file that fails midway leaves no `.part` behind.
+            with contextlib.redirect_stderr(io.StringIO()) as stderr:
+                rc = tailo_main(argv + ["-j", "1"])
+            self.assertEqual(rc, 1)
+            self.assertIn("converted 1, skipped 0 (already done), failed 1", stderr.getvalue())
+            self.assertEqual(sorted(p.name for p in (root / "out").iterdir()), [".tailo-batch.jsonl", "a.txt"])
+
+            # Any other per-file error is contained the same way without a pool.
+            (root / "in" / "bad.txt").write_text("chit8", encoding="utf-8")
+            with mock.patch.object(Converter, "convert_stream", side_effect=ValueError("boom")), (
+                contextlib.redirect_stderr(io.StringIO())
+            ) as stderr:
+                rc = tailo_main(argv + ["-j", "1"])
+            self.assertEqual(rc, 1)
+            self.assertIn("failed: bad.txt: boom", stderr.getvalue())
+            self.assertIn("converted 0, skipped 1 (already done), failed 1", stderr.getvalue())
+            self.assertFalse(list((root / "out").glob("*.part")))
+
+            # A dead worker breaks the pool: the run ends with every unfinished file failed,
+            # including those not yet submitted (more files than the 4 per worker in flight).
+            (root / "in" / "die.txt").write_text("chit8", encoding="utf-8")
+            for i in range(10):
+                (root / "in" / f"x{i}.txt").write_text("chit8", encoding="utf-8")
+            with mock.patch("tailo_cli.batch._convert_file", _convert_file_or_die), contextlib.redirect_stderr(
+                io.StringIO()
+            ) as stderr:
+                rc = tailo_main(argv + ["-j", "2"])
+            self.assertEqual(rc, 1)
+            summary = stderr.getvalue().splitlines()[-1]
+            converted, failed = (int(n) for n in re.findall(r"converted (\d+), skipped 1 .*failed (\d+)", summary)[0])
+            self.assertEqual(converted + failed, 12)
+            self.assertGreaterEqual(failed, 2)
+            self.assertFalse(list((root / "out").glob("*.part")))
+
+            with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+                tailo_main(argv + ["-j", "-1"])
+
+    def test_batch_poj_keeps_spacing_between_chunks(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "in").mkdir()
+            (root / "in" / "a.txt").write_text("chit8 e5 tai5 ho2\n  boe7 x\n", encoding="utf-8")
+
+            def short_chunks(stream):
+                return iter_chunks(stream, limit=7)
+
+            # One file: converted in-process, where the patched chunker applies.
+            with mock.patch("tailo_cli.batch.iter_chunks", short_chunks), contextlib.redirect_stderr(
+                io.StringIO()
+            ):
+                rc = tailo_main(["batch", "--mode", "poj", "-q", str(root / "in"), str(root / "out")])
+            self.assertEqual(rc, 0)
+            self.assertEqual((root / "out" / "a.txt").read_text(encoding="utf-8"), "tsi̍t ê tâi hó\n  buē x\n")
+
+
+@unittest.skipUnless(hasattr(daemon.socket, "AF_UNIX"), "unix sockets not available")
+class TestDaemon(unittest.TestCase):
+    def test_daemon_serves_requests_and_client_falls_back(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text("word,chinese\ntai5-uan5,[台灣]\n", encoding="utf-8")
+            socket_path = Path(tmpdir) / "d.sock"
+
+            self.assertIsNone(daemon.request(["台灣"], socket_path=socket_path))
+
+            # A daemon that accepts but never replies: the client falls back too.
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stuck, mock.patch.object(
+                daemon, "_REPLY_TIMEOUT", 0.1
+            ):
+                stuck.bind(str(socket_path))
+                stuck.listen()
+                self.assertIsNone(daemon.request(["台灣"], socket_path=socket_path))
+            socket_path.unlink()
+
+            server = threading.Thread(target=daemon.serve, args=(socket_path, tailo_run))
+            server.start()
+            try:
+                for _ in range(100):
+                    if daemon.ping(socket_path) is not None:
+                        break
+                    threading.Event().wait(0.01)
+
+                # A client that never sends its request is dropped instead of
+                # blocking the (serial) daemon.
+                with mock.patch.object(daemon, "_READ_TIMEOUT", 0.1), socket.socket(
+                    socket.AF_UNIX, socket.SOCK_STREAM
+                ) as idle:
+                    idle.connect(str(socket_path))
+                    idle.settimeout(5)
+                    self.assertEqual(idle.recv(1), b"")
+
+                rc, out, err = daemon.request(
+                    ["lookup", "--no-opencc", "--dict", str(dict_path), "台灣"],
+                    socket_path=socket_path,
+                )
+                self.assertEqual((rc, out, err), (0, "tâi-uân\n", ""))
+
+                rc, out, _err = daemon.request(
+                    ["--no-opencc", "--dict", str(dict_path)],
+                    stdin="台灣 chit8",
+                    socket_path=socket_path,
+                )
+                self.assertEqual((rc, out), (0, "tâi-uân tsi̍t\n"))
+
+                rc, _out, err = daemon.request(
+                    ["lookup", "--dict", str(Path(tmpdir) / "missing.csv"), "台"],
+                    socket_path=socket_path,
+                )
+                self.assertEqual(rc, 2)
+                self.assertIn("dict.csv not found", err)
+            finally:
+                daemon.stop(socket_path)
+                server.join(timeout=5)
+            self.assertFalse(socket_path.exists())
+
+
+async def _http(port: int, method: str, target: str, body: dict | None = None) -> tuple[int, dict]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n"
+        .encode("latin-1") + data
+    )
+    status = int((await reader.readline()).split()[1])
+    reply = (await reader.read()).split(b"\r\n\r\n", 1)[1]
+    writer.close()
+    return status, json.loads(reply)
+
+
+def _run_batch_or_die(op: str, groups: list[tuple[dict, list[str]]]) -> list[list]:
+    """`server._run_batch` whose worker process dies on the item `die`."""
+    if any("die" in items for _, items in groups):
+        os._exit(1)
+    return _run_batch(op, groups)
+
+
+class TestServer(unittest.TestCase):
+    def test_batched_convert_lookup_health_and_metrics(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text(
+                "word,chinese\ntai5-uan5,[台灣]\nchit8,[一]\nit4,[一]\n", encoding="utf-8"
+            )
+            kwargs = {"dict_path": dict_path, "opencc": None}
+
+            async def scenario() -> None:
+                srv = server.Server(kwargs, workers=0, max_wait=0.01)
+                port = await srv.start(port=0)
+                try:
+                    replies = await asyncio.gather(
+                        *(_http(port, "POST", "/convert", {"text": "臺灣 chit8"}) for _ in range(8)),
+                        _http(port, "POST", "/convert", {"texts": ["一", "二"], "unknown": "mark"}),
+                        _http(port, "POST", "/lookup", {"word": "一", "output": "ipa"}),
+                    )
+                    self.assertEqual(replies[0], (200, {"text": "tâi-uân tsi̍t"}))
+                    self.assertEqual(len(set(map(str, replies[:8]))), 1)
+                    self.assertEqual(replies[8], (200, {"texts": ["tsi̍t", "<?>"]}))
+                    self.assertEqual(replies[9], (200, {"readings": ["t͡sit̚⁸", "it̚⁴"]}))
+                    self.assertEqual(
+                        await _http(port, "GET", "/lookup?word=%E5%8F%B0%E7%81%A3"),
+                        (200, {"readings": ["tâi-uân"]}),
+                    )
+                    self.assertEqual((await _http(port, "POST", "/convert", {"mode": "x"}))[0], 400)
+                    self.assertEqual((await _http(port, "POST", "/convert", {}))[0], 400)
+                    self.assertEqual((await _http(port, "GET", "/nope"))[0], 404)
+
+                    status, health = await _http(port, "GET", "/health")
+                    self.assertEqual((status, health["status"]), (200, "ok"))
+                    self.assertEqual(health["dict_version"], Converter(dict_path).dict_version)
+                    status, metrics = await _http(port, "GET", "/metrics")
+                    self.assertEqual(metrics["endpoints"]["/convert"]["requests"], 11)
+                    self.assertEqual(metrics["endpoints"]["/convert"]["errors"], 2)
+                    self.assertIn("p99_ms", metrics["endpoints"]["/lookup"])
+                    # Ten items arrived together: fewer worker calls than items.
+                    self.assertLess(metrics["batches"]["count"], metrics["batches"]["items"])
+                finally:
+                    await srv.close()
+
+            asyncio.run(scenario())
+
+    def test_bad_item_fails_only_its_request(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text("word,chinese\ntai5-uan5,[台灣]\n", encoding="utf-8")
+            convert_many = Converter.convert_many
+
+            def picky(conv: Converter, texts: list[str], **options: object) -> list[str]:
+                if "壞" in texts:
+                    raise ValueError("bad item")
+                return convert_many(conv, texts, **options)
+
+            async def scenario() -> None:
+                srv = server.Server({"dict_path": dict_path, "opencc": None}, workers=0, max_wait=0.05)
+                port = await srv.start(port=0)
+                try:
+                    replies = await asyncio.gather(
+                        *(_http(port, "POST", "/convert", {"text": "台灣"}) for _ in range(4)),
+                        _http(port, "POST", "/convert", {"text": "壞"}),
+                    )
+                    self.assertEqual(replies[:4], [(200, {"text": "tâi-uân"})] * 4)
+                    self.assertEqual(replies[4], (503, {"error": "bad item"}))
+                    self.assertLess(srv.metrics.to_dict()["batches"]["count"], 5)
+                finally:
+                    await srv.close()
+
+            with mock.patch.object(Converter, "convert_many", picky):
+                asyncio.run(scenario())
+
+    def test_dead_worker_is_replaced(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dict_path = Path(tmpdir) / "dict.csv"
+            dict_path.write_text("word,chinese\ntai5-uan5,[台灣]\n", encoding="utf-8")
+
+            async def scenario() -> None:
+                srv = server.Server({"dict_path": dict_path, "opencc": None}, workers=1)
+                port = await srv.start(port=0)
+                try:
+                    self.assertEqual((await _http(port, "POST", "/convert", {"text": "die"}))[0], 503)
+                    status, health = await _http(port, "GET", "/health")
+                    self.assertEqual(health["executor"]["restarts"], 1)
+                    self.assertIsNotNone(health["executor"]["last_failure"])
+                    self.assertEqual(
+                        await _http(port, "POST", "/convert", {"text": "台灣"}),
+                        (200, {"text": "tâi-uân"}),
+                    )
+                finally:
+                    await srv.close()
+
+            with mock.patch("tailo_cli.server._run_batch", _run_batch_or_die):
+                asyncio.run(scenario())
+
+
+class TestBench(unittest.TestCase):
+    def test_generators_are_deterministic(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a = bench.generate_dict(Path(tmpdir) / "a.csv", 50, seed=3)
+            b = bench.generate_dict(Path(tmpdir) / "b.csv", 50, seed=3)
+            self.assertEqual(a.read_bytes(), b.read_bytes())
+            mapping, _max_len = load_dict_csv(a)
+            self.assertGreater(len(mapping), 10)
+        self.assertEqual(bench.generate_corpus(50, 5, seed=3), bench.generate_corpus(50, 5, seed=3))
+        self.assertEqual(bench.percentile([1.0, 2.0, 3.0, 4.0], 50), 2.0)
+        self.assertEqual(bench.percentile([1.0, 2.0, 3.0, 4.0], 99), 4.0)
+
+    def test_run_and_compare_with_baseline(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            results = bench.run_benchmarks(
+                Path(tmpdir), sizes=(200,), stages=("segment", "ipa"), lines=20, repeat=1
+            )
+            rows = {(r["stage"], r["size"]): r for r in results["results"]}
+            self.assertEqual(set(rows), {("segment", 200), ("ipa", 200)})
+            for key in ("seconds", "chars_per_s", "p50_ms", "p99_ms", "peak_kib"):
+                self.assertIn(key, rows[("segment", 200)])
+
+            path = Path(tmpdir) / "baseline.json"
+            bench.write_results(path, results)
+            baseline = bench.read_results(path)
+            self.assertFalse(any(r["regression"] for r in bench.compare(results, baseline)))
+
+            slower = dict(results)
+            slower["results"] = [dict(r, chars_per_s=r["chars_per_s"] / 2) for r in results["results"]]
+            flagged = bench.compare(slower, baseline, threshold=0.25)
+            self.assertTrue(all(r["regression"] for r in flagged))
+
+
 if __name__ == "__main__":
     unittest.main()